@@ -19,6 +19,7 @@ from rest_framework.response import Response
 from rest_framework.status import HTTP_404_NOT_FOUND, HTTP_403_FORBIDDEN
 from apps.utils.pagination import MyPagination
 from apps.bank.models import BankAccount
+from apps.bank.services.ledger import reset_balance
 from rest_framework import views
 from .utils import (
     # get_token_from_redis,
@@ -185,8 +186,7 @@ class UserDeleteView(views.APIView):
             user.save()
             try:
                 arg = BankAccount.objects.get(user=user)
-                arg.capital = 0
-                arg.save()
+                reset_balance(arg.pk)
             except Exception as e:
                 return Response(
                     {"message": "Bank accountingizda muammo bor"}, status=400
@@ -219,8 +219,7 @@ class UserDeleteByIdView(views.APIView):
 
             try:
                 bank_account = BankAccount.objects.get(user=user)
-                bank_account.capital = 0
-                bank_account.save()
+                reset_balance(bank_account.pk)
             except BankAccount.DoesNotExist:
                 pass  # If bank account doesn't exist, continue with deletion
 
@@ -1,5 +1,14 @@
 from django.contrib import admin
-from .models import BankAccount, Earning, PayOut, PayMe, QrCheckLog
+from .models import (
+    BankAccount,
+    Earning,
+    EarningRollupState,
+    ExportJob,
+    PayOut,
+    PayMe,
+    QrCheckLog,
+    ReconciliationRun,
+)
 
 
 # Register your models here.
@@ -22,5 +31,28 @@ class QrCheckLogAdmin(admin.ModelAdmin):
     search_fields = ["qr_code", "ip_address", "user_agent"]
 
 
+@admin.register(ReconciliationRun)
+class ReconciliationRunAdmin(admin.ModelAdmin):
+    list_display = [
+        "started_at",
+        "finished_at",
+        "incremental",
+        "accounts_checked",
+        "discrepancies",
+        "repaired",
+    ]
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ["kind", "file_format", "status", "rows_written", "created_at"]
+    list_filter = ["kind", "status"]
+
+
+@admin.register(EarningRollupState)
+class EarningRollupStateAdmin(admin.ModelAdmin):
+    list_display = ["complete_through", "last_earning_id", "updated_at"]
+
+
 admin.site.register(PayOut)
 admin.site.register(PayMe)
@@ -1,5 +1,6 @@
 from django_filters import rest_framework as filters
-from .models import Earning
+from apps.ecopacket.models import EcoPacketQrCode
+from .models import Earning, PayMe, PayOut
 
 
 class EarningFilter(filters.FilterSet):
@@ -22,3 +23,30 @@ class EarningFilter(filters.FilterSet):
             "min_amount",
             "max_amount",
         ]
+
+
+class PayOutFilter(filters.FilterSet):
+    start_date = filters.DateFilter(field_name="created_at", lookup_expr="gte")
+    end_date = filters.DateFilter(field_name="created_at", lookup_expr="lte")
+
+    class Meta:
+        model = PayOut
+        fields = ["user", "admin", "user__role", "start_date", "end_date"]
+
+
+class PayMeFilter(filters.FilterSet):
+    start_date = filters.DateFilter(field_name="created_at", lookup_expr="gte")
+    end_date = filters.DateFilter(field_name="created_at", lookup_expr="lte")
+
+    class Meta:
+        model = PayMe
+        fields = ["user", "payed", "user__role", "start_date", "end_date"]
+
+
+class ScanFilter(filters.FilterSet):
+    start_date = filters.DateFilter(field_name="scannered_at", lookup_expr="gte")
+    end_date = filters.DateFilter(field_name="scannered_at", lookup_expr="lte")
+
+    class Meta:
+        model = EcoPacketQrCode
+        fields = ["category", "user", "life_cycle__box", "start_date", "end_date"]
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.bank.services.ledger import COMPACT_BATCH_SIZE, compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Ledger delta'larini BankAccount.capital va Box.seller_share ga o'tkazish "
+        "(SETTLEMENT_LEDGER rejimi)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=COMPACT_BATCH_SIZE,
+            help=f"Bitta tranzaksiyadagi delta'lar soni (standart {COMPACT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Berilsa, har shuncha soniyada qayta ishga tushadi (worker rejimi)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            capital, seller_share = compact(batch_size=options["batch_size"])
+            if capital or seller_share or options["interval"] is None:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"capital: {capital} ta delta, "
+                        f"seller_share: {seller_share} ta delta o'tkazildi"
+                    )
+                )
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
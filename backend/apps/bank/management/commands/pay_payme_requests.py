@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.bank.services.payout import CHUNK_SIZE, PAID, pay_requests, pending_ids
+
+
+class Command(BaseCommand):
+    help = "Kutilayotgan PayMe so'rovlarini ommaviy to'lash (PayOut yaratiladi)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--admin",
+            required=True,
+            help="To'lovni amalga oshiruvchi admin telefon raqami",
+        )
+        parser.add_argument(
+            "--id", type=int, action="append", help="PayMe id (bir necha marta)"
+        )
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            help="PayMeFilter parametri: kalit=qiymat (masalan, user__role=AGENT)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            admin = get_user_model().objects.get(phone_number=options["admin"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"{options['admin']} foydalanuvchisi topilmadi")
+
+        filters = {}
+        for item in options["filter"]:
+            key, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"--filter kalit=qiymat bo'lishi kerak: {item}")
+            filters[key] = value
+
+        try:
+            pks = pending_ids(ids=options["id"], filters=filters)
+        except ValueError as error:
+            raise CommandError(error)
+
+        report = pay_requests(pks, admin, chunk_size=options["chunk_size"])
+        for row in report:
+            if row["status"] != PAID:
+                self.stdout.write(
+                    f"#{row['id']} user={row['user']} {row['amount']}: {row['status']}"
+                )
+        paid = sum(1 for row in report if row["status"] == PAID)
+        self.stdout.write(
+            self.style.SUCCESS(f"{paid} ta to'landi, {len(report) - paid} ta o'tkazildi")
+        )
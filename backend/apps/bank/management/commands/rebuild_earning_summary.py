@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.bank.services.summary import rebuild
+
+
+class Command(BaseCommand):
+    help = "EarningSummary jadvalini Earning'lardan qayta yozish"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--account",
+            type=int,
+            action="append",
+            help="Faqat shu bank hisob(lar)i (bir necha marta berish mumkin)",
+        )
+
+    def handle(self, *args, **options):
+        rows = rebuild(options["account"])
+        self.stdout.write(self.style.SUCCESS(f"{rows} ta yig'indi qatori yozildi"))
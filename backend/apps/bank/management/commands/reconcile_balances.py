@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from apps.bank.services.reconcile import REPAIR_BATCH_SIZE, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "BankAccount balanslarini Earning, jarima, PayOut va Application "
+        "yozuvlari bilan solishtirish"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Farqlarni kutilgan balansga tuzatish",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Faqat oxirgi ishga tushishdan keyin o'zgargan hisoblarni tekshirish",
+        )
+        parser.add_argument(
+            "--include-inactive",
+            action="store_true",
+            help="O'chirilgan (is_active=False) foydalanuvchilarni ham tekshirish",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=REPAIR_BATCH_SIZE,
+            help=f"Bitta tranzaksiyada tuzatiladigan hisoblar (standart {REPAIR_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        def report(account_id, actual, expected):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"  BankAccount {account_id}: balans={actual}, "
+                    f"kutilgan={expected}, farq={actual - expected}"
+                )
+            )
+
+        run = reconcile(
+            repair_discrepancies=options["repair"],
+            incremental=options["incremental"],
+            include_inactive=options["include_inactive"],
+            batch_size=options["batch_size"],
+            on_discrepancy=report,
+        )
+
+        mode = "incremental" if run.incremental else "to'liq"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Tekshiruv ({mode}): {run.accounts_checked} ta hisob, "
+                f"{run.discrepancies} ta farq, {run.repaired} ta tuzatildi"
+            )
+        )
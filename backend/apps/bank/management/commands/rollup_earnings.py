@@ -0,0 +1,49 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.bank.services.rollup import catch_up, get_state, rebuild_day
+
+
+class Command(BaseCommand):
+    help = "Earning'larning kunlik rollup jadvalini (EarningDailyRollup) yangilash"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--until",
+            type=str,
+            help="Shu sanagacha (YYYY-MM-DD, standart - kecha)",
+        )
+        parser.add_argument(
+            "--rebuild-from",
+            type=str,
+            help="Shu sanadan boshlab yopilgan kunlarni qaytadan yozish (YYYY-MM-DD)",
+        )
+
+    def parse(self, value, option):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"{option} YYYY-MM-DD formatida bo'lishi kerak")
+        return day
+
+    def handle(self, *args, **options):
+        until = options["until"] and self.parse(options["until"], "--until")
+
+        if options["rebuild_from"]:
+            day = self.parse(options["rebuild_from"], "--rebuild-from")
+            complete_through = get_state().complete_through
+            rebuilt = 0
+            while complete_through is not None and day <= complete_through:
+                rebuild_day(day)
+                day += timedelta(days=1)
+                rebuilt += 1
+            self.stdout.write(f"{rebuilt} ta kun qaytadan yozildi")
+
+        days, partitions = catch_up(until)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{days} ta yangi kun, {partitions} ta kechikkan bo'lim yangilandi; "
+                f"rollup {get_state().complete_through} gacha to'liq"
+            )
+        )
@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.bank.models import ExportJob
+from apps.bank.services.export import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Navbatdagi eksport ishlarini (ExportJob) bajarish"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--job",
+            type=int,
+            help="Faqat shu ishni bajarish / davom ettirish (masalan, failed)",
+        )
+        parser.add_argument(
+            "--stale-minutes",
+            type=int,
+            default=10,
+            help="Shuncha daqiqa yangilanmagan running ish qayta olinadi",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Berilsa, har shuncha soniyada navbat tekshiriladi (worker rejimi)",
+        )
+
+    def run(self, job):
+        try:
+            run_job(job)
+        except Exception as error:
+            self.stderr.write(f"#{job.pk} {job.kind}: {error}")
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"#{job.pk} {job.kind}: {job.rows_written} ta qator -> {job.file.name}"
+                )
+            )
+
+    def handle(self, *args, **options):
+        if options["job"]:
+            self.run(ExportJob.objects.get(pk=options["job"]))
+            return
+
+        stale_after = timedelta(minutes=options["stale_minutes"])
+        while True:
+            job = claim_job(stale_after)
+            if job is not None:
+                self.run(job)
+                continue
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0006_qrchecklog'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='qrchecklog',
+            name='request_time',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0007_alter_qrchecklog_request_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapitalDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('bank_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='capital_deltas', to='bank.bankaccount')),
+            ],
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0009_reconciliationrun'),
+        ('ecopacket', '0021_sellersharedelta'),
+        ('packet', '0006_packet_packet_qr_code_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarningDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('tarrif', models.CharField(max_length=200)),
+                ('is_penalty', models.BooleanField(default=False)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('amount', models.BigIntegerField(default=0)),
+                ('penalty_amount', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EarningRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('complete_through', models.DateField(blank=True, null=True)),
+                ('last_earning_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='earning',
+            index=models.Index(fields=['created_at'], name='earning_created_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='earningdailyrollup',
+            name='bank_account',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bank.bankaccount'),
+        ),
+        migrations.AddField(
+            model_name='earningdailyrollup',
+            name='box',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ecopacket.box'),
+        ),
+        migrations.AddIndex(
+            model_name='earningdailyrollup',
+            index=models.Index(fields=['date'], name='earning_rollup_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='earningdailyrollup',
+            index=models.Index(fields=['bank_account', 'date'], name='earning_rollup_account_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_summary(apps, schema_editor):
+    """Mavjud Earning'lardan EarningSummary ni to'ldirish"""
+    Earning = apps.get_model("bank", "Earning")
+    EarningSummary = apps.get_model("bank", "EarningSummary")
+
+    rows = (
+        Earning.objects.values("bank_account_id", "tarrif", "is_penalty")
+        .annotate(
+            count=Count("id"),
+            amount=Sum("amount"),
+            penalty_amount=Sum("penalty_amount"),
+        )
+        .order_by()
+    )
+    EarningSummary.objects.bulk_create(
+        (EarningSummary(**row) for row in rows.iterator(chunk_size=5000)),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bank', '0011_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarningSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tarrif', models.CharField(max_length=200)),
+                ('is_penalty', models.BooleanField(default=False)),
+                ('count', models.BigIntegerField(default=0)),
+                ('amount', models.BigIntegerField(default=0)),
+                ('penalty_amount', models.BigIntegerField(default=0)),
+                ('bank_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='bank.bankaccount')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bank_account', 'tarrif', 'is_penalty'), name='earning_summary_uniq')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='earning',
+            index=models.Index(fields=['bank_account', '-id'], name='earning_account_id_idx'),
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
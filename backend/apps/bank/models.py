@@ -1,16 +1,64 @@
 from django.db import models
-from django.db.models import Count
+from django.utils import timezone
+from django.conf import settings
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 
 # Create your models here.
 
 
+class BankAccountQuerySet(models.QuerySet):
+    def with_pending(self):
+        """Hali capital'ga qo'shilmagan CapitalDelta yig'indisi (pending_capital)"""
+        pending = (
+            CapitalDelta.objects.filter(bank_account=OuterRef("pk"))
+            .order_by()
+            .values("bank_account")
+            .annotate(total=Sum("amount"))
+            .values("total")
+        )
+        return self.annotate(
+            pending_capital=Coalesce(
+                Subquery(pending, output_field=models.BigIntegerField()), Value(0)
+            )
+        )
+
+
 class BankAccount(models.Model):
     user = models.OneToOneField("account.user", on_delete=models.CASCADE)
     capital = models.PositiveBigIntegerField(default=0)
 
+    objects = BankAccountQuerySet.as_manager()
+
     def __str__(self) -> str:
         return f"{self.user.first_name} {self.capital}"
 
+    @property
+    def balance(self):
+        """capital + hali compact qilinmagan delta'lar (ledger rejimi)"""
+        pending = getattr(self, "pending_capital", None)
+        if pending is None:
+            if not settings.SETTLEMENT_LEDGER:
+                return self.capital
+            pending = self.capital_deltas.aggregate(total=Sum("amount"))["total"]
+        return self.capital + (pending or 0)
+
+
+class CapitalDelta(models.Model):
+    """
+    Ledger rejimida skanerlash summalari capital'ni o'zgartirmasdan shu
+    jadvalga qo'shiladi; compact_ledger buyrug'i ularni capital'ga o'tkazadi.
+    """
+
+    bank_account = models.ForeignKey(
+        BankAccount, on_delete=models.CASCADE, related_name="capital_deltas"
+    )
+    amount = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.bank_account_id} {self.amount}"
+
 
 class Earning(models.Model):
     bank_account = models.ForeignKey("bank.BankAccount", on_delete=models.CASCADE)
@@ -27,10 +75,99 @@ class Earning(models.Model):
     penalty_amount = models.PositiveBigIntegerField(default=0)
     reason = models.TextField(blank=True, default="")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], name="earning_created_at_idx"),
+            # Foydalanuvchi ro'yxati (keyset, -id tartibida)
+            models.Index(fields=["bank_account", "-id"], name="earning_account_id_idx"),
+        ]
+
     def __str__(self) -> str:
         return f"{self.bank_account.user} {self.amount} {self.tarrif}"
 
 
+class EarningDailyRollup(models.Model):
+    """
+    Earning'larning kunlik yig'indilari (date, hisob, box, tarif, jarima).
+
+    rollup_earnings buyrug'i yopilgan kunlarni EarningRollupState.complete_through
+    gacha yozadi; ochiq kunlar xom Earning jadvalidan hisoblanadi.
+    """
+
+    date = models.DateField()
+    bank_account = models.ForeignKey(
+        BankAccount, on_delete=models.CASCADE, related_name="+"
+    )
+    box = models.ForeignKey(
+        "ecopacket.Box",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    tarrif = models.CharField(max_length=200)
+    is_penalty = models.BooleanField(default=False)
+    count = models.PositiveIntegerField(default=0)
+    amount = models.BigIntegerField(default=0)
+    penalty_amount = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["date"], name="earning_rollup_date_idx"),
+            models.Index(
+                fields=["bank_account", "date"], name="earning_rollup_account_idx"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.date} {self.bank_account_id} {self.tarrif} {self.amount}"
+
+
+class EarningSummary(models.Model):
+    """
+    Hisob bo'yicha Earning'lar yig'indisi (tarif, jarima) - mobil ro'yxat
+    sarlavhasi uchun. Har bir Earning yozilganda va jarimaga aylanganda
+    services.summary orqali o'zgartiriladi.
+    """
+
+    bank_account = models.ForeignKey(
+        BankAccount, on_delete=models.CASCADE, related_name="+"
+    )
+    tarrif = models.CharField(max_length=200)
+    is_penalty = models.BooleanField(default=False)
+    count = models.BigIntegerField(default=0)
+    amount = models.BigIntegerField(default=0)
+    penalty_amount = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["bank_account", "tarrif", "is_penalty"],
+                name="earning_summary_uniq",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.bank_account_id} {self.tarrif} {self.count}"
+
+
+class EarningRollupState(models.Model):
+    """
+    EarningDailyRollup holati (bitta qator).
+
+    complete_through - shu kungacha (shu kun ham) rollup to'liq;
+    last_earning_id - oxirgi ishga tushishda ko'rilgan Earning id'si (undan
+    keyin kelgan, lekin yopilgan kunga tegishli yozuvlar qayta hisoblanadi).
+    """
+
+    complete_through = models.DateField(null=True, blank=True)
+    last_earning_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return f"{self.complete_through} {self.last_earning_id}"
+
+
 class PayOut(models.Model):
     user = models.ForeignKey(
         "account.user", on_delete=models.CASCADE, related_name="payout_user"
@@ -127,7 +264,8 @@ class QrCheckLog(models.Model):
     """QR kod tekshirish so'rovlarini saqlash uchun model"""
 
     qr_code = models.CharField(max_length=255)
-    request_time = models.DateTimeField(auto_now_add=True)
+    # Yozuvlar buferdan kechikib yoziladi - vaqt so'rov paytida beriladi
+    request_time = models.DateTimeField(default=timezone.now, editable=False)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
     qr_type = models.CharField(
@@ -143,3 +281,70 @@ class QrCheckLog(models.Model):
 
     def __str__(self) -> str:
         return f"{self.qr_code} - {self.request_time}"
+
+
+class ReconciliationRun(models.Model):
+    """
+    reconcile_balances buyrug'i ishga tushishlari.
+
+    last_*_id - ishga tushish paytidagi eng katta id'lar (watermark):
+    --incremental keyingi ishga tushishda faqat shulardan keyin o'zgargan
+    hisoblarni tekshiradi.
+    """
+
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    incremental = models.BooleanField(default=False)
+    last_earning_id = models.BigIntegerField(default=0)
+    last_payout_id = models.BigIntegerField(default=0)
+    last_application_id = models.BigIntegerField(default=0)
+    accounts_checked = models.PositiveIntegerField(default=0)
+    discrepancies = models.PositiveIntegerField(default=0)
+    repaired = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.started_at} {self.discrepancies}/{self.accounts_checked}"
+
+
+class ExportFormat(models.TextChoices):
+    CSV = "csv", "CSV"
+    XLSX = "xlsx", "XLSX"
+
+
+class ExportStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    RUNNING = "running", "Running"
+    DONE = "done", "Done"
+    FAILED = "failed", "Failed"
+
+
+class ExportJob(models.Model):
+    """
+    Katta eksport - run_exports buyrug'i faylni MEDIA_ROOT/exports ga yozadi.
+
+    last_id / bytes_written - oxirgi saqlangan chunk: to'xtatilgan CSV
+    eksport shu joydan davom ettiriladi.
+    """
+
+    kind = models.CharField(max_length=20)
+    file_format = models.CharField(
+        max_length=4, choices=ExportFormat.choices, default=ExportFormat.CSV
+    )
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10, choices=ExportStatus.choices, default=ExportStatus.PENDING
+    )
+    file = models.FileField(upload_to="exports/", blank=True)
+    rows_written = models.BigIntegerField(default=0)
+    last_id = models.BigIntegerField(default=0)
+    bytes_written = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_by = models.ForeignKey(
+        "account.user", on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.kind}.{self.file_format} {self.status}"
@@ -1,11 +1,20 @@
 from rest_framework import serializers
-from .models import Earning, BankAccount, PayOut, PayMe, Application, PaymentType
+from .models import (
+    Earning,
+    BankAccount,
+    ExportJob,
+    PayOut,
+    PayMe,
+    Application,
+    PaymentType,
+)
 from apps.ecopacket.models import Box
 from apps.account.serializers import (
     UserAdminRetrieveSerializer,
     UserEarningSerializer,
     UserLoginSerializer,
 )
+from apps.bank.services.export import InvalidExport, get_queryset
 from apps.packet.serializers import PacketSerializerCreate
 
 
@@ -57,6 +66,8 @@ class MobileEarningListSerializer(serializers.ModelSerializer):
 
 class BankAccountSerializer(serializers.ModelSerializer):
     user = UserAdminRetrieveSerializer(read_only=True)
+    # Ledger rejimida compact qilinmagan delta'lar ham qo'shiladi
+    capital = serializers.IntegerField(source="balance", read_only=True)
 
     class Meta:
         model = BankAccount
@@ -131,9 +142,9 @@ class ApplicationCreateSerializer(serializers.ModelSerializer):
             if not agent_bank_account:
                 raise serializers.ValidationError("Agent bank account is required")
 
-            if agent_bank_account.capital < amount:
+            if agent_bank_account.balance < amount:
                 raise serializers.ValidationError(
-                    f"Insufficient balance. Required: {amount}, Available: {agent_bank_account.capital}"
+                    f"Insufficient balance. Required: {amount}, Available: {agent_bank_account.balance}"
                 )
 
         return data
@@ -185,3 +196,35 @@ class AgentPayOutListSerializer(serializers.ModelSerializer):
     class Meta:
         model = PayOut
         fields = ["id", "amount", "card", "card_name", "created_at", "admin"]
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExportJob
+        fields = (
+            "id",
+            "kind",
+            "file_format",
+            "params",
+            "status",
+            "file",
+            "rows_written",
+            "error",
+            "created_at",
+            "finished_at",
+        )
+        read_only_fields = (
+            "status",
+            "file",
+            "rows_written",
+            "error",
+            "created_at",
+            "finished_at",
+        )
+
+    def validate(self, attrs):
+        try:
+            get_queryset(attrs["kind"], attrs.get("params", {}))
+        except InvalidExport as error:
+            raise serializers.ValidationError(error.errors)
+        return attrs
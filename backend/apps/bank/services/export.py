@@ -0,0 +1,288 @@
+"""
+Earning, PayOut, PayMe va skanerlash tarixini CSV / XLSX ga eksport qilish.
+
+Qatorlar values_list proyeksiyasi bilan id tartibida chunk'lab o'qiladi -
+serializer yoki model obyektlari yaratilmaydi, xotira qatorlar soniga
+bog'liq emas.
+
+    - stream_csv() - StreamingHttpResponse uchun generator (HTTP eksport);
+    - run_job() - ExportJob faylini MEDIA_ROOT/exports ga yozadi. CSV har bir
+      chunk'dan keyin last_id / bytes_written bilan saqlanadi va to'xtatilsa
+      shu joydan davom etadi; XLSX (zip arxiv) qaytadan yoziladi.
+"""
+
+import csv
+import os
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from openpyxl import Workbook
+
+from apps.bank.filters import EarningFilter, PayMeFilter, PayOutFilter, ScanFilter
+from apps.bank.models import (
+    Earning,
+    ExportFormat,
+    ExportJob,
+    ExportStatus,
+    PayMe,
+    PayOut,
+)
+from apps.ecopacket.models import EcoPacketQrCode
+
+CHUNK_SIZE = 2000
+# Excel varag'idagi maksimal qatorlar (sarlavhadan tashqari)
+XLSX_MAX_ROWS = 1048575
+EXPORT_DIR = "exports"
+
+# nom -> (model, filtr, qo'shimcha shart, [(sarlavha, maydon), ...])
+EXPORTS = {
+    "earnings": (
+        Earning,
+        EarningFilter,
+        Q(),
+        [
+            ("id", "id"),
+            ("created_at", "created_at"),
+            ("phone_number", "bank_account__user__phone_number"),
+            ("first_name", "bank_account__user__first_name"),
+            ("last_name", "bank_account__user__last_name"),
+            ("role", "bank_account__user__role"),
+            ("tarrif", "tarrif"),
+            ("amount", "amount"),
+            ("is_penalty", "is_penalty"),
+            ("penalty_amount", "penalty_amount"),
+            ("reason", "reason"),
+            ("box", "box__name"),
+            ("packet", "packet__qr_code"),
+        ],
+    ),
+    "payouts": (
+        PayOut,
+        PayOutFilter,
+        Q(),
+        [
+            ("id", "id"),
+            ("created_at", "created_at"),
+            ("phone_number", "user__phone_number"),
+            ("first_name", "user__first_name"),
+            ("last_name", "user__last_name"),
+            ("amount", "amount"),
+            ("card", "card"),
+            ("card_name", "card_name"),
+            ("admin", "admin__phone_number"),
+        ],
+    ),
+    "payme": (
+        PayMe,
+        PayMeFilter,
+        Q(),
+        [
+            ("id", "id"),
+            ("created_at", "created_at"),
+            ("phone_number", "user__phone_number"),
+            ("first_name", "user__first_name"),
+            ("last_name", "user__last_name"),
+            ("role", "user__role"),
+            ("amount", "amount"),
+            ("card", "card"),
+            ("card_name", "card_name"),
+            ("payed", "payed"),
+        ],
+    ),
+    "scans": (
+        EcoPacketQrCode,
+        ScanFilter,
+        Q(scannered_at__isnull=False),
+        [
+            ("id", "id"),
+            ("scannered_at", "scannered_at"),
+            ("qr_code", "qr_code"),
+            ("category", "category__name"),
+            ("phone_number", "user__phone_number"),
+            ("first_name", "user__first_name"),
+            ("last_name", "user__last_name"),
+            ("box", "life_cycle__box__name"),
+        ],
+    ),
+}
+
+
+class InvalidExport(Exception):
+    """Noma'lum eksport turi yoki noto'g'ri filtr parametrlari"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def get_queryset(kind, params):
+    """
+    Filtrlangan queryset va ustunlar.
+
+    Raises:
+        InvalidExport
+    """
+    if kind not in EXPORTS:
+        raise InvalidExport({"kind": [f"'{kind}' eksport turi mavjud emas"]})
+    model, filterset_class, condition, columns = EXPORTS[kind]
+
+    filterset = filterset_class(data=params, queryset=model.objects.filter(condition))
+    if not filterset.is_valid():
+        raise InvalidExport(filterset.errors)
+    return filterset.qs.order_by(), columns
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).replace(tzinfo=None, microsecond=0)
+    return value
+
+
+def iter_chunks(queryset, columns, after_id=0, chunk_size=CHUNK_SIZE):
+    """
+    id tartibida (oxirgi_id, qatorlar) chunk'lari - keyset: har bir chunk
+    alohida qisqa so'rov (WHERE id > ... ORDER BY id LIMIT n).
+    """
+    fields = [field for _, field in columns]
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=after_id)
+            .order_by("pk")
+            .values_list("pk", *fields)[:chunk_size]
+        )
+        if not rows:
+            return
+        after_id = rows[-1][0]
+        yield after_id, [[_cell(value) for value in row[1:]] for row in rows]
+
+
+class _Echo:
+    """csv.writer uchun - yozilgan qatorni qaytaradi"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(queryset, columns):
+    """CSV matni (chunk bo'yicha) - StreamingHttpResponse uchun"""
+    writer = csv.writer(_Echo())
+    # BOM - Excel UTF-8 (kirill, o'zbek) matnni to'g'ri ochishi uchun
+    yield "\ufeff" + writer.writerow([header for header, _ in columns])
+    for _, rows in iter_chunks(queryset, columns):
+        yield "".join(writer.writerow(row) for row in rows)
+
+
+def file_name(job):
+    return f"{EXPORT_DIR}/{job.kind}-{job.pk}.{job.file_format}"
+
+
+def _write_csv(job, queryset, columns, path):
+    if job.last_id and os.path.exists(path):
+        # Oxirgi saqlangan chunk'dan keyin yozilgan qism tashlanadi
+        output = open(path, "r+b")
+        output.truncate(job.bytes_written)
+        output.seek(job.bytes_written)
+    else:
+        output = open(path, "wb")
+        job.last_id = job.rows_written = 0
+
+    with output:
+        writer = csv.writer(_Echo())
+        if not job.last_id:
+            header = writer.writerow([header for header, _ in columns])
+            output.write(("\ufeff" + header).encode())
+        for last_id, rows in iter_chunks(queryset, columns, job.last_id):
+            output.write("".join(writer.writerow(row) for row in rows).encode())
+            output.flush()
+            os.fsync(output.fileno())
+            job.last_id = last_id
+            job.rows_written += len(rows)
+            job.bytes_written = output.tell()
+            job.save(
+                update_fields=["last_id", "rows_written", "bytes_written", "updated_at"]
+            )
+
+
+def _write_xlsx(job, queryset, columns, path):
+    # write_only - qatorlar diskdagi vaqtinchalik faylga yoziladi
+    workbook = Workbook(write_only=True)
+    headers = [header for header, _ in columns]
+    sheet = None
+    sheet_rows = 0
+    job.last_id = job.rows_written = 0
+
+    for last_id, rows in iter_chunks(queryset, columns):
+        for row in rows:
+            if sheet is None or sheet_rows >= XLSX_MAX_ROWS:
+                sheet = workbook.create_sheet()
+                sheet.append(headers)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+        job.last_id = last_id
+        job.rows_written += len(rows)
+        job.save(update_fields=["last_id", "rows_written", "updated_at"])
+
+    if sheet is None:
+        workbook.create_sheet().append(headers)
+    workbook.save(path)
+
+
+def run_job(job):
+    """
+    Eksport faylini yozish (to'xtatilgan bo'lsa davom ettirish).
+
+    Returns:
+        ExportJob
+    """
+    job.status = ExportStatus.RUNNING
+    job.error = ""
+    job.file.name = file_name(job)
+    job.save(update_fields=["status", "error", "file", "updated_at"])
+
+    path = os.path.join(settings.MEDIA_ROOT, job.file.name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        queryset, columns = get_queryset(job.kind, job.params)
+        if job.file_format == ExportFormat.XLSX:
+            _write_xlsx(job, queryset, columns, path)
+        else:
+            _write_csv(job, queryset, columns, path)
+    except Exception as error:
+        job.status = ExportStatus.FAILED
+        job.error = str(error)
+        job.save(update_fields=["status", "error", "updated_at"])
+        raise
+
+    job.status = ExportStatus.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "finished_at", "updated_at"])
+    return job
+
+
+def claim_job(stale_after):
+    """
+    Navbatdagi ish: kutayotgan yoki worker'i to'xtab qolgan (updated_at
+    stale_after dan eski) bajarilayotgan ish. Bir nechta worker bir ishni
+    olmaydi (skip_locked).
+    """
+    with transaction.atomic():
+        job = (
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=ExportStatus.PENDING)
+                | Q(
+                    status=ExportStatus.RUNNING,
+                    updated_at__lt=timezone.now() - stale_after,
+                )
+            )
+            .order_by("pk")
+            .first()
+        )
+        if job is not None:
+            job.status = ExportStatus.RUNNING
+            job.save(update_fields=["status", "updated_at"])
+    return job
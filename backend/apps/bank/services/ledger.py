@@ -0,0 +1,188 @@
+"""
+Balans o'zgarishlari (ledger) servisi.
+
+Oddiy rejimda kreditlar BankAccount.capital va Box.seller_share ga F()
+ifodasi bilan darhol qo'shiladi. SETTLEMENT_LEDGER yoqilganda skanerlash
+qatorlarni bloklamaydi - summalar CapitalDelta / SellerShareDelta
+jadvallariga INSERT qilinadi, compact() esa ularni vaqti-vaqti bilan
+capital / seller_share ga o'tkazadi. Balansni o'qish
+BankAccount.balance / Box.seller_share_balance orqali (asos + delta'lar).
+
+Yechib olish (debit) va balansni nollash hisob qatorini select_for_update
+bilan bloklab, avval uning delta'larini capital'ga o'tkazadi. compact() ham
+qatorlarni delta'larni o'qishdan oldin bloklaydi, shuning uchun bitta delta
+ikki marta hisoblanmaydi.
+"""
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+
+from apps.bank.models import BankAccount, CapitalDelta
+from apps.ecopacket.models import Box, SellerShareDelta
+
+COMPACT_BATCH_SIZE = 5000
+
+
+class InsufficientBalance(Exception):
+    """Hisobda yetarli mablag' yo'q"""
+
+
+def add_to_capital(totals):
+    """Bank hisoblarini bitta UPDATE bilan o'zgartirish: {bank_account_id: summa}"""
+    totals = {pk: amount for pk, amount in totals.items() if amount}
+    if not totals:
+        return
+
+    BankAccount.objects.filter(pk__in=totals).update(
+        capital=F("capital")
+        + Case(
+            *[When(pk=pk, then=Value(amount)) for pk, amount in totals.items()],
+            default=Value(0),
+            output_field=models.BigIntegerField(),
+        )
+    )
+
+
+def add_to_seller_share(totals):
+    """Box.seller_share ni bitta UPDATE bilan oshirish: {box_id: summa}"""
+    totals = {pk: amount for pk, amount in totals.items() if amount}
+    if not totals:
+        return
+
+    Box.objects.filter(pk__in=totals).update(
+        seller_share=F("seller_share")
+        + Case(
+            *[When(pk=pk, then=Value(amount)) for pk, amount in totals.items()],
+            default=Value(0),
+            output_field=models.DecimalField(max_digits=20, decimal_places=2),
+        )
+    )
+
+
+def credit_accounts(totals):
+    """
+    Hisoblarga pul qo'shish: {bank_account_id: summa}.
+
+    Ledger rejimida faqat CapitalDelta qatorlari qo'shiladi.
+    """
+    totals = {pk: amount for pk, amount in totals.items() if amount}
+    if not totals:
+        return
+
+    if settings.SETTLEMENT_LEDGER:
+        CapitalDelta.objects.bulk_create(
+            CapitalDelta(bank_account_id=pk, amount=amount)
+            for pk, amount in totals.items()
+        )
+    else:
+        add_to_capital(totals)
+
+
+def credit_seller_share(box_pk, amount):
+    """Box.seller_share ga ulush qo'shish (ledger rejimida SellerShareDelta)"""
+    if not amount:
+        return
+
+    if settings.SETTLEMENT_LEDGER:
+        SellerShareDelta.objects.create(box_id=box_pk, amount=amount)
+    else:
+        add_to_seller_share({box_pk: amount})
+
+
+def _fold_account(account):
+    """Bloklangan hisobning delta'larini capital'ga o'tkazish"""
+    # Faqat o'qilgan qatorlar o'chiriladi - keyin qo'shilganlari yo'qolmaydi
+    deltas = dict(account.capital_deltas.values_list("pk", "amount"))
+    if deltas:
+        account.capital += sum(deltas.values())
+        BankAccount.objects.filter(pk=account.pk).update(capital=account.capital)
+        CapitalDelta.objects.filter(pk__in=deltas).delete()
+
+
+def debit(bank_account_id, amount):
+    """
+    Hisobdan pul yechish (to'lov, jarima, ariza).
+
+    Returns:
+        int: yangi capital
+
+    Raises:
+        BankAccount.DoesNotExist
+        InsufficientBalance
+    """
+    with transaction.atomic():
+        account = BankAccount.objects.select_for_update().get(pk=bank_account_id)
+        _fold_account(account)
+        if account.capital < amount:
+            raise InsufficientBalance(account.capital)
+        account.capital -= amount
+        BankAccount.objects.filter(pk=account.pk).update(capital=account.capital)
+    return account.capital
+
+
+def reset_balance(bank_account_id):
+    """Hisobni nollash (foydalanuvchi o'chirilganda) - delta'lar ham o'chiriladi"""
+    with transaction.atomic():
+        account = BankAccount.objects.select_for_update().get(pk=bank_account_id)
+        account.capital_deltas.all().delete()
+        BankAccount.objects.filter(pk=account.pk).update(capital=0)
+
+
+def _compact(delta_model, owner_model, owner_field, add, batch_size):
+    """
+    Delta'larni id tartibida batch_size tadan asosiy ustunga o'tkazish.
+
+    Har bir batch alohida tranzaksiya: avval egalar qatorlari bloklanadi,
+    so'ng delta'lar qayta o'qiladi (debit() o'tkazib bo'lganlari kirmaydi),
+    yig'indilar bitta UPDATE bilan qo'shiladi va aynan o'qilgan delta'lar
+    o'chiriladi.
+
+    Returns:
+        int: o'tkazilgan delta'lar soni
+    """
+    folded = 0
+    while True:
+        with transaction.atomic():
+            candidates = dict(
+                delta_model.objects.order_by("pk").values_list("pk", owner_field)[
+                    :batch_size
+                ]
+            )
+            if not candidates:
+                return folded
+
+            list(
+                owner_model.objects.select_for_update()
+                .filter(pk__in=set(candidates.values()))
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+
+            totals = {}
+            pks = []
+            for pk, owner, amount in delta_model.objects.filter(
+                pk__in=candidates
+            ).values_list("pk", owner_field, "amount"):
+                totals[owner] = totals.get(owner, 0) + amount
+                pks.append(pk)
+
+            add(totals)
+            delta_model.objects.filter(pk__in=pks).delete()
+            folded += len(pks)
+
+
+def compact(batch_size=COMPACT_BATCH_SIZE):
+    """
+    Barcha delta'larni capital va seller_share ga o'tkazish.
+
+    Returns:
+        (capital_deltas, seller_share_deltas): o'tkazilgan delta'lar soni
+    """
+    capital = _compact(
+        CapitalDelta, BankAccount, "bank_account_id", add_to_capital, batch_size
+    )
+    seller_share = _compact(
+        SellerShareDelta, Box, "box_id", add_to_seller_share, batch_size
+    )
+    return capital, seller_share
@@ -0,0 +1,157 @@
+"""
+PayMe so'rovlarini (to'lov arizalari) ommaviy to'lash.
+
+Har bir chunk alohida tranzaksiya:
+    1. PayMe qatorlari va ularning bank hisoblari pk tartibida
+       select_for_update bilan bloklanadi (parallel debit() / compact()
+       bilan deadlock bo'lmaydi);
+    2. hisoblarning compact qilinmagan CapitalDelta'lari o'qiladi
+       (ledger rejimi), balanslar xotirada tekshiriladi - bitta hisobning
+       bir nechta so'rovi pk tartibida ketma-ket yechiladi;
+    3. PayOut'lar bitta bulk_create bilan yoziladi, capital bitta
+       UPDATE ... FROM (VALUES ...) bilan o'zgaradi (delta'lar ham shu
+       yerda capital'ga o'tkaziladi), PayMe'lar bitta UPDATE bilan to'langan
+       deb belgilanadi.
+"""
+
+from django.db import connection, transaction
+
+from apps.bank.filters import PayMeFilter
+from apps.bank.models import BankAccount, CapitalDelta, PayMe, PayOut
+
+CHUNK_SIZE = 200
+
+PAID = "paid"
+ALREADY_PAID = "already_paid"
+INSUFFICIENT = "insufficient"
+NO_ACCOUNT = "no_account"
+NOT_FOUND = "not_found"
+
+
+def pending_ids(ids=None, filters=None):
+    """
+    To'lanadigan PayMe id'lari (pk tartibida).
+
+    Raises:
+        ValueError: filtr parametrlari noto'g'ri
+    """
+    queryset = PayMe.objects.filter(payed=False)
+    if filters:
+        filterset = PayMeFilter(data=filters, queryset=queryset)
+        if not filterset.is_valid():
+            raise ValueError(filterset.errors)
+        queryset = filterset.qs
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    return list(queryset.order_by("pk").values_list("pk", flat=True))
+
+
+def _apply_capital(changes):
+    """{bank_account_id: o'zgarish} ni bitta UPDATE ... FROM bilan qo'shish"""
+    if not changes:
+        return
+    quote = connection.ops.quote_name
+    table = quote(BankAccount._meta.db_table)
+    values = ", ".join(["(CAST(%s AS BIGINT), CAST(%s AS BIGINT))"] * len(changes))
+    sql = (
+        f"WITH v (id, change) AS (VALUES {values}) "
+        f"UPDATE {table} SET capital = {table}.capital + v.change "
+        f"FROM v WHERE {table}.id = v.id"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for item in changes.items() for value in item])
+
+
+def _pay_chunk(pks, admin):
+    results = {}
+    with transaction.atomic():
+        requests = list(
+            PayMe.objects.select_for_update()
+            .filter(pk__in=pks)
+            .order_by("pk")
+            .values_list("pk", "user_id", "amount", "payed", "card", "card_name")
+        )
+        locked = list(
+            BankAccount.objects.select_for_update()
+            .filter(user__in={row[1] for row in requests if row[1]})
+            .order_by("pk")
+            .values_list("user_id", "pk", "capital")
+        )
+        accounts = {user_id: pk for user_id, pk, _ in locked}
+        capitals = {pk: capital for _, pk, capital in locked}
+
+        # Ledger rejimi: o'qilgan delta'lar shu UPDATE da capital'ga o'tadi
+        deltas = list(
+            CapitalDelta.objects.filter(bank_account__in=capitals).values_list(
+                "pk", "bank_account_id", "amount"
+            )
+        )
+        changes = {}
+        for _, account_id, amount in deltas:
+            changes[account_id] = changes.get(account_id, 0) + amount
+        balances = {pk: capital + changes.get(pk, 0) for pk, capital in capitals.items()}
+
+        payouts = []
+        paid = []
+        for pk, user_id, amount, payed, card, card_name in requests:
+            account_id = accounts.get(user_id)
+            if payed:
+                results[pk] = (ALREADY_PAID, user_id, amount)
+            elif account_id is None:
+                results[pk] = (NO_ACCOUNT, user_id, amount)
+            elif balances[account_id] < amount:
+                results[pk] = (INSUFFICIENT, user_id, amount)
+            else:
+                balances[account_id] -= amount
+                changes[account_id] = changes.get(account_id, 0) - amount
+                payouts.append(
+                    PayOut(
+                        user_id=user_id,
+                        amount=amount,
+                        admin=admin,
+                        card=card,
+                        card_name=card_name,
+                    )
+                )
+                paid.append(pk)
+                results[pk] = (PAID, user_id, amount)
+
+        _apply_capital({pk: change for pk, change in changes.items() if change})
+        if deltas:
+            CapitalDelta.objects.filter(pk__in=[row[0] for row in deltas]).delete()
+        PayOut.objects.bulk_create(payouts)
+        PayMe.objects.filter(pk__in=paid).update(payed=True)
+
+    return results, balances, accounts
+
+
+def pay_requests(pks, admin, chunk_size=CHUNK_SIZE):
+    """
+    PayMe so'rovlarini to'lash.
+
+    Args:
+        pks: PayMe id'lari
+        admin: PayOut.admin (to'lovni amalga oshirgan foydalanuvchi)
+
+    Returns:
+        list: har bir so'rov uchun {"id", "user", "amount", "status",
+        "balance"} - status: paid, already_paid, insufficient, no_account,
+        not_found; balance - chunk oxiridagi hisob qoldig'i
+    """
+    pks = sorted(set(pks))
+    report = []
+    for start in range(0, len(pks), chunk_size):
+        chunk = pks[start : start + chunk_size]
+        results, balances, accounts = _pay_chunk(chunk, admin)
+        for pk in chunk:
+            status, user_id, amount = results.get(pk, (NOT_FOUND, None, None))
+            report.append(
+                {
+                    "id": pk,
+                    "user": user_id,
+                    "amount": amount,
+                    "status": status,
+                    "balance": balances.get(accounts.get(user_id)),
+                }
+            )
+    return report
@@ -0,0 +1,285 @@
+"""
+BankAccount balanslarini tekshirish (reconciliation).
+
+Kutilayotgan balans:
+    Earning.amount yig'indisi
+    - jarimaga aylantirilgan Earning'lar penalty_amount yig'indisi
+    - PayOut.amount yig'indisi
+    - bank hisobidan to'langan Application.amount yig'indisi
+Haqiqiy balans: capital + compact qilinmagan CapitalDelta'lar.
+
+Har bir manba bank hisobi bo'yicha GROUP BY ... ORDER BY so'rovi bo'lib,
+iterator() orqali (PostgreSQL'da server-side cursor) oqim sifatida o'qiladi;
+oqimlar hisob id'si bo'yicha heapq.merge bilan birlashtiriladi - xotira
+hisoblar soniga bog'liq emas.
+
+Tuzatish (repair) har bir batch uchun qatorlarni select_for_update bilan
+bloklab, balansni bitta so'rovda qayta hisoblaydi - tekshiruv va tuzatish
+orasida kelgan skanerlash noto'g'ri "tuzatilmaydi".
+"""
+
+import heapq
+from itertools import groupby
+
+from django.db import models, transaction
+from django.db.models import Case, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.bank.models import (
+    Application,
+    BankAccount,
+    CapitalDelta,
+    Earning,
+    PaymentType,
+    PayOut,
+    ReconciliationRun,
+)
+
+CHUNK_SIZE = 5000
+REPAIR_BATCH_SIZE = 500
+
+EARNED = "earned"
+PENALTIES = "penalties"
+PAID_OUT = "paid_out"
+APPLICATIONS = "applications"
+PENDING = "pending"
+CAPITAL = "capital"
+
+
+def _sources():
+    """(nom, queryset, hisob id maydoni, summa maydoni)"""
+    return [
+        (EARNED, Earning.objects.all(), "bank_account_id", "amount"),
+        (
+            PENALTIES,
+            Earning.objects.filter(is_penalty=True),
+            "bank_account_id",
+            "penalty_amount",
+        ),
+        (
+            PAID_OUT,
+            PayOut.objects.filter(user__bankaccount__isnull=False),
+            "user__bankaccount",
+            "amount",
+        ),
+        (
+            APPLICATIONS,
+            Application.objects.filter(
+                payment_type=PaymentType.BANK_ACCOUNT,
+                agent__bankaccount__isnull=False,
+            ),
+            "agent__bankaccount",
+            "amount",
+        ),
+        (PENDING, CapitalDelta.objects.all(), "bank_account_id", "amount"),
+    ]
+
+
+def _stream(name, queryset, key, value, account_ids):
+    """(hisob_id, nom, summa) - hisob id'si bo'yicha tartiblangan GROUP BY oqimi"""
+    if account_ids is not None:
+        queryset = queryset.filter(**{f"{key}__in": account_ids})
+    rows = (
+        queryset.order_by()
+        .values(key)
+        .annotate(total=Sum(value))
+        .order_by(key)
+        .values_list(key, "total")
+    )
+    for account_id, total in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield account_id, name, total or 0
+
+
+def expected_balance(totals):
+    return (
+        totals.get(EARNED, 0)
+        - totals.get(PENALTIES, 0)
+        - totals.get(PAID_OUT, 0)
+        - totals.get(APPLICATIONS, 0)
+    )
+
+
+def find_discrepancies(accounts, account_ids=None):
+    """
+    Balansi kutilganidan farq qiladigan hisoblar (generator).
+
+    Args:
+        accounts: tekshiriladigan BankAccount queryset'i
+        account_ids: faqat shu hisoblar (incremental) yoki None
+
+    Yields:
+        (account_id, actual, expected) yoki (account_id, None, None) -
+        har bir tekshirilgan hisob uchun; actual == expected bo'lsa None
+    """
+    if account_ids is not None:
+        accounts = accounts.filter(pk__in=account_ids)
+    account_rows = (
+        (pk, CAPITAL, capital)
+        for pk, capital in accounts.order_by("pk")
+        .values_list("pk", "capital")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    streams = [
+        _stream(name, queryset, key, value, account_ids)
+        for name, queryset, key, value in _sources()
+    ]
+
+    merged = heapq.merge(account_rows, *streams, key=lambda row: row[0])
+    for account_id, rows in groupby(merged, key=lambda row: row[0]):
+        totals = {name: total for _, name, total in rows}
+        # Tekshirilmaydigan (masalan, faol bo'lmagan) hisob
+        if CAPITAL not in totals:
+            continue
+        actual = totals[CAPITAL] + totals.get(PENDING, 0)
+        expected = expected_balance(totals)
+        if actual == expected:
+            yield account_id, None, None
+        else:
+            yield account_id, actual, expected
+
+
+def _sum_subquery(queryset, key, value):
+    subquery = (
+        queryset.filter(**{key: OuterRef("pk")})
+        .order_by()
+        .values(key)
+        .annotate(total=Sum(value))
+        .values("total")
+    )
+    return Coalesce(
+        Subquery(subquery, output_field=models.BigIntegerField()), Value(0)
+    )
+
+
+def repair(account_ids):
+    """
+    Hisoblar capital'ini kutilgan balansga tenglashtirish.
+
+    Qatorlar bloklanadi va balans bitta so'rovda qayta hisoblanadi.
+    Kutilgan balans manfiy bo'lsa hisob tuzatilmaydi.
+
+    Returns:
+        list: tuzatilgan hisoblar id'lari
+    """
+    annotations = {
+        name: _sum_subquery(queryset, key, value)
+        for name, queryset, key, value in _sources()
+    }
+    with transaction.atomic():
+        rows = (
+            BankAccount.objects.select_for_update()
+            .filter(pk__in=account_ids)
+            .order_by("pk")
+            .annotate(**annotations)
+            .values("pk", "capital", *annotations)
+        )
+        fixes = {}
+        for row in rows:
+            capital = expected_balance(row) - row[PENDING]
+            if capital != row["capital"] and capital >= 0:
+                fixes[row["pk"]] = capital
+
+        if fixes:
+            BankAccount.objects.filter(pk__in=fixes).update(
+                capital=Case(
+                    *[
+                        When(pk=pk, then=Value(capital))
+                        for pk, capital in fixes.items()
+                    ],
+                    default=F("capital"),
+                    output_field=models.BigIntegerField(),
+                )
+            )
+    return list(fixes)
+
+
+def watermark():
+    """Joriy eng katta id'lar - keyingi incremental ishga tushish uchun"""
+    return {
+        "last_earning_id": Earning.objects.aggregate(m=Max("pk"))["m"] or 0,
+        "last_payout_id": PayOut.objects.aggregate(m=Max("pk"))["m"] or 0,
+        "last_application_id": Application.objects.aggregate(m=Max("pk"))["m"] or 0,
+    }
+
+
+def changed_accounts(run):
+    """
+    run'dan keyin yangi Earning / PayOut / Application kelgan hisoblar.
+
+    Eski Earning'ni jarimaga aylantirish yangi qator qo'shmaydi - bunday
+    o'zgarishlar keyingi to'liq tekshiruvda aniqlanadi.
+    """
+    return (
+        set(
+            Earning.objects.filter(pk__gt=run.last_earning_id).values_list(
+                "bank_account_id", flat=True
+            )
+        )
+        | set(
+            PayOut.objects.filter(pk__gt=run.last_payout_id).values_list(
+                "user__bankaccount", flat=True
+            )
+        )
+        | set(
+            Application.objects.filter(
+                pk__gt=run.last_application_id,
+                payment_type=PaymentType.BANK_ACCOUNT,
+            ).values_list("agent__bankaccount", flat=True)
+        )
+    ) - {None}
+
+
+def reconcile(
+    repair_discrepancies=False,
+    incremental=False,
+    include_inactive=False,
+    batch_size=REPAIR_BATCH_SIZE,
+    on_discrepancy=None,
+):
+    """
+    Barcha (yoki incremental - o'zgargan) hisoblarni tekshirish.
+
+    Args:
+        on_discrepancy: har bir farq uchun chaqiriladi (account_id, actual, expected)
+
+    Returns:
+        ReconciliationRun
+    """
+    previous = None
+    if incremental:
+        previous = (
+            ReconciliationRun.objects.filter(finished_at__isnull=False)
+            .order_by("-pk")
+            .first()
+        )
+    run = ReconciliationRun.objects.create(
+        incremental=previous is not None, **watermark()
+    )
+
+    accounts = BankAccount.objects.all()
+    if not include_inactive:
+        # O'chirilgan foydalanuvchilar balansi ataylab nollangan
+        accounts = accounts.filter(user__is_active=True)
+    account_ids = changed_accounts(previous) if previous is not None else None
+
+    pending_repair = []
+    for account_id, actual, expected in find_discrepancies(accounts, account_ids):
+        run.accounts_checked += 1
+        if actual is None:
+            continue
+        run.discrepancies += 1
+        if on_discrepancy is not None:
+            on_discrepancy(account_id, actual, expected)
+        if repair_discrepancies:
+            pending_repair.append(account_id)
+            if len(pending_repair) >= batch_size:
+                run.repaired += len(repair(pending_repair))
+                pending_repair = []
+
+    if pending_repair:
+        run.repaired += len(repair(pending_repair))
+
+    run.finished_at = timezone.now()
+    run.save()
+    return run
@@ -0,0 +1,322 @@
+"""
+Earning'larning kunlik rollup jadvali (EarningDailyRollup).
+
+Yopilgan kunlar (EarningRollupState.complete_through gacha) rollup_earnings
+buyrug'i tomonidan (date, hisob, box, tarif, jarima) bo'yicha yig'iladi.
+Skanerlash yo'li hech narsa qo'shimcha yozmaydi - ochiq kun (odatda bugun)
+yig'indisi xom Earning jadvalidan created_at indeksi bo'yicha olinadi.
+
+earning_totals() filtrlar rollup'ga mos bo'lsa (hisob, box, tarif, jarima,
+sana chegaralari) javobni rollup + ochiq kun yig'indisidan beradi, aks holda
+(summa oralig'i, packet, qidiruv ...) xom Earning so'roviga qaytadi.
+
+Yopilgan kunga keyin tegadigan o'zgarishlar:
+    - kechikib yozilgan Earning'lar - keyingi catch_up() da last_earning_id
+      orqali topilib, ularning (kun, hisob) bo'limlari qayta hisoblanadi;
+    - Earning'ni o'zgartirish (admin, jarimaga aylantirish) - post_save
+      signali refresh_earnings() bilan darhol qayta hisoblaydi;
+    - Earning'ni o'chirish - post_delete signali bo'limlarni yig'ib,
+      commit'dan keyin bir marta qayta hisoblaydi.
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.bank.models import Earning, EarningDailyRollup, EarningRollupState
+
+# Rollup'da mavjud maydonlar (va ular orqali bog'langan maydonlar)
+ROLLUP_FIELDS = {"bank_account", "box", "tarrif", "is_penalty"}
+# created_at sana lookup'lari -> rollup date lookup'lari
+DATE_LOOKUPS = {
+    "created_at__date": "date",
+    "created_at__date__gte": "date__gte",
+    "created_at__date__gt": "date__gt",
+    "created_at__date__lte": "date__lte",
+    "created_at__date__lt": "date__lt",
+    # Sana qiymati bilan: created_at >= D 00:00 <=> date >= D
+    "created_at__gte": "date__gte",
+}
+# O'chirilgan Earning'larning commit'da yangilanadigan bo'limlari (ulanishda)
+PENDING_ATTR = "earning_rollup_partitions"
+# Shu vaqtdan oldin yaratilgan Earning'lar "ko'rilgan" hisoblanadi -
+# uzoq tranzaksiyalar kechikib commit qilinishi mumkin
+LATE_MARGIN = timedelta(minutes=10)
+BATCH_SIZE = 1000
+
+
+def local_midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def get_state():
+    state, _ = EarningRollupState.objects.get_or_create(pk=1)
+    return state
+
+
+def _as_date(value):
+    """date yoki "YYYY-MM-DD" -> date, boshqasi (datetime ham) -> None"""
+    if isinstance(value, datetime):
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return parse_date(str(value))
+    except ValueError:
+        return None
+
+
+def translate(lookups):
+    """
+    Earning lookup'larini rollup lookup'lariga o'girish.
+
+    Returns:
+        (rollup_lookups, midnight) yoki None (rollup'ga mos emas).
+        midnight - created_at__lte=D bo'lsa D 00:00: shu lahzadagi
+        Earning'lar rollup'dan emas, xom so'rovdan olinadi.
+    """
+    rollup = {}
+    midnight = None
+    for key, value in lookups.items():
+        if key.split("__")[0] in ROLLUP_FIELDS:
+            rollup[key] = value
+            continue
+
+        if key in DATE_LOOKUPS or key == "created_at__lte":
+            day = _as_date(value)
+            if day is None:
+                return None
+            if key == "created_at__lte":
+                rollup["date__lt"] = day
+                midnight = local_midnight(day)
+            else:
+                rollup[DATE_LOOKUPS[key]] = day
+            continue
+
+        return None
+    return rollup, midnight
+
+
+def filterset_lookups(filterset):
+    """django-filter FilterSet'dan {lookup: qiymat} (forma noto'g'ri bo'lsa None)"""
+    if not filterset.is_valid():
+        return None
+    lookups = {}
+    for name, value in filterset.form.cleaned_data.items():
+        if value in (None, ""):
+            continue
+        f = filterset.filters[name]
+        if f.method is not None or f.exclude:
+            return None
+        key = f.field_name
+        if f.lookup_expr != "exact":
+            key = f"{key}__{f.lookup_expr}"
+        lookups[key] = value
+    return lookups
+
+
+def _raw_totals(earnings):
+    return earnings.aggregate(
+        amount=Sum("amount"), penalty_amount=Sum("penalty_amount"), count=Count("id")
+    )
+
+
+def earning_totals(lookups):
+    """
+    Filtrlangan Earning'lar yig'indisi.
+
+    Returns:
+        {"amount": int | None, "penalty_amount": int | None} - yozuv
+        bo'lmasa None (aggregate(Sum(...)) bilan bir xil)
+    """
+    translated = translate(lookups)
+    state = get_state() if translated is not None else None
+
+    if state is None or state.complete_through is None:
+        totals = _raw_totals(Earning.objects.filter(**lookups))
+    else:
+        rollup_lookups, midnight = translated
+        rolled = EarningDailyRollup.objects.filter(
+            **rollup_lookups, date__lte=state.complete_through
+        ).aggregate(
+            amount=Sum("amount"),
+            penalty_amount=Sum("penalty_amount"),
+            count=Sum("count"),
+        )
+
+        open_from = local_midnight(state.complete_through + timedelta(days=1))
+        recent = Q(created_at__gte=open_from)
+        if midnight is not None and midnight < open_from:
+            recent |= Q(created_at=midnight)
+        latest = _raw_totals(Earning.objects.filter(**lookups).filter(recent))
+
+        totals = {
+            name: (rolled[name] or 0) + (latest[name] or 0)
+            for name in ("amount", "penalty_amount", "count")
+        }
+
+    if not totals["count"]:
+        return {"amount": None, "penalty_amount": None}
+    return {"amount": totals["amount"], "penalty_amount": totals["penalty_amount"]}
+
+
+def _aggregate(earnings):
+    return (
+        earnings.annotate(day=TruncDate("created_at"))
+        .values("day", "bank_account_id", "box_id", "tarrif", "is_penalty")
+        .annotate(
+            count=Count("id"),
+            amount=Sum("amount"),
+            penalty_amount=Sum("penalty_amount"),
+        )
+        .order_by()
+    )
+
+
+def _write(rows):
+    EarningDailyRollup.objects.bulk_create(
+        (
+            EarningDailyRollup(
+                date=row["day"],
+                bank_account_id=row["bank_account_id"],
+                box_id=row["box_id"],
+                tarrif=row["tarrif"],
+                is_penalty=row["is_penalty"],
+                count=row["count"],
+                amount=row["amount"] or 0,
+                penalty_amount=row["penalty_amount"] or 0,
+            )
+            for row in rows
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def rebuild_day(day):
+    """Bitta kunning rollup qatorlarini qayta yozish"""
+    start = local_midnight(day)
+    end = local_midnight(day + timedelta(days=1))
+    with transaction.atomic():
+        EarningDailyRollup.objects.filter(date=day).delete()
+        _write(
+            _aggregate(Earning.objects.filter(created_at__gte=start, created_at__lt=end))
+        )
+
+
+def refresh_partitions(partitions):
+    """(kun, bank_account_id) bo'limlarini qayta hisoblash"""
+    by_day = {}
+    for day, account_id in partitions:
+        by_day.setdefault(day, set()).add(account_id)
+
+    for day, accounts in by_day.items():
+        start = local_midnight(day)
+        end = local_midnight(day + timedelta(days=1))
+        with transaction.atomic():
+            EarningDailyRollup.objects.filter(
+                date=day, bank_account_id__in=accounts
+            ).delete()
+            _write(
+                _aggregate(
+                    Earning.objects.filter(
+                        created_at__gte=start,
+                        created_at__lt=end,
+                        bank_account_id__in=accounts,
+                    )
+                )
+            )
+
+
+def _partitions(earnings):
+    return {
+        (timezone.localdate(earning.created_at), earning.bank_account_id)
+        for earning in earnings
+    }
+
+
+def _refresh_closed(partitions):
+    state = get_state()
+    if state.complete_through is None:
+        return
+    refresh_partitions(
+        {(day, pk) for day, pk in partitions if day <= state.complete_through}
+    )
+
+
+def refresh_earnings(earnings):
+    """O'zgartirilgan Earning'lar yopilgan kunga tegishli bo'lsa rollup'ni yangilash"""
+    _refresh_closed(_partitions(earnings))
+
+
+def _flush_pending():
+    partitions = connection.__dict__.pop(PENDING_ATTR, None)
+    if partitions:
+        _refresh_closed(partitions)
+
+
+def refresh_earnings_on_commit(earnings):
+    """
+    Bo'limlarni commit'dan keyin bir marta yangilash - kaskad yoki queryset
+    delete'da har bir qator uchun alohida qayta hisoblanmasin. Birinchi
+    callback hammasini yangilaydi, qolganlari bo'sh o'tadi; rollback bo'lsa
+    qolgan bo'limlar keyingi commit'da (ortiqcha, lekin to'g'ri) yangilanadi.
+    """
+    connection.__dict__.setdefault(PENDING_ATTR, set()).update(_partitions(earnings))
+    transaction.on_commit(_flush_pending)
+
+
+def catch_up(until=None):
+    """
+    Rollup'ni until (standart - kecha) gacha yetkazish.
+
+    Har bir kun alohida tranzaksiyada yoziladi va complete_through
+    shu kunga suriladi - to'xtatilgan ishga tushish keyingisida davom etadi.
+
+    Returns:
+        (days, partitions): qayta yozilgan kunlar va bo'limlar soni
+    """
+    until = until or timezone.localdate() - timedelta(days=1)
+    seen_id = (
+        Earning.objects.filter(
+            created_at__lt=timezone.now() - LATE_MARGIN
+        ).aggregate(m=Max("pk"))["m"]
+        or 0
+    )
+    state = get_state()
+
+    partitions = set()
+    if state.complete_through is not None:
+        # Yopilgan kunlarga kechikib yozilgan Earning'lar
+        open_from = local_midnight(state.complete_through + timedelta(days=1))
+        partitions = set(
+            Earning.objects.filter(
+                pk__gt=state.last_earning_id, created_at__lt=open_from
+            )
+            .annotate(day=TruncDate("created_at"))
+            .values_list("day", "bank_account_id")
+            .distinct()
+        )
+        refresh_partitions(partitions)
+        day = state.complete_through + timedelta(days=1)
+    else:
+        first = Earning.objects.aggregate(m=Min("created_at"))["m"]
+        day = timezone.localdate(first) if first else until + timedelta(days=1)
+
+    days = 0
+    while day <= until:
+        rebuild_day(day)
+        state.complete_through = day
+        state.save(update_fields=["complete_through", "updated_at"])
+        day += timedelta(days=1)
+        days += 1
+
+    if state.complete_through is None or state.complete_through < until:
+        state.complete_through = until
+    state.last_earning_id = max(state.last_earning_id, seen_id)
+    state.save()
+
+    return days, len(partitions)
@@ -0,0 +1,173 @@
+"""
+Hisob bo'yicha Earning yig'indisi (EarningSummary) - mobil ro'yxat uchun.
+
+Jadval har bir o'zgarishda yangilanadi:
+    - record_earnings() - yangi Earning'lar (settlement bulk_create'dan
+      keyin, qolganlari post_save signalidan);
+    - record_change() - Earning o'zgartirilganda (jarimaga aylantirish,
+      admin) - pre_save / post_save signali;
+    - record_deletes() - Earning o'chirilganda - post_delete signali.
+Barcha (hisob, tarif, jarima) qatorlari bitta upsert bilan o'zgaradi
+(count = count + n). Tayyor javob Redis'da saqlanadi va tranzaksiya commit
+bo'lgandan keyin o'chiriladi; Redis ishlamasa jadvaldan o'qiladi.
+"""
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from apps.bank.models import Earning, EarningSummary
+from apps.ecopacket.services.lookup_cache import (
+    make_key,
+    redis_delete,
+    redis_get_json,
+    redis_set_json,
+)
+
+SUMMARY = "earning_summary"
+# O'qish va o'chirish orasidagi poyga eskirgan qiymat qoldirsa ham qisqa vaqtga
+SUMMARY_TTL = 5 * 60
+
+
+def _group(earnings, sign=1):
+    changes = {}
+    for earning in earnings:
+        key = (earning.bank_account_id, earning.tarrif, earning.is_penalty)
+        count, amount, penalty_amount = changes.get(key, (0, 0, 0))
+        changes[key] = (
+            count + sign,
+            amount + sign * int(earning.amount),
+            penalty_amount + sign * int(earning.penalty_amount or 0),
+        )
+    return changes
+
+
+def _apply(changes):
+    """
+    {(hisob, tarif, jarima): (count, amount, penalty_amount)} ni bitta
+    INSERT ... ON CONFLICT DO UPDATE bilan qo'shish.
+    """
+    rows = [
+        (*key, *values) for key, values in changes.items() if any(values)
+    ]
+    if not rows:
+        return
+
+    quote = connection.ops.quote_name
+    table = quote(EarningSummary._meta.db_table)
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+    sql = (
+        f"INSERT INTO {table} "
+        f"(bank_account_id, tarrif, is_penalty, count, amount, penalty_amount) "
+        f"VALUES {placeholders} "
+        f"ON CONFLICT (bank_account_id, tarrif, is_penalty) DO UPDATE SET "
+        f"count = {table}.count + EXCLUDED.count, "
+        f"amount = {table}.amount + EXCLUDED.amount, "
+        f"penalty_amount = {table}.penalty_amount + EXCLUDED.penalty_amount"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+    accounts = {row[0] for row in rows}
+    transaction.on_commit(
+        lambda: redis_delete(*[make_key(SUMMARY, pk) for pk in accounts])
+    )
+
+
+def record_earnings(earnings):
+    """Yangi yozilgan Earning'larni yig'indiga qo'shish"""
+    _apply(_group(earnings))
+
+
+def record_change(old, new):
+    """Earning o'zgarishi (masalan, jarimaga aylantirish): eski - , yangi +"""
+    changes = _group([old], -1)
+    for key, (count, amount, penalty) in _group([new]).items():
+        prev = changes.get(key, (0, 0, 0))
+        changes[key] = (prev[0] + count, prev[1] + amount, prev[2] + penalty)
+    _apply(changes)
+
+
+def record_deletes(earnings):
+    """O'chirilgan Earning'larni yig'indidan ayirish"""
+    _apply(_group(earnings, -1))
+
+
+def _load(bank_account_id):
+    rows = EarningSummary.objects.filter(
+        bank_account_id=bank_account_id, count__gt=0
+    ).values_list("tarrif", "is_penalty", "count", "amount", "penalty_amount")
+
+    tariffs = {}
+    for tarrif, is_penalty, count, amount, penalty_amount in rows:
+        row = tariffs.setdefault(
+            tarrif,
+            {
+                "tarrif": tarrif,
+                "count": 0,
+                "amount": 0,
+                "penalty_count": 0,
+                "penalty_amount": 0,
+            },
+        )
+        row["count"] += count
+        row["amount"] += amount
+        if is_penalty:
+            row["penalty_count"] += count
+            row["penalty_amount"] += penalty_amount
+
+    tariffs = sorted(tariffs.values(), key=lambda row: row["tarrif"])
+    totals = {
+        name: sum(row[name] for row in tariffs)
+        for name in ("count", "amount", "penalty_count", "penalty_amount")
+    }
+    return {"tariffs": tariffs, **totals}
+
+
+def get_summary(bank_account_id):
+    """
+    Hisob yig'indisi: Redis -> EarningSummary jadvali.
+
+    Returns:
+        {"tariffs": [{tarrif, count, amount, penalty_count, penalty_amount}],
+         "count", "amount", "penalty_count", "penalty_amount"}
+    """
+    key = make_key(SUMMARY, bank_account_id)
+    summary = redis_get_json(key)
+    if summary is None:
+        summary = _load(bank_account_id)
+        redis_set_json(key, summary, SUMMARY_TTL)
+    return summary
+
+
+def rebuild(bank_account_ids=None):
+    """
+    Yig'indini Earning jadvalidan qayta yozish (barcha yoki berilgan hisoblar).
+
+    Returns:
+        int: yozilgan qatorlar soni
+    """
+    earnings = Earning.objects.all()
+    summaries = EarningSummary.objects.all()
+    if bank_account_ids is not None:
+        earnings = earnings.filter(bank_account_id__in=bank_account_ids)
+        summaries = summaries.filter(bank_account_id__in=bank_account_ids)
+
+    rows = (
+        earnings.values("bank_account_id", "tarrif", "is_penalty")
+        .annotate(
+            count=Count("id"),
+            amount=Sum("amount"),
+            penalty_amount=Sum("penalty_amount"),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        accounts = set(summaries.values_list("bank_account_id", flat=True))
+        summaries.delete()
+        created = EarningSummary.objects.bulk_create(
+            (EarningSummary(**row) for row in rows.iterator(chunk_size=5000)),
+            batch_size=5000,
+        )
+    accounts |= {summary.bank_account_id for summary in created}
+    redis_delete(*[make_key(SUMMARY, pk) for pk in accounts])
+    return len(created)
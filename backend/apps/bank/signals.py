@@ -1,7 +1,9 @@
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from apps.account.models import User
-from .models import BankAccount, PayOut
+from .models import BankAccount, Earning, PayOut
+from .services.rollup import refresh_earnings, refresh_earnings_on_commit
+from .services.summary import record_change, record_deletes, record_earnings
 from rest_framework import response
 
 @receiver(post_save, sender=User)
@@ -9,4 +11,38 @@ def request_to_bank(sender, instance, created, **kwargs):   # type: ignore
     if created:
         BankAccount.objects.get_or_create(user=instance)
 
-                
+
+@receiver(pre_save, sender=Earning)
+def remember_previous_earning(sender, instance, raw=False, **kwargs):
+    # Yig'indidan eski qiymatlar ayiriladi, bank_account o'zgarsa eski
+    # (kun, hisob) rollup bo'limi ham yangilanadi
+    if raw or instance._state.adding:
+        return
+    instance._previous_earning = Earning.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Earning)
+def update_aggregates_on_earning_save(sender, instance, created, raw=False, **kwargs):
+    """
+    Yangi Earning EarningSummary'ga qo'shiladi. O'zgartirilgan Earning
+    (admin, jarimaga aylantirish) yig'indida eski -> yangi bilan almashadi va
+    yopilgan kunda bo'lsa rollup qayta hisoblanadi. Yangi Earning ochiq kunga
+    tushadi - kechikib commit qilinganlarini catch_up() topadi.
+    """
+    previous = instance.__dict__.pop("_previous_earning", None)
+    if raw:
+        return
+    if created:
+        record_earnings([instance])
+        return
+    if previous is None:
+        refresh_earnings([instance])
+        return
+    record_change(previous, instance)
+    refresh_earnings([instance, previous])
+
+
+@receiver(post_delete, sender=Earning)
+def update_aggregates_on_earning_delete(sender, instance, **kwargs):
+    record_deletes([instance])
+    refresh_earnings_on_commit([instance])
@@ -1,4 +1,5 @@
-from django.db.models import Sum
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
 
 from dateutil.relativedelta import relativedelta
@@ -7,7 +8,16 @@ from rest_framework.response import Response
 
 from apps.account.models import User
 from apps.ecopacket.models import LifeCycle
+from apps.ecopacket.services.lookup_cache import (
+    make_key,
+    redis_get_json,
+    redis_set_json,
+)
 from .models import Earning, PayMe, PayOut
+from .services.rollup import earning_totals
+
+DASHBOARD = "dashboard"
+DASHBOARD_TTL = 60
 
 
 def get_month_name(num):
@@ -27,87 +37,103 @@ def get_month_name(num):
     }[num]
 
 
-def sum_amount(model, datetime):
-    return (
-        model.objects.filter(
-            created_at__year=datetime.year, created_at__month=datetime.month
-        ).aggregate(total=Sum("amount"))["total"]
-        or 0
+def monthly_totals(queryset, since=None, **sums):
+    """
+    Oylar bo'yicha yig'indilar bitta TruncMonth GROUP BY so'rovi bilan.
+
+    Returns:
+        {(yil, oy): {nom: summa, ...}}
+    """
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    rows = (
+        queryset.annotate(month=TruncMonth("created_at"))
+        .values("month")
+        .annotate(**sums)
+        .order_by()
+    )
+    return {(row["month"].year, row["month"].month): row for row in rows}
+
+
+def get_months(now):
+    """Joriy oy bilan birga oxirgi 12 oy (eskisidan boshlab)"""
+    first = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return [first - relativedelta(months=sup_month) for sup_month in range(11, -1, -1)]
+
+
+def get_dashboard_data():
+    """
+    Dashboard ma'lumotlari: Earning, PayOut va PayMe (oxirgi 12 oy),
+    umumiy daromad (EarningDailyRollup), foydalanuvchilar soni va
+    buyurtmalar soni.
+    """
+    now = timezone.localtime()
+    months = get_months(now)
+    since = months[0]
+
+    earnings = monthly_totals(Earning.objects.all(), since, total=Sum("amount"))
+    payouts = monthly_totals(PayOut.objects.all(), since, total=Sum("amount"))
+    paymes = monthly_totals(
+        PayMe.objects.all(),
+        since,
+        total=Sum("amount"),
+        payed=Sum("amount", filter=Q(payed=True)),
     )
 
-
-def get_monthly_sums():
-    current_datetime = timezone.now()
-
-    monthly_sums = []
-
-    for sup_month in range(12):
-        dt = current_datetime - relativedelta(months=sup_month)
-
-        monthly_earning = sum_amount(Earning, dt)
-
-        monthly_payout = sum_amount(PayOut, dt)
-
-        monthly_payme = sum_amount(PayMe, dt)
-
-        monthly_sums.append(
-            {
-                "name": get_month_name(dt.month),
-                "earning": monthly_earning,
-                "payout": monthly_payout,
-                "payme": monthly_payme,
-            }
-        )
-
-    return monthly_sums[::-1]
-
-
-def get_header_info():
-    pops_count = User.objects.filter(role="POP").count()
-    emps_count = User.objects.filter(role="EMP").count()
-    earings_amount = Earning.objects.aggregate(sum=Sum("amount"))["sum"]
-    orders_count = LifeCycle.objects.filter(filled_at=None, state__gt=80).count()
-
-    return {
-        "pops": pops_count,
-        "emps": emps_count,
-        "earnings": earings_amount,
-        "orders": orders_count,
+    def total(data, dt, name="total"):
+        return data.get((dt.year, dt.month), {}).get(name)
+
+    chart_data = [
+        {
+            "name": get_month_name(dt.month),
+            "earning": total(earnings, dt) or 0,
+            "payout": total(payouts, dt) or 0,
+            "payme": total(paymes, dt) or 0,
+        }
+        for dt in months
+    ]
+
+    users = User.objects.aggregate(
+        pops=Count("id", filter=Q(role="POP")),
+        emps=Count("id", filter=Q(role="EMP")),
+    )
+    header_cards = {
+        "pops": users["pops"],
+        "emps": users["emps"],
+        "earnings": earning_totals({})["amount"],
+        "orders": LifeCycle.objects.filter(filled_at=None, state__gt=80).count(),
     }
 
-
-def get_featured_data():
-    current_datetime = timezone.now()
-    payout = PayOut.objects.filter(
-        created_at__year=current_datetime.year,
-        created_at__month=current_datetime.month,
-    ).aggregate(sum=Sum("amount"))["sum"]
-    all = PayMe.objects.filter(
-        created_at__year=current_datetime.year,
-        created_at__month=current_datetime.month,
-    ).aggregate(sum=Sum("amount"))["sum"]
-    payed = PayMe.objects.filter(
-        payed=True,
-        created_at__year=current_datetime.year,
-        created_at__month=current_datetime.month,
-    ).aggregate(sum=Sum("amount"))["sum"]
-    resp = {
-        
-        "target": {"payme_request": all, "payme_payed": payed, "all_payed": payout},
+    current = months[-1]
+    all = total(paymes, current)
+    payed = total(paymes, current, "payed")
+    featured = {
+        "target": {
+            "payme_request": all,
+            "payme_payed": payed,
+            "all_payed": total(payouts, current),
+        },
     }
     try:
-        resp.update({"payed_percentage": round(payed / all * 100),"needed_to_pay": all - payed})
+        featured.update(
+            {"payed_percentage": round(payed / all * 100), "needed_to_pay": all - payed}
+        )
     except:
         pass
-    return resp
+
+    return {
+        "header_cards": header_cards,
+        "chart_data": chart_data,
+        "featured": featured,
+    }
 
 
 class DashboardView(APIView):
     def get(self, request):
-        return Response(
-            {
-                "header_cards": get_header_info(),
-                "chart_data": get_monthly_sums(),
-                "featured": get_featured_data(),
-            }
-        )
+        # Dashboard DASHBOARD_TTL soniyagacha eskirgan bo'lishi mumkin
+        cache_key = make_key(DASHBOARD, "all")
+        data = redis_get_json(cache_key)
+        if data is None:
+            data = get_dashboard_data()
+            redis_set_json(cache_key, data, DASHBOARD_TTL)
+        return Response(data)
@@ -1,3 +1,526 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from apps.bank.models import (
+    BankAccount,
+    CapitalDelta,
+    Earning,
+    EarningDailyRollup,
+    EarningSummary,
+    ExportJob,
+    ExportStatus,
+    PayMe,
+    PayOut,
+)
+from apps.bank.serializers import BankAccountSerializer
+from apps.bank.services.export import run_job
+from apps.bank.services.ledger import (
+    InsufficientBalance,
+    compact,
+    debit,
+    reset_balance,
+)
+from apps.bank.services.reconcile import reconcile
+from apps.bank.services.rollup import catch_up, earning_totals
+from apps.bank.services.summary import get_summary, rebuild
+from apps.bank.statistics_view import get_month_name
+from apps.ecopacket.models import Box, EcoPacketQrCode, LifeCycle, SellerShareDelta
+from apps.ecopacket.services.lookup_cache import get_scan_box
+from apps.ecopacket.services.settlement import settle_scan
+from apps.packet.models import Category
+from apps.utils.pagination import MyPagination
+
+User = get_user_model()
+
+
+@override_settings(SETTLEMENT_LEDGER=True)
+class LedgerTestCase(TestCase):
+    """Ledger rejimi: delta'lar, balans o'qish va compact"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Plastik", summa=150)
+        self.user = User.objects.create_user(
+            phone_number="998900000101", first_name="Client"
+        )
+        self.seller = User.objects.create_user(
+            phone_number="998900000102", first_name="Seller"
+        )
+        box = Box.objects.create(
+            name="Fandomat",
+            sim_module="SIM101",
+            seller=self.seller,
+            seller_percentage=Decimal("20.00"),
+        )
+        LifeCycle.objects.create(box=box)
+        self.box = get_scan_box("SIM101")
+        self.account = BankAccount.objects.get(user=self.user)
+        self.seller_account = BankAccount.objects.get(user=self.seller)
+
+    def scan(self, times=1):
+        for _ in range(times):
+            settle_scan(self.box, self.category, self.account)
+
+    def test_scan_writes_deltas_only(self):
+        self.scan(2)
+
+        # Qatorlar o'zgarmaydi, balans delta'lar bilan
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.capital, 0)
+        self.assertEqual(self.account.balance, 240)
+        self.assertEqual(BankAccount.objects.get(user=self.seller).balance, 60)
+        self.assertEqual(
+            BankAccount.objects.with_pending().get(pk=self.account.pk).balance, 240
+        )
+        self.assertEqual(BankAccountSerializer(self.account).data["capital"], 240)
+        self.assertEqual(
+            Box.objects.get(pk=self.box.pk).seller_share_balance, Decimal("60.00")
+        )
+
+    def test_compact(self):
+        self.scan(3)
+
+        self.assertEqual(compact(batch_size=2), (6, 3))
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.capital, 360)
+        self.assertEqual(self.account.balance, 360)
+        self.assertEqual(Box.objects.get(pk=self.box.pk).seller_share, Decimal("90.00"))
+        self.assertFalse(CapitalDelta.objects.exists())
+        self.assertFalse(SellerShareDelta.objects.exists())
+
+    def test_debit_folds_pending_deltas(self):
+        self.scan(2)
+
+        self.assertEqual(debit(self.account.pk, 200), 40)
+        with self.assertRaises(InsufficientBalance):
+            debit(self.account.pk, 50)
+
+        # debit() o'tkazgan delta'lar compact'da qayta qo'shilmaydi,
+        # faqat seller'niki qoladi
+        self.assertEqual(compact(), (2, 2))
+        self.assertEqual(BankAccount.objects.get(pk=self.account.pk).capital, 40)
+        self.seller_account.refresh_from_db()
+        self.assertEqual(self.seller_account.capital, 60)
+
+    def test_reset_balance(self):
+        self.scan()
+
+        reset_balance(self.account.pk)
+
+        self.assertEqual(BankAccount.objects.get(pk=self.account.pk).balance, 0)
+
+
+class ReconcileBalancesTestCase(TestCase):
+    """Balanslarni tekshirish va tuzatish"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            phone_number="998900000201", first_name="Admin"
+        )
+        self.user = User.objects.create_user(
+            phone_number="998900000202", first_name="Client"
+        )
+        self.account = BankAccount.objects.get(user=self.user)
+        Earning.objects.create(bank_account=self.account, amount=500, tarrif="A")
+        Earning.objects.create(
+            bank_account=self.account,
+            amount=300,
+            tarrif="B",
+            is_penalty=True,
+            penalty_amount=100,
+        )
+        PayOut.objects.create(user=self.user, amount=200, admin=self.admin)
+        # Kutilgan: 500 + 300 - 100 - 200 = 500
+        BankAccount.objects.filter(pk=self.account.pk).update(capital=450)
+
+    def test_reports_and_repairs(self):
+        found = []
+        run = reconcile(
+            on_discrepancy=lambda *args: found.append(args), repair_discrepancies=True
+        )
+
+        self.assertEqual(found, [(self.account.pk, 450, 500)])
+        self.assertEqual((run.discrepancies, run.repaired), (1, 1))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.capital, 500)
+
+    def test_incremental_checks_only_changed_accounts(self):
+        reconcile(repair_discrepancies=True)
+        other = BankAccount.objects.get(user=self.admin)
+        BankAccount.objects.filter(pk=other.pk).update(capital=999)
+        Earning.objects.create(bank_account=self.account, amount=50, tarrif="A")
+
+        run = reconcile(incremental=True)
+
+        # Faqat yangi Earning kelgan hisob tekshiriladi
+        self.assertTrue(run.incremental)
+        self.assertEqual((run.accounts_checked, run.discrepancies), (1, 1))
+        self.assertEqual(reconcile().discrepancies, 2)
+
+
+class DashboardTestCase(TestCase):
+    """Dashboard oylik yig'indilari"""
+
+    def test_dashboard(self):
+        admin = User.objects.create_user(phone_number="998900000301", first_name="A")
+        account = BankAccount.objects.get(user=admin)
+        Earning.objects.create(bank_account=account, amount=100, tarrif="A")
+        Earning.objects.create(bank_account=account, amount=50, tarrif="A")
+        old = Earning.objects.create(bank_account=account, amount=70, tarrif="A")
+        Earning.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - relativedelta(years=2)
+        )
+        PayOut.objects.create(user=admin, amount=30, admin=admin)
+        PayMe.objects.create(user=admin, amount=40, payed=True)
+        PayMe.objects.create(user=admin, amount=60)
+        # Umumiy summa - yopilgan kunlar rollup'dan, bugun xom jadvaldan
+        catch_up()
+
+        with self.assertNumQueries(8):
+            response = self.client.get("/api/v1/dashboard/")
+
+        data = response.json()
+        self.assertEqual(len(data["chart_data"]), 12)
+        self.assertEqual(
+            data["chart_data"][-1],
+            {
+                "name": get_month_name(timezone.localtime().month),
+                "earning": 150,
+                "payout": 30,
+                "payme": 100,
+            },
+        )
+        self.assertEqual(data["header_cards"]["earnings"], 220)
+        self.assertEqual(data["featured"]["payed_percentage"], 40)
+        self.assertEqual(data["featured"]["needed_to_pay"], 60)
+
+
+class EarningRollupTestCase(APITestCase):
+    """Kunlik rollup va undan olinadigan yig'indilar"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            phone_number="998900000401", first_name="Client"
+        )
+        self.account = BankAccount.objects.get(user=self.user)
+        self.today = timezone.localdate()
+        for days_ago, amount, tarrif in [(3, 100, "A"), (3, 50, "B"), (1, 70, "A")]:
+            earning = Earning.objects.create(
+                bank_account=self.account, amount=amount, tarrif=tarrif
+            )
+            Earning.objects.filter(pk=earning.pk).update(
+                created_at=timezone.now() - timedelta(days=days_ago)
+            )
+        Earning.objects.create(bank_account=self.account, amount=30, tarrif="A")
+
+    def test_totals_use_rollup_for_closed_days(self):
+        self.assertEqual(catch_up()[0], 3)
+        self.assertEqual(EarningDailyRollup.objects.count(), 3)
+
+        # Yopilgan kunlar rollup'dan olinadi (xom jadvaldagi o'zgarish ko'rinmaydi)
+        Earning.objects.filter(amount=100).update(amount=1)
+        totals = earning_totals({"bank_account": self.account.pk, "tarrif": "A"})
+        self.assertEqual(totals["amount"], 200)
+
+        start = self.today - timedelta(days=1)
+        totals = earning_totals({"created_at__date__gte": start.isoformat()})
+        self.assertEqual(totals["amount"], 100)
+        self.assertEqual(earning_totals({"tarrif": "C"})["amount"], None)
+        # Rollup'ga mos bo'lmagan filtr - xom so'rov
+        self.assertEqual(earning_totals({"amount__gte": 50})["amount"], 120)
+
+    def test_late_and_penalty_changes(self):
+        catch_up()
+        earning = Earning.objects.create(
+            bank_account=self.account, amount=5, tarrif="A", is_penalty=True
+        )
+        Earning.objects.filter(pk=earning.pk).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+
+        self.assertEqual(catch_up(), (0, 1))
+        self.assertEqual(earning_totals({"is_penalty": True})["amount"], 5)
+
+    def test_edits_and_deletes_refresh_rollup(self):
+        catch_up()
+        earning = Earning.objects.get(amount=100)
+        earning.amount = 10
+        earning.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Earning.objects.get(amount=50).delete()
+
+        totals = earning_totals({"bank_account": self.account.pk, "tarrif": "A"})
+        self.assertEqual(totals["amount"], 110)
+        self.assertEqual(earning_totals({"tarrif": "B"})["amount"], None)
+
+        admin = User.objects.create_superuser(
+            phone_number="998900000402", password="x", first_name="A"
+        )
+        self.client.force_authenticate(user=admin)
+        response = self.client.get("/api/v1/bank/earning-list/?is_penalty=false")
+        self.assertEqual(response.json()["amount__sum"], 110)
+        response = self.client.get("/api/v1/bank/earning-list/?is_penalty=true")
+        self.assertEqual(response.json()["amount__sum"], None)
+
+        # Queryset delete - bo'limlar commit'da bir marta yangilanadi
+        with self.captureOnCommitCallbacks(execute=True):
+            Earning.objects.filter(amount__in=[10, 70]).delete()
+        self.assertEqual(earning_totals({"tarrif": "A"})["amount"], 30)
+        self.assertFalse(EarningDailyRollup.objects.exists())
+
+    def test_user_earnings_view(self):
+        catch_up()
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(f"/api/v1/bank/earning-list/{self.user.pk}/")
+
+        self.assertEqual(response.json()["amount__sum"], 250)
+
+
+class KeysetPaginationTestCase(APITestCase):
+    """?cursor= bilan kalit bo'yicha sahifalash"""
+
+    def test_mobile_earnings_by_cursor(self):
+        user = User.objects.create_user(phone_number="998900000501", first_name="C")
+        account = BankAccount.objects.get(user=user)
+        for amount in range(1, 6):
+            Earning.objects.create(bank_account=account, amount=amount, tarrif="A")
+        self.client.force_authenticate(user=user)
+
+        amounts = []
+        url = "/api/v1/bank/mobile-earning-list/?cursor=&page_size=2"
+        while url:
+            data = self.client.get(url).json()
+            amounts += [row["amount"] for row in data["results"]]
+            url = data["next"]
+
+        self.assertEqual(amounts, [5, 4, 3, 2, 1])
+        self.assertEqual(data["total_cat"], [{"tarrif": "A", "count": 5}])
+
+        response = self.client.get("/api/v1/bank/mobile-earning-list/?cursor=xyz")
+        self.assertEqual(response.status_code, 404)
+        # Soxta kursor: dict / list yoki maydonga mos kelmaydigan qiymat
+        for values in ([{"a": 1}], [[]], ["abc"]):
+            cursor = urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get(
+                f"/api/v1/bank/mobile-earning-list/?cursor={cursor}"
+            )
+            self.assertEqual(response.status_code, 404)
+        # ?page= bilan - oldingidek sahifa raqami bilan
+        data = self.client.get("/api/v1/bank/mobile-earning-list/?page=1").json()
+        self.assertEqual((data["count"], len(data["results"])), (5, 5))
+
+    def page_all(self, queryset):
+        """Kursor bo'yicha barcha sahifalar (2 tadan) - pk'lar ro'yxati"""
+        pks = []
+        url = "/?cursor=&page_size=2"
+        while url:
+            paginator = MyPagination()
+            request = Request(APIRequestFactory().get(url))
+            pks += [obj.pk for obj in paginator.paginate_queryset(queryset, request)]
+            url = paginator.get_paginated_response([]).data["next"]
+        return pks
+
+    def test_same_millisecond_and_null_keys(self):
+        user = User.objects.create_user(phone_number="998900000502", first_name="C")
+        account = BankAccount.objects.get(user=user)
+        moment = timezone.now().replace(microsecond=123000)
+        for micro in (100, 400, 200, 300):
+            earning = Earning.objects.create(bank_account=account, amount=1, tarrif="A")
+            Earning.objects.filter(pk=earning.pk).update(
+                created_at=moment + timedelta(microseconds=micro)
+            )
+        earnings = Earning.objects.all()
+
+        self.assertEqual(
+            self.page_all(earnings.order_by("-created_at")),
+            list(earnings.order_by("-created_at", "-id").values_list("pk", flat=True)),
+        )
+        self.assertEqual(
+            self.page_all(earnings.order_by("created_at")),
+            list(earnings.order_by("created_at", "id").values_list("pk", flat=True)),
+        )
+
+        # NULL qiymatlar oxirida, tushib qolmaydi va takrorlanmaydi
+        for i, scanned in enumerate([moment, None, moment, None, None]):
+            EcoPacketQrCode.objects.create(qr_code=f"KEY{i}", scannered_at=scanned)
+        codes = EcoPacketQrCode.objects.all()
+        pks = list(codes.order_by("pk").values_list("pk", flat=True))
+        self.assertEqual(
+            self.page_all(codes.order_by("-scannered_at")),
+            [pks[2], pks[0], pks[4], pks[3], pks[1]],
+        )
+        self.assertEqual(
+            self.page_all(codes.order_by("scannered_at")),
+            [pks[0], pks[2], pks[1], pks[3], pks[4]],
+        )
+
+
+class EarningSummaryTestCase(APITestCase):
+    """Mobil ro'yxat yig'indisi (EarningSummary)"""
+
+    def test_summary_follows_scans_and_penalties(self):
+        category = Category.objects.create(name="Plastik", summa=100)
+        user = User.objects.create_user(phone_number="998900000701", first_name="C")
+        box = Box.objects.create(name="Fandomat", sim_module="SIM701")
+        LifeCycle.objects.create(box=box)
+        account = BankAccount.objects.get(user=user)
+        for _ in range(3):
+            settle_scan(get_scan_box("SIM701"), category, account)
+
+        admin = User.objects.create_superuser(
+            phone_number="998900000702", password="x", first_name="A"
+        )
+        self.client.force_authenticate(user=admin)
+        earning = Earning.objects.filter(bank_account=account).first()
+        self.client.post(
+            f"/api/v1/bank/earning-to-penalty/{earning.pk}/", {"penalty_amount": 40}
+        )
+
+        self.client.force_authenticate(user=user)
+        with self.assertNumQueries(3):
+            data = self.client.get("/api/v1/bank/mobile-earning-list/").json()
+
+        self.assertEqual(len(data["results"]), 3)
+        self.assertIsNone(data["next"])
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(
+            data["summary"]["tariffs"],
+            [
+                {
+                    "tarrif": "Plastik",
+                    "count": 3,
+                    "amount": 300,
+                    "penalty_count": 1,
+                    "penalty_amount": 40,
+                }
+            ],
+        )
+        data = self.client.get("/api/v1/bank/mobile-earning-list/?is_penalty=false").json()
+        self.assertEqual(data["total_cat"], [{"tarrif": "Plastik", "count": 2}])
+
+        # Admin o'zgartirishi va o'chirish ham yig'indiga tushadi
+        earning.refresh_from_db()
+        earning.penalty_amount = 10
+        earning.save()
+        Earning.objects.filter(bank_account=account).last().delete()
+        summary = get_summary(account.pk)
+        self.assertEqual((summary["count"], summary["amount"]), (2, 200))
+        self.assertEqual(summary["penalty_amount"], 10)
+
+        EarningSummary.objects.all().delete()
+        rebuild()
+        self.assertEqual(get_summary(account.pk)["penalty_amount"], 10)
+
+
+class ExportTestCase(APITestCase):
+    """CSV oqimi va fon eksporti"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            phone_number="998900000601", password="x", first_name="Admin"
+        )
+        account = BankAccount.objects.get(user=self.admin)
+        for amount, tarrif in [(10, "A"), (20, "B"), (30, "A")]:
+            Earning.objects.create(bank_account=account, amount=amount, tarrif=tarrif)
+        self.client.force_authenticate(user=self.admin)
+
+    def test_stream_csv_with_filters(self):
+        response = self.client.get("/api/v1/bank/export/earnings/?tarrif=A")
+
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content).decode("utf-8-sig")
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(rows[0][:2], ["id", "created_at"])
+        self.assertEqual([row[7] for row in rows[1:]], ["10", "30"])
+        self.assertEqual(
+            self.client.get("/api/v1/bank/export/unknown/").status_code, 400
+        )
+
+    def test_job_resumes_csv(self):
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            response = self.client.post(
+                "/api/v1/bank/export-jobs/",
+                {"kind": "earnings", "params": {"min_amount": 15}},
+                format="json",
+            )
+            job = ExportJob.objects.get(pk=response.json()["id"])
+            first = Earning.objects.filter(amount__gte=15).order_by("pk").first()
+            # Birinchi chunk yozilgandan keyin to'xtagan ish
+            job.last_id, job.rows_written = first.pk, 1
+            path = os.path.join(media, "exports", f"earnings-{job.pk}.csv")
+            os.makedirs(os.path.dirname(path))
+            with open(path, "wb") as output:
+                output.write("\ufeffheader\r\nfirst\r\n".encode())
+                job.bytes_written = output.tell()
+                output.write(b"partial")
+            job.save()
+
+            run_job(job)
+
+            with open(path, encoding="utf-8-sig") as output:
+                lines = output.read().splitlines()
+            self.assertEqual(lines[:2], ["header", "first"])
+            self.assertEqual(len(lines), 3)
+            self.assertIn(",30,", lines[2])
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.rows_written), (ExportStatus.DONE, 2))
+
+
+class BatchPayoutTestCase(APITestCase):
+    """PayMe so'rovlarini ommaviy to'lash"""
+
+    def test_batch_payout(self):
+        admin = User.objects.create_superuser(
+            phone_number="998900000801", password="x", first_name="Admin"
+        )
+        rich = User.objects.create_user(phone_number="998900000802", first_name="R")
+        poor = User.objects.create_user(phone_number="998900000803", first_name="P")
+        BankAccount.objects.filter(user=rich).update(capital=300)
+        CapitalDelta.objects.create(
+            bank_account=BankAccount.objects.get(user=rich), amount=50
+        )
+        BankAccount.objects.filter(user=poor).update(capital=10)
+        first = PayMe.objects.create(user=rich, amount=200, card="8600")
+        second = PayMe.objects.create(user=rich, amount=200)
+        third = PayMe.objects.create(user=poor, amount=20)
+        paid = PayMe.objects.create(user=poor, amount=5, payed=True)
+        self.client.force_authenticate(user=admin)
+
+        data = self.client.post(
+            "/api/v1/bank/payme-batch-payout/",
+            {"ids": [first.pk, second.pk, third.pk, paid.pk, 999]},
+            format="json",
+        ).json()
+
+        statuses = {row["id"]: row["status"] for row in data["results"]}
+        self.assertEqual(
+            statuses,
+            {
+                first.pk: "paid",
+                second.pk: "insufficient",
+                third.pk: "insufficient",
+                paid.pk: "already_paid",
+                999: "not_found",
+            },
+        )
+        self.assertEqual(data["paid"], 1)
+        # 300 + 50 (delta) - 200
+        self.assertEqual(BankAccount.objects.get(user=rich).capital, 150)
+        self.assertFalse(CapitalDelta.objects.exists())
+        payout = PayOut.objects.get()
+        self.assertEqual((payout.user, payout.amount, payout.card), (rich, 200, "8600"))
+        self.assertTrue(PayMe.objects.get(pk=first.pk).payed)
+        self.assertFalse(PayMe.objects.get(pk=second.pk).payed)
@@ -15,6 +15,7 @@ from .views import (
     PayMeListAPIView,
     PayOutUserMobileListAPIView,
     PayMePayedView,
+    PayMeBatchPayoutView,
     AgentEarningListAPIView,
     ApplicationCreateView,
     AgentApplicationListAPIView,
@@ -23,6 +24,9 @@ from .views import (
     AgentPayMeListView,
     AgentPayOutListView,
     AgentAdminApplicationListAPIView,
+    ExportCSVView,
+    ExportJobListCreateView,
+    ExportJobRetrieveView,
 )
 
 urlpatterns = [
@@ -43,6 +47,11 @@ urlpatterns = [
     path("payme-create/", PayMeCreateAPIView.as_view()),
     path("payme-list/", PayMeListAPIView.as_view()),
     path("payme-payed/<int:pk>/", PayMePayedView.as_view()),
+    path("payme-batch-payout/", PayMeBatchPayoutView.as_view()),
+    # export urls
+    path("export/<str:kind>/", ExportCSVView.as_view()),
+    path("export-jobs/", ExportJobListCreateView.as_view()),
+    path("export-jobs/<int:pk>/", ExportJobRetrieveView.as_view()),
     # agent urls
     path("agent-earning-list/", AgentEarningListAPIView.as_view()),
     path("agent-application-create/", ApplicationCreateView.as_view()),
@@ -1,2 +1,3 @@
 from .views import *
-from .agent import *
\ No newline at end of file
+from .agent import *
+from .export import *
\ No newline at end of file
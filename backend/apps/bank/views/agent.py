@@ -16,6 +16,8 @@ from ..serializers import (
 )
 from ..filters import EarningFilter
 from apps.ecopacket.models import Box
+from apps.bank.services.ledger import InsufficientBalance, debit
+from apps.bank.services.rollup import earning_totals, filterset_lookups
 
 
 # agent earnings list
@@ -40,14 +42,20 @@ class AgentEarningListAPIView(generics.ListAPIView):
     def get(self, request, *args, **kwargs):
         response = super().get(request, *args, **kwargs)
 
-        # Calculate total amount for filtered results
-        filtered_queryset = self.filter_queryset(self.get_queryset())
-        total_amount = filtered_queryset.aggregate(
-            total=Sum("amount"), total_penalty=Sum("penalty_amount")
+        # Calculate total amount for filtered results (kunlik rollup'dan)
+        lookups = filterset_lookups(
+            EarningFilter(request.query_params, queryset=self.get_queryset())
         )
+        if lookups is None:
+            filtered_queryset = self.filter_queryset(self.get_queryset())
+            totals = filtered_queryset.aggregate(
+                amount=Sum("amount"), penalty_amount=Sum("penalty_amount")
+            )
+        else:
+            totals = earning_totals({"bank_account__user__role": "AGENT", **lookups})
 
-        response.data["total_amount"] = total_amount["total"] or 0
-        response.data["total_penalty"] = total_amount["total_penalty"] or 0
+        response.data["total_amount"] = totals["amount"] or 0
+        response.data["total_penalty"] = totals["penalty_amount"] or 0
 
         return response
 
@@ -66,8 +74,12 @@ class ApplicationCreateView(generics.CreateAPIView):
         if payment_type == PaymentType.BANK_ACCOUNT:
             # Balansdan yechib olish
             agent_bank_account = self.request.user.bankaccount
-            agent_bank_account.capital -= amount
-            agent_bank_account.save()
+            try:
+                debit(agent_bank_account.pk, amount)
+            except InsufficientBalance as e:
+                raise serializers.ValidationError(
+                    f"Insufficient balance. Required: {amount}, Available: {e}"
+                )
 
             # Arizani approved holatiga o'tkazish
             application.status = ApplicationStatus.APPROVED
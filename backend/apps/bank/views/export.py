@@ -0,0 +1,53 @@
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import generics, permissions
+from rest_framework.exceptions import ValidationError
+from rest_framework.views import APIView
+
+from apps.bank.models import ExportJob
+from apps.bank.serializers import ExportJobSerializer
+from apps.bank.services.export import InvalidExport, get_queryset, stream_csv
+from apps.utils.pagination import MyPagination
+
+
+class ExportCSVView(APIView):
+    """
+    Eksport CSV oqimi: /bank/export/<kind>/?start_date=...
+
+    kind: earnings, payouts, payme, scans. Filtrlar ro'yxatlardagi bilan
+    bir xil (earnings uchun EarningFilter). Juda katta eksportlar uchun
+    export-jobs/ dan foydalaning.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, kind):
+        try:
+            queryset, columns = get_queryset(kind, request.query_params)
+        except InvalidExport as error:
+            raise ValidationError(error.errors)
+
+        response = StreamingHttpResponse(
+            stream_csv(queryset, columns), content_type="text/csv; charset=utf-8"
+        )
+        name = f"{kind}-{timezone.localdate():%Y-%m-%d}.csv"
+        response["Content-Disposition"] = f'attachment; filename="{name}"'
+        return response
+
+
+class ExportJobListCreateView(generics.ListCreateAPIView):
+    """Fon rejimidagi eksport (run_exports buyrug'i bajaradi)"""
+
+    permission_classes = [permissions.IsAdminUser]
+    serializer_class = ExportJobSerializer
+    queryset = ExportJob.objects.all().order_by("-id")
+    pagination_class = MyPagination
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+
+class ExportJobRetrieveView(generics.RetrieveAPIView):
+    permission_classes = [permissions.IsAdminUser]
+    serializer_class = ExportJobSerializer
+    queryset = ExportJob.objects.all()
@@ -16,7 +16,11 @@ from ..serializers import (
 )
 from ..models import BankAccount, Earning, PayOut, PayMe
 from apps.bank.models import BankAccount
-from apps.utils.pagination import MyPagination
+from apps.bank.services.ledger import InsufficientBalance, debit
+from apps.bank.services.rollup import earning_totals, filterset_lookups
+from apps.bank.services.payout import PAID, pay_requests, pending_ids
+from apps.bank.services.summary import get_summary
+from apps.utils.pagination import InfiniteScrollPagination, MyPagination
 from rest_framework.pagination import LimitOffsetPagination
 from django.db.models import Sum
 from django_filters import rest_framework as filters
@@ -27,7 +31,7 @@ from ..filters import EarningFilter
 
 class BankAccountListAPIView(generics.ListAPIView):
     serializer_class = BankAccountSerializer
-    queryset = BankAccount.objects.all()
+    queryset = BankAccount.objects.with_pending()
     pagination_class = MyPagination
 
 
@@ -69,17 +73,23 @@ class EarningUserAPIView(APIView, LimitOffsetPagination):
         end_date = request.query_params.get("end_date")
         is_penalty = request.query_params.get("is_penalty")
         earning_list = Earning.objects.filter(bank_account__user=pk).order_by("-id")
+        lookups = {"bank_account__user": pk}
         if start_date:
             earning_list = earning_list.filter(created_at__date__gte=start_date)
+            lookups["created_at__date__gte"] = start_date
         if end_date:
             earning_list = earning_list.filter(created_at__date__lte=end_date)
-        summa = earning_list.aggregate(Sum("amount"))
+            lookups["created_at__date__lte"] = end_date
+        total_field = "amount"
         if is_penalty == "true":
             earning_list = earning_list.filter(is_penalty=True)
-            summa = earning_list.aggregate(amount__sum=Sum("penalty_amount"))
+            lookups["is_penalty"] = True
+            total_field = "penalty_amount"
         elif is_penalty == "false":
             earning_list = earning_list.filter(is_penalty=False)
-            summa = earning_list.aggregate(Sum("amount"))
+            lookups["is_penalty"] = False
+        # Yig'indi kunlik rollup'dan (EarningDailyRollup)
+        summa = {"amount__sum": earning_totals(lookups)[total_field]}
         paginator = MyPagination()
         result_page = paginator.paginate_queryset(earning_list, request)
         serializer = EarningSerializer(result_page, many=True)
@@ -109,7 +119,6 @@ class EarningListAPIView(generics.ListAPIView):
         # get the start_date and end_date from the request parameters
         start_date = self.request.query_params.get("start_date")
         end_date = self.request.query_params.get("end_date")
-        is_penalty = self.request.query_params.get("is_penalty")
         queryset = super().get_queryset()
         # filter the queryset based on the date range
         if start_date:
@@ -117,22 +126,51 @@ class EarningListAPIView(generics.ListAPIView):
 
         if end_date:
             queryset = queryset.filter(created_at__date__lte=end_date)
-        if is_penalty:
-            queryset = queryset.filter(is_penalty=True)
+        # is_penalty - filterset_fields orqali (true/false)
         return queryset.order_by("-id")
 
+    def get_total_lookups(self):
+        """
+        Yig'indi uchun filtrlar (rollup'ga mos) yoki None - qidiruvda
+        xom so'rov ishlatiladi.
+        """
+        params = self.request.query_params
+        if params.get("search"):
+            return None
+        filterset = filters.DjangoFilterBackend().get_filterset(
+            self.request, self.get_queryset(), self
+        )
+        lookups = filterset_lookups(filterset)
+        if lookups is None:
+            return None
+        if params.get("start_date"):
+            lookups["created_at__date__gte"] = params["start_date"]
+        if params.get("end_date"):
+            lookups["created_at__date__lte"] = params["end_date"]
+        return lookups
+
     def get(self, request, *args, **kwargs):
         res = super().get(request, *args, **kwargs)
-        summa = self.filter_queryset(self.get_queryset()).aggregate(Sum("amount"))
+        lookups = self.get_total_lookups()
+        if lookups is None:
+            summa = self.filter_queryset(self.get_queryset()).aggregate(Sum("amount"))
+        else:
+            summa = {"amount__sum": earning_totals(lookups)["amount"]}
         res.data.update(summa)
         return res
 
 
 class MobileEarningListAPIView(generics.ListAPIView):
+    """
+    Foydalanuvchi daromadlari (mobil): birinchi keyset sahifa va tariflar
+    bo'yicha yig'indi bitta javobda. Sana filtrlari bo'lmasa yig'indi
+    EarningSummary'dan (Redis) olinadi.
+    """
+
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = MobileEarningListSerializer
     queryset = Earning.objects.all().order_by("-id")
-    pagination_class = MyPagination
+    pagination_class = InfiniteScrollPagination
 
     def get_queryset(self):
         # get the start_date and end_date from the request parameters
@@ -148,33 +186,52 @@ class MobileEarningListAPIView(generics.ListAPIView):
 
         if end_date:
             queryset = queryset.filter(created_at__date__lte=end_date)
-        if is_penalty:
+        if is_penalty == "true":
             queryset = queryset.filter(is_penalty=True)
+        elif is_penalty == "false":
+            queryset = queryset.filter(is_penalty=False)
 
         return queryset.order_by("-id")
 
     def get(self, request, *args, **kwargs):
         res = super().get(request, *args, **kwargs)
 
-        start_date = request.query_params.get("start_date")
-        end_date = request.query_params.get("end_date")
-        is_penalty = request.query_params.get("is_penalty")
-
-        queryset = Earning.objects.filter(bank_account__user=self.request.user)
+        params = request.query_params
+        account_id = (
+            BankAccount.objects.filter(user=request.user)
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if account_id is None or params.get("start_date") or params.get("end_date"):
+            total = list(
+                self.get_queryset()
+                .order_by()
+                .values("tarrif")
+                .annotate(count=Count("tarrif"))
+            )
+        else:
+            summary = get_summary(account_id)
+            total = summary_total_cat(summary, params.get("is_penalty"))
+            res.data["summary"] = summary
+            if res.data.get("count") is None:
+                res.data["count"] = sum(row["count"] for row in total)
+        res.data.update({"total_cat": total})
+        return res
 
-        # filter the queryset based on the date range
-        if start_date:
-            queryset = queryset.filter(created_at__date__gte=start_date)
 
-        if end_date:
-            queryset = queryset.filter(created_at__date__lte=end_date)
+def summary_total_cat(summary, is_penalty):
+    """total_cat ([{tarrif, count}]) ni yig'indidan olish"""
+    total = []
+    for row in summary["tariffs"]:
         if is_penalty == "true":
-            queryset = queryset.filter(is_penalty=True)
+            count = row["penalty_count"]
         elif is_penalty == "false":
-            queryset = queryset.filter(is_penalty=False)
-        total = queryset.values("tarrif").annotate(count=Count("tarrif"))
-        res.data.update({"total_cat": total})
-        return res
+            count = row["count"] - row["penalty_count"]
+        else:
+            count = row["count"]
+        if count:
+            total.append({"tarrif": row["tarrif"], "count": count})
+    return total
 
 
 class PayOutUserMobileListAPIView(APIView):
@@ -227,13 +284,13 @@ class PayOutListCreateAPIView(generics.ListCreateAPIView):
             bank_account = BankAccount.objects.get(user__id=employee)
         except:
             return response.Response({"error": "User doesn't exists!"})
-        if bank_account.capital >= money:
-            bank_account.capital -= money
-            bank_account.save()
-            return super().post(request, *args, **kwargs)
-        return response.Response(
-            {"error": "The user's capital is insufficient. Please try paying less"}
-        )
+        try:
+            debit(bank_account.pk, money)
+        except InsufficientBalance:
+            return response.Response(
+                {"error": "The user's capital is insufficient. Please try paying less"}
+            )
+        return super().post(request, *args, **kwargs)
 
 
 class PayMeCreateAPIView(generics.CreateAPIView):
@@ -298,6 +355,41 @@ class PayMePayedView(generics.UpdateAPIView):
         return super().put(request, *args, **kwargs)
 
 
+class PayMeBatchPayoutView(APIView):
+    """
+    Kutilayotgan PayMe so'rovlarini ommaviy to'lash.
+
+    Body: {"ids": [1, 2, ...]} yoki {"filters": {"user__role": "...", ...}}
+    (PayMeFilter parametrlari). Javobda har bir so'rov natijasi.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        ids = request.data.get("ids")
+        filters = request.data.get("filters")
+        if ids is None and not filters:
+            return response.Response(
+                {"error": "ids or filters is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            pks = pending_ids(ids=ids, filters=filters)
+        except (ValueError, TypeError) as error:
+            return response.Response(
+                {"error": str(error)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if ids is not None:
+            # To'langan yoki mavjud bo'lmaganlari ham hisobotda ko'rinsin
+            pks = [int(pk) for pk in ids]
+
+        report = pay_requests(pks, request.user)
+        paid = sum(1 for row in report if row["status"] == PAID)
+        return response.Response(
+            {"paid": paid, "failed": len(report) - paid, "results": report}
+        )
+
+
 class EarningToPenaltyView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
@@ -321,13 +413,13 @@ class EarningToPenaltyView(APIView):
             return response.Response(
                 {"error": "Bank account not found"}, status=status.HTTP_404_NOT_FOUND
             )
-        if bank_account.capital < penalty_amount:
+        try:
+            debit(bank_account.pk, penalty_amount)
+        except InsufficientBalance:
             return response.Response(
                 {"error": "Bank account doesn't have enough capital"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        bank_account.capital -= penalty_amount
-        bank_account.save()
         serializer = EarningPenaltySerializer(earning, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save(is_penalty=True)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 # from django.contrib.gis.admin import OSMGeoAdmin
-from .models import LifeCycle, Box, EcoPacketQrCode, FlaskQrCode
+from .models import LifeCycle, Box, BoxTelemetry, EcoPacketQrCode, FlaskQrCode
 # Register your models here.
 
 @admin.register(FlaskQrCode)
@@ -14,10 +14,17 @@ class BoxFillCycleAdmin(admin.ModelAdmin):
                     'state', 'started_at', 'filled_at')
 
 
+@admin.register(BoxTelemetry)
+class BoxTelemetryAdmin(admin.ModelAdmin):
+    raw_id_fields = ('box',)
+    list_display = ('box', 'state', 'lat', 'lng', 'ts')
+    list_filter = ('ts',)
+
+
 @admin.register(Box)
 class BoxAdmin(admin.ModelAdmin):
-    raw_id_fields = ('seller',)
-    list_display = ('name', 'created_at', 'qr_code', 'sim_module')
+    raw_id_fields = ('seller', 'current_lifecycle')
+    list_display = ('name', 'created_at', 'qr_code', 'sim_module', 'state')
 
 
 class EcoPacketQrCodeAdmin(admin.ModelAdmin):
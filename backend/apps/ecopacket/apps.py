@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EcopacketConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.ecopacket'
+
+    def ready(self):
+        import apps.ecopacket.signals
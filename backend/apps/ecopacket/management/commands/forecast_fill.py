@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.ecopacket.models import Box
+from apps.ecopacket.services.forecast import HISTORY_DAYS, update_forecasts
+
+
+class Command(BaseCommand):
+    help = "Box'larning to'lish tezligi va to'lish vaqti prognozini yangilash"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=HISTORY_DAYS,
+            help=f"Necha kunlik tarixdan foydalanish (standart {HISTORY_DAYS})",
+        )
+        parser.add_argument(
+            "--show",
+            type=int,
+            default=10,
+            help="Eng tez to'ladigan nechta box'ni chiqarish",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        updated, forecasted = update_forecasts(history_days=options["days"])
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{updated} ta box yangilandi, {forecasted} tasida prognoz bor "
+                f"({elapsed:.2f} s)"
+            )
+        )
+
+        now = timezone.now()
+        upcoming = (
+            Box.objects.filter(full_at__isnull=False, is_active=True)
+            .order_by("full_at")
+            .values_list("sim_module", "state", "fill_rate", "full_at")[
+                : options["show"]
+            ]
+        )
+        for sim_module, state, fill_rate, full_at in upcoming:
+            hours = max((full_at - now).total_seconds() / 3600, 0)
+            self.stdout.write(
+                f"  {sim_module}: {state}%, {fill_rate or 0:.2f} %/soat, "
+                f"to'lishiga {hours:.1f} soat"
+            )
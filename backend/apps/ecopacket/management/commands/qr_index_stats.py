@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from apps.ecopacket.models import EcoPacketQrCode
+from apps.packet.models import Packet
+
+
+class Command(BaseCommand):
+    help = "QR kod jadvallari indekslaridan foydalanish statistikasi (PostgreSQL)"
+
+    TABLE_SQL = """
+        SELECT relname, seq_scan, idx_scan, n_live_tup
+        FROM pg_stat_user_tables
+        WHERE relname = ANY(%s)
+        ORDER BY relname
+    """
+
+    INDEX_SQL = """
+        SELECT s.relname, s.indexrelname, s.idx_scan, io.idx_blks_hit, io.idx_blks_read
+        FROM pg_stat_user_indexes s
+        JOIN pg_statio_user_indexes io ON io.indexrelid = s.indexrelid
+        WHERE s.relname = ANY(%s)
+        ORDER BY s.relname, s.indexrelname
+    """
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError(
+                f"Statistika faqat PostgreSQL uchun mavjud (joriy: {connection.vendor})"
+            )
+
+        tables = [EcoPacketQrCode._meta.db_table, Packet._meta.db_table]
+
+        with connection.cursor() as cursor:
+            cursor.execute(self.TABLE_SQL, [tables])
+            table_rows = cursor.fetchall()
+            cursor.execute(self.INDEX_SQL, [tables])
+            index_rows = cursor.fetchall()
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Jadvallar:"))
+        for relname, seq_scan, idx_scan, live_rows in table_rows:
+            idx_scan = idx_scan or 0
+            total = seq_scan + idx_scan
+            ratio = idx_scan / total * 100 if total else 0
+            self.stdout.write(
+                f"  {relname}: {live_rows} qator, seq_scan={seq_scan}, "
+                f"idx_scan={idx_scan}, indeks ulushi={ratio:.2f}%"
+            )
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Indekslar:"))
+        for relname, indexname, idx_scan, blks_hit, blks_read in index_rows:
+            total = blks_hit + blks_read
+            hit_ratio = blks_hit / total * 100 if total else 0
+            line = (
+                f"  {relname}.{indexname}: idx_scan={idx_scan}, "
+                f"kesh hit={hit_ratio:.2f}%"
+            )
+            if idx_scan == 0:
+                self.stdout.write(self.style.WARNING(line + " (ishlatilmagan)"))
+            else:
+                self.stdout.write(line)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecopacket', '0013_remove_duplicate_qr_codes'),
+        ('packet', '0006_packet_packet_qr_code_uniq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ecopacketqrcode',
+            name='qr_code',
+            field=models.CharField(max_length=50, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='ecopacketqrcode',
+            index=models.Index(condition=models.Q(('scannered_at__isnull', True)), fields=['qr_code'], name='eco_qr_unscanned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ecopacketqrcode',
+            index=models.Index(fields=['user', 'scannered_at'], name='eco_qr_user_scanned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ecopacketqrcode',
+            index=models.Index(fields=['category', 'scannered_at'], name='eco_qr_cat_scanned_idx'),
+        ),
+    ]
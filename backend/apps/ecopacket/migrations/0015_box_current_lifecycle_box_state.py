@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_current_lifecycle(apps, schema_editor):
+    """Har bir Box uchun oxirgi LifeCycle va uning state'ini yozish"""
+    Box = apps.get_model("ecopacket", "Box")
+    LifeCycle = apps.get_model("ecopacket", "LifeCycle")
+
+    last_lifecycle = LifeCycle.objects.filter(box=OuterRef("pk")).order_by("-pk")
+    Box.objects.filter(pk__in=LifeCycle.objects.values("box")).update(
+        current_lifecycle=Subquery(last_lifecycle.values("pk")[:1]),
+        state=Subquery(last_lifecycle.values("state")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecopacket', '0014_alter_ecopacketqrcode_qr_code_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='box',
+            name='current_lifecycle',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ecopacket.lifecycle'),
+        ),
+        migrations.AddField(
+            model_name='box',
+            name='state',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(
+            fill_current_lifecycle, reverse_code=migrations.RunPython.noop
+        ),
+    ]
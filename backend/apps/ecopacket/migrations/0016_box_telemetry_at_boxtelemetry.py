@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecopacket', '0015_box_current_lifecycle_box_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='box',
+            name='telemetry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='BoxTelemetry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('state', models.PositiveSmallIntegerField()),
+                ('ts', models.DateTimeField()),
+                ('box', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='telemetry', to='ecopacket.box')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['box', 'ts'], name='telemetry_box_ts_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecopacket', '0016_box_telemetry_at_boxtelemetry'),
+        ('packet', '0006_packet_packet_qr_code_uniq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='box',
+            name='lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='box',
+            name='lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='box',
+            index=models.Index(fields=['lat', 'lng'], name='box_lat_lng_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated manually to fill numeric coordinates from location strings
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def fill_box_lat_lng(apps, schema_editor):
+    """
+    Oxirgi LifeCycle.location ("(lng, lat)") dan lat/lng ustunlarini
+    to'ldirish. Formati noto'g'ri location'lar o'tkazib yuboriladi.
+    """
+    Box = apps.get_model("ecopacket", "Box")
+    LifeCycle = apps.get_model("ecopacket", "LifeCycle")
+
+    last_location = (
+        LifeCycle.objects.filter(box=OuterRef("pk"), location__startswith="(")
+        .order_by("-pk")
+        .values("location")[:1]
+    )
+    boxes = []
+    for box in (
+        Box.objects.only("id")
+        .annotate(last_location=Subquery(last_location))
+        .filter(last_location__isnull=False)
+    ):
+        try:
+            lng, lat = (
+                float(coord.strip())
+                for coord in box.last_location.strip("()").split(",")
+            )
+        except ValueError:
+            continue
+        box.lat = lat
+        box.lng = lng
+        boxes.append(box)
+
+    Box.objects.bulk_update(boxes, ["lat", "lng"], batch_size=500)
+    if boxes:
+        print(f"Filled coordinates for {len(boxes)} boxes")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecopacket", "0017_box_lat_box_lng_box_box_lat_lng_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_box_lat_lng, reverse_code=migrations.RunPython.noop),
+    ]
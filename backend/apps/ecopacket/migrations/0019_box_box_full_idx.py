@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecopacket', '0018_fill_box_lat_lng'),
+        ('packet', '0006_packet_packet_qr_code_uniq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='box',
+            index=models.Index(condition=models.Q(('state__gte', 80)), fields=['state'], name='box_full_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecopacket', '0019_box_box_full_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='box',
+            name='fill_rate',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='box',
+            name='full_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecopacket', '0020_box_fill_forecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerShareDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('box', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seller_share_deltas', to='ecopacket.box')),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecopacket', '0021_sellersharedelta'),
+        ('packet', '0007_scanned_keyset_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ecopacketqrcode',
+            index=models.Index(condition=models.Q(('scannered_at__isnull', False)), fields=['-scannered_at', '-id'], name='eco_qr_scanned_keyset_idx'),
+        ),
+    ]
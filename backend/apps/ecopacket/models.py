@@ -1,10 +1,45 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from apps.utils import get_uid
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 # Create your models here.
 
 
+def parse_location(location):
+    """
+    "(lng, lat)" formatidagi location'ni (lat, lng) ga aylantirish.
+    Format noto'g'ri bo'lsa (None, None).
+    """
+    if not location or not location.startswith("(") or not location.endswith(")"):
+        return None, None
+    try:
+        lng, lat = (float(coord.strip()) for coord in location.strip("()").split(","))
+    except ValueError:
+        return None, None
+    return lat, lng
+
+
+class BoxQuerySet(models.QuerySet):
+    def with_pending(self):
+        """Hali seller_share ga qo'shilmagan SellerShareDelta yig'indisi"""
+        pending = (
+            SellerShareDelta.objects.filter(box=OuterRef("pk"))
+            .order_by()
+            .values("box")
+            .annotate(total=Sum("amount"))
+            .values("total")
+        )
+        decimal = models.DecimalField(max_digits=20, decimal_places=2)
+        return self.annotate(
+            pending_seller_share=Coalesce(
+                Subquery(pending, output_field=decimal), Value(0), output_field=decimal
+            )
+        )
+
+
 class Box(models.Model):
     name = models.CharField(max_length=200)
     sim_module = models.CharField(max_length=20, unique=True)
@@ -36,16 +71,57 @@ class Box(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(100)],
     )
 
+    # Oxirgi LifeCycle va uning holati (LifeCycle.save() orqali yangilanadi)
+    current_lifecycle = models.ForeignKey(
+        "ecopacket.LifeCycle",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    state = models.PositiveSmallIntegerField(default=0)
+    # Oxirgi qo'llanilgan telemetriya vaqti (eski o'qishlar holatni qaytarmasligi uchun)
+    telemetry_at = models.DateTimeField(blank=True, null=True)
+    # Oxirgi yuborilgan koordinatalar (telemetriya / LifeCycle.location) -
+    # xarita va bbox so'rovlari uchun
+    lat = models.FloatField(blank=True, null=True)
+    lng = models.FloatField(blank=True, null=True)
+    # To'lish prognozi (forecast_fill buyrug'i hisoblaydi): soatiga % va
+    # FULL_STATE ga yetish taxminiy vaqti
+    fill_rate = models.FloatField(blank=True, null=True)
+    full_at = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    objects = BoxQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["lat", "lng"], name="box_lat_lng_idx"),
+            # Bo'shatish navbati (to'lgan box'lar) uchun qisman indeks
+            models.Index(
+                fields=["state"],
+                condition=models.Q(state__gte=80),
+                name="box_full_idx",
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"Box {self.sim_module}"
 
     @property
-    def state(self):
-        return self.lifecycle.last().state
+    def cycle_created_at(self):
+        if self.current_lifecycle is None:
+            return None
+        return self.current_lifecycle.started_at
 
     @property
-    def cycle_created_at(self):
-        return self.lifecycle.last().started_at
+    def seller_share_balance(self):
+        """seller_share + hali compact qilinmagan SellerShareDelta'lar"""
+        pending = getattr(self, "pending_seller_share", None)
+        if pending is None:
+            if not settings.SETTLEMENT_LEDGER:
+                return self.seller_share
+            pending = self.seller_share_deltas.aggregate(total=Sum("amount"))["total"]
+        return self.seller_share + (pending or 0)
 
     def save(self, *args, **kwargs) -> None:
         self.qr_code = self.sim_module
@@ -65,9 +141,55 @@ class LifeCycle(models.Model):
     def __str__(self) -> str:
         return f"{self.box.name} {self.employee}"
 
+    def save(self, *args, **kwargs) -> None:
+        created = self.pk is None
+        super().save(*args, **kwargs)
+
+        # Box'dagi joriy LifeCycle, state va koordinatalarni sinxronlash
+        # (Box.location - operator kiritadigan maydon, unga tegilmaydi).
+        # Yangi LifeCycle har doim joriy bo'ladi, eskisi faqat joriy bo'lsa.
+        boxes = Box.objects.filter(pk=self.box_id)
+        if not created:
+            boxes = boxes.filter(current_lifecycle=self)
+        fields = {"current_lifecycle": self, "state": self.state}
+        lat, lng = parse_location(self.location)
+        if lat is not None:
+            fields["lat"] = lat
+            fields["lng"] = lng
+        boxes.update(**fields)
+
+
+class SellerShareDelta(models.Model):
+    """Ledger rejimida Box.seller_share ga qo'shilishi kutilayotgan ulushlar"""
+
+    box = models.ForeignKey(
+        Box, on_delete=models.CASCADE, related_name="seller_share_deltas"
+    )
+    amount = models.DecimalField(max_digits=20, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.box_id} {self.amount}"
+
+
+class BoxTelemetry(models.Model):
+    """Box modemidan kelgan to'lganlik darajasi va joylashuv (faqat qo'shiladi)"""
+
+    box = models.ForeignKey(Box, on_delete=models.CASCADE, related_name="telemetry")
+    lat = models.FloatField()
+    lng = models.FloatField()
+    state = models.PositiveSmallIntegerField()
+    ts = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["box", "ts"], name="telemetry_box_ts_idx")]
+
+    def __str__(self) -> str:
+        return f"{self.box_id} {self.state} {self.ts}"
+
 
 class EcoPacketQrCode(models.Model):
-    qr_code = models.CharField(max_length=50)
+    qr_code = models.CharField(max_length=50, unique=True)
     user = models.ForeignKey(
         to="account.User", on_delete=models.SET_NULL, blank=True, null=True
     )
@@ -80,6 +202,27 @@ class EcoPacketQrCode(models.Model):
     scannered_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Skanerlanmagan kodlar (IoT skanerlash) uchun qisman indeks
+            models.Index(
+                fields=["qr_code"],
+                condition=models.Q(scannered_at__isnull=True),
+                name="eco_qr_unscanned_idx",
+            ),
+            # Uy, hudud va daromad statistikasi uchun
+            models.Index(fields=["user", "scannered_at"], name="eco_qr_user_scanned_idx"),
+            models.Index(
+                fields=["category", "scannered_at"], name="eco_qr_cat_scanned_idx"
+            ),
+            # Skanerlangan kodlar ro'yxati (keyset sahifalash)
+            models.Index(
+                fields=["-scannered_at", "-id"],
+                condition=models.Q(scannered_at__isnull=False),
+                name="eco_qr_scanned_keyset_idx",
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.qr_code
 
@@ -11,7 +11,18 @@ class BoxEcoPacketSerializer(serializers.ModelSerializer):
         model = Box
         fields = ("id", "name")
 
-class AgentBoxSerializer(serializers.ModelSerializer):
+class SellerShareBalanceMixin:
+    """Javobdagi seller_share - compact qilinmagan delta'lar bilan (ledger rejimi)"""
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["seller_share"] = self.fields["seller_share"].to_representation(
+            instance.seller_share_balance
+        )
+        return data
+
+
+class AgentBoxSerializer(SellerShareBalanceMixin, serializers.ModelSerializer):
     class CategoryForAgentBoxSerializer(serializers.ModelSerializer):
         class Meta:
             model = Category
@@ -21,13 +32,14 @@ class AgentBoxSerializer(serializers.ModelSerializer):
         model = Box
         fields = "__all__"
 
-class BoxSerializer(serializers.ModelSerializer):
+class BoxSerializer(SellerShareBalanceMixin, serializers.ModelSerializer):
     created_at = serializers.DateTimeField(read_only=True)
     qr_code = serializers.CharField(read_only=True)
 
     class Meta:
         model = Box
         fields = "__all__"
+        read_only_fields = ("current_lifecycle", "state", "fill_rate", "full_at")
 
 
 class LifeCycleSerializer(serializers.ModelSerializer):
@@ -0,0 +1,174 @@
+"""
+QrCheckLog uchun buferli, asinxron yozuvchi.
+
+/check/ endpointi log yozuvini INSERT qilmasdan chegaralangan navbatga
+qo'yadi. Fon thread navbatni QR_CHECK_LOG_BATCH_SIZE ta yozuv yig'ilganda
+yoki QR_CHECK_LOG_FLUSH_INTERVAL soniyada bir marta bulk_create bilan
+bazaga yozadi. Navbat to'lsa yangi yozuvlar tashlab yuboriladi va
+"dropped" hisoblagichi oshadi - so'rov hech qachon kutib qolmaydi.
+
+Jarayon to'xtaganda (atexit) stop() fon thread'ni to'xtatadi: u qo'lidagi
+batch'ni yozib chiqadi, navbatda qolganlari esa joriy thread'da yoziladi.
+Navbat va hisoblagichlar har bir jarayonda alohida (gunicorn worker'lari
+o'rtasida umumiy emas).
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.bank.models import QrCheckLog
+
+logger = logging.getLogger(__name__)
+
+# Fon thread'ni navbatdagi kutishdan uyg'otish uchun
+_STOP = object()
+
+
+class QrCheckLogWriter:
+    def __init__(self, max_size, batch_size, flush_interval, background=True):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.background = background
+        self.thread = None
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "flush_errors": 0}
+
+    def log(self, **fields):
+        """Yozuvni navbatga qo'yish (bloklanmaydi)"""
+        fields.setdefault("request_time", timezone.now())
+        try:
+            self.queue.put_nowait(fields)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return
+        self.stats["enqueued"] += 1
+
+        if self.background:
+            self.start()
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(
+                target=self.run, name="qr-check-log-writer", daemon=True
+            )
+            self.thread.start()
+
+    def run(self):
+        while not self.stopping.is_set():
+            batch = self.collect()
+            if batch:
+                self.write(batch)
+                # Fon thread'ning ulanishi uzoq ochiq qolmasligi uchun
+                close_old_connections()
+
+    def collect(self):
+        """batch_size ta yozuv yoki flush_interval tugaguncha yig'ish"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                fields = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if fields is _STOP:
+                break
+            batch.append(fields)
+        return batch
+
+    def write(self, batch):
+        with self.write_lock:
+            try:
+                QrCheckLog.objects.bulk_create(
+                    [QrCheckLog(**fields) for fields in batch],
+                    batch_size=self.batch_size,
+                )
+            except Exception:
+                self.stats["flush_errors"] += 1
+                self.stats["dropped"] += len(batch)
+                logger.exception("QrCheckLog batch could not be written")
+                return
+            self.stats["written"] += len(batch)
+
+    def flush(self):
+        """Navbatdagi barcha yozuvlarni joriy thread'da yozish"""
+        batch = []
+        while True:
+            try:
+                fields = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if fields is _STOP:
+                continue
+            batch.append(fields)
+            if len(batch) >= self.batch_size:
+                self.write(batch)
+                batch = []
+        if batch:
+            self.write(batch)
+
+    def stop(self, timeout=None):
+        """
+        Fon thread'ni to'xtatish (u yig'ayotgan batch'ni yozib chiqadi) va
+        navbatda qolganlarini yozish
+        """
+        self.stopping.set()
+        thread = self.thread
+        if thread is not None and thread.is_alive():
+            try:
+                self.queue.put_nowait(_STOP)
+            except queue.Full:
+                # Navbat to'la - thread kutmasdan keyingi batch'ni oladi
+                pass
+            thread.join(self.flush_interval + 5 if timeout is None else timeout)
+        self.flush()
+
+    def get_stats(self):
+        """
+        Joriy jarayon hisoblagichlari - har bir gunicorn worker'ida alohida,
+        qr-check-log-stats/ faqat so'rovga javob bergan worker'ni ko'rsatadi
+        """
+        return {**self.stats, "queued": self.queue.qsize(), "pid": os.getpid()}
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = QrCheckLogWriter(
+                    max_size=settings.QR_CHECK_LOG_QUEUE_SIZE,
+                    batch_size=settings.QR_CHECK_LOG_BATCH_SIZE,
+                    flush_interval=settings.QR_CHECK_LOG_FLUSH_INTERVAL,
+                    background=settings.QR_CHECK_LOG_BACKGROUND,
+                )
+                # Jarayon to'xtaganda fon thread'dagi va navbatdagi
+                # yozuvlarni yozish
+                atexit.register(_writer.stop)
+    return _writer
+
+
+def log_qr_check(**fields):
+    """QrCheckLog yozuvini buferli yozuvchiga berish"""
+    get_writer().log(**fields)
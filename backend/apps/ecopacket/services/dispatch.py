@@ -0,0 +1,186 @@
+"""
+To'lgan box'larni bo'shatish uchun dispetcherlik.
+
+Navbat - Box.state >= FULL_STATE bo'lgan faol box'lar (qisman indeks
+"box_full_idx"), Box.state esa telemetriya kelishi bilan yangilanadi.
+Xodimga eng yaqin box'lar (lat, lng) indeksi bo'yicha kengayib boruvchi
+kvadrat oyna (grid halqalari) bilan topiladi va haversine masofasi bilan
+saralanadi. Marshrut greedy (eng yaqin qo'shni) + 2-opt bilan tuziladi.
+"""
+
+import math
+
+from apps.ecopacket.models import Box
+
+FULL_STATE = 80
+
+EARTH_RADIUS_KM = 6371.0
+# Qidiruv oynasining boshlang'ich yarim kengligi va chegarasi (gradus)
+SEARCH_START_DEG = 0.05
+SEARCH_MAX_DEG = 5.0
+
+MAX_K = 50
+MAX_ROUTE_STOPS = 30
+
+BOX_FIELDS = (
+    "id",
+    "name",
+    "sim_module",
+    "state",
+    "lat",
+    "lng",
+    "category_id",
+    "current_lifecycle_id",
+)
+
+
+class InvalidPoint(Exception):
+    """lat/lng yoki k parametri noto'g'ri"""
+
+
+def parse_point(lat, lng):
+    """
+    Xodim koordinatalarini tekshirish.
+
+    Raises:
+        InvalidPoint
+    """
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        raise InvalidPoint("lat and lng must be numbers")
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise InvalidPoint("lat/lng out of range")
+    return lat, lng
+
+
+def parse_k(value, default=10, limit=MAX_K):
+    if value in (None, ""):
+        return default
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        raise InvalidPoint("k must be an integer")
+    if k < 1:
+        raise InvalidPoint("k must be positive")
+    return min(k, limit)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def pickup_queue(user=None):
+    """
+    Bo'shatilishi kerak bo'lgan box'lar: to'lgan, faol, buyurtma qilinmagan.
+    user berilsa, faqat uning kategoriyalaridagi box'lar.
+    """
+    boxes = Box.objects.filter(
+        state__gte=FULL_STATE,
+        is_active=True,
+        lat__isnull=False,
+        lng__isnull=False,
+        current_lifecycle__isnull=False,
+        current_lifecycle__employee__isnull=True,
+    )
+    if user is not None:
+        boxes = boxes.filter(category__in=user.categories.all())
+    return boxes
+
+
+def nearest_boxes(boxes, lat, lng, k):
+    """
+    Berilgan nuqtaga eng yaqin k ta box.
+
+    Oyna har safar ikki barobar kengayadi, k ta box topilgach yana bir marta
+    kengaytiriladi - kvadrat burchagidagi box doira ichidagidan uzoq bo'lishi
+    mumkin.
+
+    Returns:
+        [(distance_km, box_dict), ...] yaqinlik tartibida
+    """
+
+    def window(half):
+        return list(
+            boxes.filter(
+                lat__range=(lat - half, lat + half),
+                lng__range=(lng - half, lng + half),
+            ).values(*BOX_FIELDS)
+        )
+
+    half = SEARCH_START_DEG
+    found = window(half)
+    while len(found) < k and half < SEARCH_MAX_DEG:
+        half *= 2
+        found = window(half)
+    if found and half < SEARCH_MAX_DEG:
+        found = window(half * 2)
+
+    # Masofa, so'ng ko'proq to'lgani oldinda
+    ranked = sorted(
+        found,
+        key=lambda box: (
+            haversine_km(lat, lng, box["lat"], box["lng"]),
+            -box["state"],
+            box["id"],
+        ),
+    )
+    return [
+        (round(haversine_km(lat, lng, box["lat"], box["lng"]), 3), box)
+        for box in ranked[:k]
+    ]
+
+
+def route_length(start, stops):
+    length = 0
+    position = start
+    for stop in stops:
+        length += haversine_km(*position, stop["lat"], stop["lng"])
+        position = (stop["lat"], stop["lng"])
+    return length
+
+
+def plan_route(start, stops):
+    """
+    Boshlang'ich nuqtadan barcha box'larni aylanib chiqish tartibi.
+
+    Avval greedy (har doim eng yaqin box), so'ng 2-opt - kesishgan
+    qismlarni teskari aylantirish yo'lni qisqartirmaguncha.
+
+    Args:
+        start: (lat, lng)
+        stops: [{"lat": float, "lng": float, ...}, ...]
+
+    Returns:
+        (ordered_stops, total_km)
+    """
+    remaining = list(stops)
+    route = []
+    position = start
+    while remaining:
+        nearest = min(
+            remaining,
+            key=lambda stop: haversine_km(*position, stop["lat"], stop["lng"]),
+        )
+        remaining.remove(nearest)
+        route.append(nearest)
+        position = (nearest["lat"], nearest["lng"])
+
+    best = route_length(start, route)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(route) - 1):
+            for j in range(i + 2, len(route) + 1):
+                candidate = route[:i] + route[i:j][::-1] + route[j:]
+                length = route_length(start, candidate)
+                if length + 1e-9 < best:
+                    route, best = candidate, length
+                    improved = True
+
+    return route, round(best, 3)
@@ -0,0 +1,151 @@
+"""
+Box'larning to'lish tezligi va to'lish vaqti prognozi.
+
+Har bir box uchun to'lish tezligi (soatiga %) kichik kvadratlar usuli bilan
+baholanadi. Ma'lumot ikki manbadan olinadi:
+    - BoxTelemetry tarixi - holat keskin tushgan joyda (bo'shatilgan) yangi
+      to'lish egri chizig'i boshlanadi;
+    - yakunlangan LifeCycle'lar - (started_at, 0) dan (filled_at, state) gacha.
+
+Har bir egri chiziq o'z boshlang'ich nuqtasiga ega, qiyalik esa box bo'yicha
+umumiy: egri chiziq ichida markazlashtirilgan t va state bo'yicha
+rate = sum(dt * ds) / sum(dt * dt). Hisob butun park uchun NumPy massivlarida
+(np.bincount) bajariladi - box bo'yicha ORM sikllari yo'q.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from apps.ecopacket.models import Box, BoxTelemetry, LifeCycle
+from apps.ecopacket.services.dispatch import FULL_STATE
+
+HISTORY_DAYS = 30
+# Holat shuncha foizga tushsa box bo'shatilgan deb hisoblanadi
+EMPTY_DROP = 20
+# Prognoz uchun egri chiziqlardagi minimal nuqtalar soni
+MIN_SAMPLES = 3
+UPDATE_BATCH_SIZE = 1000
+
+
+def load_samples(since):
+    """
+    (box_id, soat, state, egri_chiziq_id) massivlari.
+
+    Faqat ikkita so'rov: telemetriya va yakunlangan LifeCycle'lar.
+    """
+    telemetry = np.array(
+        [
+            (box_id, ts.timestamp(), state)
+            for box_id, ts, state in BoxTelemetry.objects.filter(ts__gte=since)
+            .order_by("box_id", "ts")
+            .values_list("box_id", "ts", "state")
+            .iterator(chunk_size=5000)
+        ],
+        dtype=float,
+    ).reshape(-1, 3)
+
+    cycles = np.array(
+        LifeCycle.objects.filter(
+            started_at__gte=since, filled_at__isnull=False, state__gt=0
+        ).values_list("box_id", "started_at", "filled_at", "state"),
+        dtype=object,
+    ).reshape(-1, 4)
+
+    # Telemetriya egri chiziqlari: box o'zgarganda yoki holat tushganda yangisi
+    box_ids, seconds, states = telemetry.T
+    new_curve = np.ones(len(box_ids), dtype=bool)
+    new_curve[1:] = (box_ids[1:] != box_ids[:-1]) | (
+        states[1:] <= states[:-1] - EMPTY_DROP
+    )
+    curves = np.cumsum(new_curve) - 1
+
+    # Har bir yakunlangan LifeCycle - ikki nuqtali alohida egri chiziq
+    if len(cycles):
+        first = curves[-1] + 1 if len(curves) else 0
+        cycle_curves = np.arange(first, first + len(cycles))
+        started = np.array([dt.timestamp() for dt in cycles[:, 1]], dtype=float)
+        filled = np.array([dt.timestamp() for dt in cycles[:, 2]], dtype=float)
+        cycle_boxes = cycles[:, 0].astype(float)
+
+        box_ids = np.concatenate([box_ids, cycle_boxes, cycle_boxes])
+        seconds = np.concatenate([seconds, started, filled])
+        states = np.concatenate(
+            [states, np.zeros(len(cycles)), cycles[:, 3].astype(float)]
+        )
+        curves = np.concatenate([curves, cycle_curves, cycle_curves])
+
+    return box_ids.astype(np.int64), seconds / 3600, states, curves
+
+
+def fit_fill_rates(box_ids, hours, states, curves):
+    """
+    Box bo'yicha to'lish tezligi (soatiga %).
+
+    Returns:
+        {box_id: (rate, samples)} - rate musbat bo'lmasa yoki nuqtalar
+        yetarli bo'lmasa rate = None
+    """
+    if not len(box_ids):
+        return {}
+
+    # Egri chiziq ichida markazlashtirish
+    curve_count = np.bincount(curves)
+    t = hours - (np.bincount(curves, weights=hours) / curve_count)[curves]
+    s = states - (np.bincount(curves, weights=states) / curve_count)[curves]
+
+    boxes, box_index = np.unique(box_ids, return_inverse=True)
+    sxy = np.bincount(box_index, weights=t * s, minlength=len(boxes))
+    sxx = np.bincount(box_index, weights=t * t, minlength=len(boxes))
+    samples = np.bincount(box_index, minlength=len(boxes))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = np.where(sxx > 0, sxy / sxx, np.nan)
+    valid = (rates > 0) & (samples >= MIN_SAMPLES)
+
+    return {
+        int(box_id): (float(rate) if ok else None, int(count))
+        for box_id, rate, ok, count in zip(boxes, rates, valid, samples)
+    }
+
+
+def predict_full_at(state, measured_at, rate):
+    """FULL_STATE ga yetish vaqti (allaqachon to'lgan bo'lsa measured_at)"""
+    if state >= FULL_STATE:
+        return measured_at
+    if not rate or measured_at is None:
+        return None
+    return measured_at + timedelta(hours=(FULL_STATE - state) / rate)
+
+
+def update_forecasts(history_days=HISTORY_DAYS):
+    """
+    Butun park uchun fill_rate va full_at ni qayta hisoblash.
+
+    Returns:
+        (boxes_updated, boxes_with_forecast)
+    """
+    since = timezone.now() - timedelta(days=history_days)
+    rates = fit_fill_rates(*load_samples(since))
+
+    boxes = []
+    for pk, state, telemetry_at, started_at in Box.objects.values_list(
+        "pk", "state", "telemetry_at", "current_lifecycle__started_at"
+    ).iterator(chunk_size=UPDATE_BATCH_SIZE):
+        rate = rates.get(pk, (None, 0))[0]
+        boxes.append(
+            Box(
+                pk=pk,
+                fill_rate=rate and round(rate, 4),
+                full_at=predict_full_at(state, telemetry_at or started_at, rate),
+            )
+        )
+
+    with transaction.atomic():
+        Box.objects.bulk_update(
+            boxes, ["fill_rate", "full_at"], batch_size=UPDATE_BATCH_SIZE
+        )
+
+    return len(boxes), sum(1 for box in boxes if box.full_at is not None)
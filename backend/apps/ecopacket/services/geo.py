@@ -0,0 +1,112 @@
+"""
+Box'lar xaritasi uchun geo yordamchilar.
+
+Koordinatalar Box.lat / Box.lng sonli ustunlarida saqlanadi, shuning uchun
+bbox filtri (lat, lng) indeksidan foydalanadi. Kichik zoom'da box'lar
+server tomonida grid kataklarga guruhlanadi: FLOOR(lat / cell) va
+FLOOR(lng / cell) bo'yicha GROUP BY - oddiy SQL, PostgreSQL va SQLite'da
+bir xil ishlaydi.
+"""
+
+from django.db.models import Avg, Count, F, Max, Min
+from django.db.models.functions import Floor
+
+from apps.ecopacket.models import Box
+
+# Shu zoom va undan kattasida alohida box'lar qaytariladi
+CLUSTER_MAX_ZOOM = 13
+# Bir tile (256px) kengligiga to'g'ri keladigan kataklar soni
+CELLS_PER_TILE = 4
+MAX_BOXES = 2000
+
+
+class InvalidBBox(Exception):
+    """bbox yoki zoom parametri noto'g'ri"""
+
+
+def parse_bbox(value):
+    """
+    "min_lng,min_lat,max_lng,max_lat" ni tekshirish.
+
+    Raises:
+        InvalidBBox
+    """
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in value.split(","))
+    except (AttributeError, ValueError):
+        raise InvalidBBox("bbox must be 'min_lng,min_lat,max_lng,max_lat'")
+    if min_lat > max_lat or min_lng > max_lng:
+        raise InvalidBBox("bbox min values must be less than max values")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def parse_zoom(value):
+    try:
+        zoom = int(value)
+    except (TypeError, ValueError):
+        raise InvalidBBox("zoom must be an integer")
+    if not 0 <= zoom <= 22:
+        raise InvalidBBox("zoom must be between 0 and 22")
+    return zoom
+
+
+def cell_size(zoom):
+    """Zoom bo'yicha grid katak o'lchami (gradusda)"""
+    return 360 / (2**zoom * CELLS_PER_TILE)
+
+
+def boxes_in_bbox(bbox):
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return Box.objects.filter(
+        lat__gte=min_lat, lat__lte=max_lat, lng__gte=min_lng, lng__lte=max_lng
+    )
+
+
+def box_map(bbox, zoom):
+    """
+    Xarita ma'lumotlari.
+
+    Returns:
+        {"type": "boxes", "boxes": [...]} - zoom >= CLUSTER_MAX_ZOOM
+        {"type": "clusters", "clusters": [...]} - kichik zoom'da
+    """
+    boxes = boxes_in_bbox(bbox)
+
+    if zoom >= CLUSTER_MAX_ZOOM:
+        return {
+            "type": "boxes",
+            "boxes": list(
+                boxes.values("id", "name", "sim_module", "state", "lat", "lng")
+                .order_by("id")[:MAX_BOXES]
+            ),
+        }
+
+    cell = cell_size(zoom)
+    clusters = (
+        boxes.annotate(
+            cell_lat=Floor(F("lat") / cell), cell_lng=Floor(F("lng") / cell)
+        )
+        .values("cell_lat", "cell_lng")
+        .annotate(
+            count=Count("id"),
+            lat=Avg("lat"),
+            lng=Avg("lng"),
+            max_state=Max("state"),
+            # Katakda bitta box bo'lsa, uning id'si
+            box_id=Min("id"),
+        )
+        .order_by()
+    )
+    return {
+        "type": "clusters",
+        "clusters": [
+            {
+                "lat": cluster["lat"],
+                "lng": cluster["lng"],
+                "count": cluster["count"],
+                "max_state": cluster["max_state"],
+                "box_id": cluster["box_id"] if cluster["count"] == 1 else None,
+            }
+            for cluster in clusters
+        ],
+    }
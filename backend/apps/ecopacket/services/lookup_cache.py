@@ -0,0 +1,311 @@
+"""
+Box (sim_module bo'yicha) va Category uchun read-through kesh.
+
+Skanerlashda har safar Box va kategoriya o'qiladi, ular esa oyiga bir necha
+marta o'zgaradi. O'qish tartibi:
+    1. jarayon ichidagi kichik LRU (qisqa TTL bilan);
+    2. Redis (versiyalangan kalitlar, uzunroq TTL);
+    3. PostgreSQL - natija ikkala keshga yoziladi.
+
+Box va Category o'zgarganda yoki o'chirilganda signallar (apps/ecopacket/signals.py)
+kalitlarni o'chiradi. Boshqa jarayonlarning LRU'si LOCAL_TTL ichida eskiradi.
+Redis ishlamasa kesh undan RETRY_AFTER soniya foydalanmay, to'g'ridan-to'g'ri
+bazaga murojaat qiladi.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+import redis
+from django.conf import settings
+
+from apps.bank.models import BankAccount
+from apps.account.models import User
+from apps.ecopacket.models import Box
+from apps.packet.models import Category
+
+# Keshlangan ma'lumot tuzilishi o'zgarsa, versiyani oshiring
+CACHE_VERSION = 2
+
+LOCAL_SIZE = 1024
+LOCAL_TTL = 5
+REDIS_TTL = 60 * 60
+RETRY_AFTER = 30
+
+BOX = "box"
+CATEGORY = "category"
+
+
+class LocalLRU:
+    """Jarayon ichidagi, TTL'li, thread-safe LRU kesh"""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.size:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+local_cache = LocalLRU(LOCAL_SIZE, LOCAL_TTL)
+
+stats = {
+    "local_hits": 0,
+    "redis_hits": 0,
+    "misses": 0,
+    "check_hits": 0,
+    "check_misses": 0,
+    "redis_errors": 0,
+}
+
+_redis_client = None
+_redis_down_until = 0
+
+
+def get_redis():
+    """Redis client (ishlamay qolgan bo'lsa RETRY_AFTER davomida None)"""
+    global _redis_client
+    if time.monotonic() < _redis_down_until:
+        return None
+    if _redis_client is None:
+        _redis_client = redis.StrictRedis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=0,
+            decode_responses=True,
+            socket_timeout=0.1,
+            socket_connect_timeout=0.1,
+        )
+    return _redis_client
+
+
+def _redis_failed():
+    global _redis_down_until
+    stats["redis_errors"] += 1
+    _redis_down_until = time.monotonic() + RETRY_AFTER
+
+
+def make_key(kind, key):
+    return f"lookup:v{CACHE_VERSION}:{kind}:{key}"
+
+
+def redis_get_json(key):
+    """Redis'dan JSON qiymat (yo'q bo'lsa yoki Redis ishlamasa None)"""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        raw = client.get(key)
+    except redis.RedisError:
+        _redis_failed()
+        return None
+    return None if raw is None else json.loads(raw)
+
+
+def redis_set_json(key, value, ttl):
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.set(key, json.dumps(value), ex=ttl)
+    except redis.RedisError:
+        _redis_failed()
+
+
+def redis_delete(*keys):
+    client = get_redis()
+    if client is None or not keys:
+        return
+    try:
+        client.delete(*keys)
+    except redis.RedisError:
+        _redis_failed()
+
+
+def redis_run(callback):
+    """
+    callback(client) natijasi - boshqa Redis buyruqlari (sorted set va h.k.)
+    uchun. Redis ishlamasa yoki xato bo'lsa None.
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return callback(client)
+    except redis.RedisError:
+        _redis_failed()
+        return None
+
+
+def read_through(kind, key, load):
+    """
+    LRU -> Redis -> load() tartibida o'qish.
+
+    load() JSON'ga aylantiriladigan dict yoki None (topilmadi) qaytaradi,
+    None keshlanmaydi.
+    """
+    cache_key = make_key(kind, key)
+
+    value = local_cache.get(cache_key)
+    if value is not None:
+        stats["local_hits"] += 1
+        return value
+
+    value = redis_get_json(cache_key)
+    if value is not None:
+        stats["redis_hits"] += 1
+        local_cache.set(cache_key, value)
+        return value
+
+    stats["misses"] += 1
+    value = load()
+    if value is None:
+        return None
+
+    local_cache.set(cache_key, value)
+    redis_set_json(cache_key, value, REDIS_TTL)
+    return value
+
+
+def invalidate(kind, key):
+    """Kalitni LRU va Redis'dan o'chirish"""
+    cache_key = make_key(kind, key)
+    local_cache.delete(cache_key)
+    redis_delete(cache_key)
+
+
+def get_stats():
+    """Joriy jarayonning hit/miss hisoblagichlari"""
+    lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+    hits = stats["local_hits"] + stats["redis_hits"]
+    return {
+        **stats,
+        "local_size": len(local_cache.data),
+        "hit_ratio": round(hits / lookups, 4) if lookups else 0,
+    }
+
+
+def _load_box(sim_module):
+    box = (
+        Box.objects.filter(sim_module=sim_module)
+        .values(
+            "pk",
+            "name",
+            "sim_module",
+            "fandomat",
+            "is_active",
+            "category_id",
+            "seller_id",
+            "seller_percentage",
+            "seller__bankaccount",
+        )
+        .first()
+    )
+    if box is None:
+        return None
+    box["seller_percentage"] = str(box["seller_percentage"])
+    return box
+
+
+def get_scan_box(sim_module):
+    """
+    Skanerlash uchun Box (seller va uning bank hisobi bilan).
+
+    Qaytarilgan obyekt keshdan qurilgan - faqat skanerlashga kerakli
+    maydonlari to'ldirilgan, uni save() qilmang. current_lifecycle_id
+    keshlanmaydi (boshqa jarayonlarning LRU'sini yangi LifeCycle'da tozalab
+    bo'lmaydi) - settlement uni band qilish UPDATE'ida Box'dan o'qiydi.
+
+    Raises:
+        Box.DoesNotExist: bunday sim_module'li box yo'q
+    """
+    data = read_through(BOX, sim_module, lambda: _load_box(sim_module))
+    if data is None:
+        raise Box.DoesNotExist(f"Box with sim_module {sim_module} doesn't exist")
+
+    box = Box(
+        pk=data["pk"],
+        name=data["name"],
+        sim_module=data["sim_module"],
+        qr_code=data["sim_module"],
+        fandomat=data["fandomat"],
+        is_active=data["is_active"],
+        category_id=data["category_id"],
+        seller_id=data["seller_id"],
+        seller_percentage=Decimal(data["seller_percentage"]),
+    )
+    if data["seller_id"] is not None:
+        seller = User(pk=data["seller_id"])
+        if data["seller__bankaccount"] is not None:
+            seller.bankaccount = BankAccount(
+                pk=data["seller__bankaccount"], user_id=data["seller_id"]
+            )
+        box.seller = seller
+    return box
+
+
+def _load_category(pk):
+    return (
+        Category.objects.filter(pk=pk)
+        .values("pk", "name", "summa", "ignore_agent", "filter_type")
+        .first()
+    )
+
+
+def get_category(pk):
+    """Kategoriyani keshdan olish (topilmasa None)"""
+    if pk is None:
+        return None
+    data = read_through(CATEGORY, pk, lambda: _load_category(pk))
+    if data is None:
+        return None
+    return Category(
+        pk=data["pk"],
+        name=data["name"],
+        summa=data["summa"],
+        ignore_agent=data["ignore_agent"],
+        filter_type=data["filter_type"],
+    )
+
+
+def attach_category(obj):
+    """obj.category'ni (EcoPacketQrCode / FlaskQrCode) keshdan to'ldirish"""
+    obj.category = get_category(obj.category_id)
+    return obj
+
+
+def invalidate_box(sim_module):
+    invalidate(BOX, sim_module)
+
+
+def invalidate_category(pk):
+    invalidate(CATEGORY, pk)
@@ -0,0 +1,167 @@
+"""
+QR kod / barcode resolver.
+
+Universal endpointlar kodni EcoPacket va Flask jadvallaridan qidiradi.
+Ikkala jadval, to'liq kod va uning oxirgi 13 belgisi (barcode) bitta
+UNION ALL so'rov bilan unique indekslar orqali tekshiriladi, kategoriya
+esa lookup keshidan olinadi.
+"""
+
+from datetime import datetime
+
+from django.db import models
+from django.db.models import F, Value
+
+from apps.ecopacket.models import EcoPacketQrCode, FlaskQrCode
+from apps.ecopacket.services.lookup_cache import (
+    attach_category,
+    make_key,
+    redis_delete,
+    redis_get_json,
+    redis_set_json,
+    stats,
+)
+
+ECOPACKET = "ecopacket"
+FLASK = "flask"
+
+BARCODE_LENGTH = 13
+
+FIELDS = ("pk", "kind", "code", "scanned", "category_id")
+
+# /check/ natijalari keshi (faqat Redis - is_used barcha jarayonlarda bir xil
+# bo'lishi uchun LRU ishlatilmaydi)
+CHECK = "check"
+CHECK_TTL = 60
+NOT_FOUND_TTL = 30
+
+
+def normalize_code(code):
+    """Kodni tozalash (skanerlar qo'shadigan bo'sh joylar)"""
+    return code.strip()
+
+
+def candidate_codes(code):
+    """To'liq kod va (uzun bo'lsa) uning oxirgi 13 belgisi - ustuvorlik tartibida"""
+    if len(code) > BARCODE_LENGTH:
+        return [code, code[-BARCODE_LENGTH:]]
+    return [code]
+
+
+def _build(pk, kind, code, scanned, category_id):
+    if kind == ECOPACKET:
+        obj = EcoPacketQrCode(
+            pk=pk, qr_code=code, scannered_at=scanned, category_id=category_id
+        )
+    else:
+        obj = FlaskQrCode(pk=pk, bar_code=code, category_id=category_id)
+    # Kategoriya lookup keshidan olinadi
+    return attach_category(obj)
+
+
+def _find(code):
+    """(pk, kind, code, scanned, category_id) yoki None - bitta UNION ALL so'rov"""
+    codes = candidate_codes(code)
+
+    ecopacket = (
+        EcoPacketQrCode.objects.filter(qr_code__in=codes)
+        .annotate(
+            kind=Value(ECOPACKET, output_field=models.CharField()),
+            code=F("qr_code"),
+            scanned=F("scannered_at"),
+        )
+        .values_list(*FIELDS)
+        .order_by()
+    )
+    flask = (
+        FlaskQrCode.objects.filter(bar_code__in=codes)
+        .annotate(
+            kind=Value(FLASK, output_field=models.CharField()),
+            code=F("bar_code"),
+            scanned=Value(None, output_field=models.DateTimeField()),
+        )
+        .values_list(*FIELDS)
+        .order_by()
+    )
+
+    found = {(row[1], row[2]): row for row in ecopacket.union(flask, all=True)}
+
+    for candidate in codes:
+        for kind in (ECOPACKET, FLASK):
+            row = found.get((kind, candidate))
+            if row is not None:
+                return row
+
+    return None
+
+
+def resolve_code(code):
+    """
+    Kodni EcoPacket yoki Flask jadvalidan bitta so'rov bilan topish.
+
+    Ustuvorlik: to'liq kod (avval EcoPacket, keyin Flask), so'ng oxirgi
+    13 belgi (xuddi shu tartibda).
+
+    Returns:
+        (qr_type, obj, matched_code):
+            qr_type - "ecopacket", "flask" yoki None (topilmadi)
+            obj - kategoriyasi bilan EcoPacketQrCode / FlaskQrCode yoki None
+            matched_code - topilgan kod (topilmasa normallashtirilgan kod)
+    """
+    code = normalize_code(code)
+    row = _find(code)
+    if row is None:
+        return None, None, code
+    return row[1], _build(*row), row[2]
+
+
+def resolve_code_cached(code):
+    """
+    resolve_code() ning Redis keshli varianti (faqat o'qish uchun - /check/).
+
+    Topilgan kod natijasi topilgan kod bo'yicha CHECK_TTL ga, topilmagani
+    so'ralgan kod bo'yicha NOT_FOUND_TTL ga keshlanadi. Oxirgi 13 belgi
+    orqali topilganda so'ralgan kod topilgan kodga "alias" bo'ladi, shuning
+    uchun skanerlashda faqat topilgan kodni tozalash yetarli.
+    """
+    code = normalize_code(code)
+    key = make_key(CHECK, code)
+
+    entry = redis_get_json(key)
+    if entry is not None and "alias" in entry:
+        entry = redis_get_json(make_key(CHECK, entry["alias"]))
+
+    if entry is not None:
+        stats["check_hits"] += 1
+        if entry["kind"] is None:
+            return None, None, code
+        scanned = entry["scanned"] and datetime.fromisoformat(entry["scanned"])
+        row = (entry["pk"], entry["kind"], entry["code"], scanned, entry["category_id"])
+        return entry["kind"], _build(*row), entry["code"]
+
+    stats["check_misses"] += 1
+    row = _find(code)
+    if row is None:
+        redis_set_json(key, {"kind": None}, NOT_FOUND_TTL)
+        return None, None, code
+
+    pk, kind, matched, scanned, category_id = row
+    redis_set_json(
+        make_key(CHECK, matched),
+        {
+            "pk": pk,
+            "kind": kind,
+            "code": matched,
+            "scanned": scanned and scanned.isoformat(),
+            "category_id": category_id,
+        },
+        CHECK_TTL,
+    )
+    if matched != code:
+        redis_set_json(key, {"alias": matched}, CHECK_TTL)
+    return kind, _build(*row), matched
+
+
+def invalidate_checked_codes(codes):
+    """Skanerlangan / o'zgargan kodlarning /check/ keshini tozalash"""
+    redis_delete(*[make_key(CHECK, code) for code in codes])
@@ -0,0 +1,266 @@
+"""
+Skanerlash hisob-kitobi (settlement) servisi.
+
+Barcha IoT va fandomat skanerlash endpointlari pulni shu modul orqali
+o'tkazadi. Bitta tranzaksiya ichida:
+    1. EcoPacket QR kod shartli UPDATE (scannered_at IS NULL) bilan band qilinadi
+       (life_cycle - shu UPDATE ichida Box.current_lifecycle_id dan, keshdan emas);
+    2. bank hisoblari F() ifodasi bilan bitta UPDATE da oshiriladi
+       (to'plamda har bir hisob jami summa bilan bir marta);
+    3. seller ulushi Box.seller_share ga F() bilan qo'shiladi;
+       (SETTLEMENT_LEDGER rejimida 2 va 3 delta jadvallariga INSERT - ledger);
+    4. barcha Earning yozuvlari bitta bulk_create bilan yoziladi;
+    5. EcoPacket QR kodlar skanerlovchi va uning uyi oylik hisoblagichlariga
+       (UserScanCounter, HomeScanCounter) upsert bilan qo'shiladi.
+"""
+
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Subquery
+from django.utils import timezone
+
+from apps.bank.models import Earning
+from apps.bank.services.ledger import credit_accounts, credit_seller_share
+from apps.bank.services.summary import record_earnings
+from apps.ecopacket.models import Box, EcoPacketQrCode, FlaskQrCode
+from apps.ecopacket.services.resolver import invalidate_checked_codes
+from apps.home.services.scan_counters import record_scans
+
+
+class QrCodeAlreadyUsed(Exception):
+    """QR kod boshqa so'rov tomonidan allaqachon ishlatilgan"""
+
+
+def split_amount(amount, category, box, client_account):
+    """
+    Summani client va seller o'rtasida taqsimlash.
+
+    Returns:
+        (credits, seller_share):
+            credits - [(bank_account, summa), ...] Earning tartibida
+            seller_share - Box.seller_share ga qo'shiladigan ulush (Decimal)
+    """
+    # Kategoriya ignore_agent=True bo'lsa yoki seller bo'lmasa, hamma summa clientga
+    if category.ignore_agent or box.seller_id is None:
+        return [(client_account, amount)], Decimal(0)
+
+    percentage = Decimal(str(box.seller_percentage))
+    seller_share = (Decimal(amount) * percentage / 100).quantize(Decimal("0.01"))
+    client_share = amount - seller_share
+
+    return [
+        (box.seller.bankaccount, int(seller_share)),
+        (client_account, int(client_share)),
+    ], seller_share
+
+
+def claim_qr_code(ecopacket_qr, box, user=None):
+    """
+    QR kodni shartli UPDATE bilan band qilish.
+
+    Faqat scannered_at IS NULL bo'lgan qatorni yangilaydi, shuning uchun
+    parallel so'rovlardan faqat bittasi muvaffaqiyatli bo'ladi.
+
+    Raises:
+        QrCodeAlreadyUsed: QR kod allaqachon skanerlangan
+    """
+    now = timezone.now()
+    fields = {
+        "scannered_at": now,
+        "life_cycle_id": Subquery(
+            Box.objects.filter(pk=box.pk).values("current_lifecycle_id")[:1]
+        ),
+    }
+    if user is not None:
+        fields["user"] = user
+
+    claimed = EcoPacketQrCode.objects.filter(
+        pk=ecopacket_qr.pk, scannered_at__isnull=True
+    ).update(**fields)
+    if not claimed:
+        raise QrCodeAlreadyUsed(ecopacket_qr.qr_code)
+
+    ecopacket_qr.scannered_at = now
+    if user is not None:
+        ecopacket_qr.user = user
+
+
+def claim_qr_codes(pks, box, user):
+    """
+    Bir nechta QR kodni bitta UPDATE ... RETURNING bilan band qilish.
+
+    Returns:
+        set: haqiqatda band qilingan QR kodlar id'lari
+    """
+    if not pks:
+        return set()
+
+    quote = connection.ops.quote_name
+    placeholders = ", ".join(["%s"] * len(pks))
+    sql = (
+        f"UPDATE {quote(EcoPacketQrCode._meta.db_table)} "
+        f"SET scannered_at = %s, user_id = %s, life_cycle_id = "
+        f"(SELECT current_lifecycle_id FROM {quote(Box._meta.db_table)} WHERE id = %s) "
+        f"WHERE id IN ({placeholders}) AND scannered_at IS NULL "
+        f"RETURNING id"
+    )
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [now, user.pk, box.pk, *pks])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _settle(box, client_account, categories):
+    """
+    Kategoriyalar ro'yxati bo'yicha pulni taqsimlash: har bir bank hisobi
+    bitta UPDATE da, Box.seller_share bitta UPDATE da, Earning'lar bitta
+    bulk_create da yoziladi. Tranzaksiya ichida chaqirilishi kerak.
+
+    Returns:
+        int: jami summa
+    """
+    totals = {}
+    seller_total = Decimal(0)
+    earnings = []
+
+    for category in categories:
+        credits, seller_share = split_amount(
+            category.summa, category, box, client_account
+        )
+        seller_total += seller_share
+        for account, share in credits:
+            totals[account.pk] = totals.get(account.pk, 0) + share
+            earnings.append(
+                Earning(
+                    bank_account=account,
+                    amount=share,
+                    tarrif=category.name,
+                    box=box,
+                )
+            )
+
+    credit_accounts(totals)
+    credit_seller_share(box.pk, seller_total)
+
+    Earning.objects.bulk_create(earnings)
+    record_earnings(earnings)
+
+    return sum(category.summa for category in categories)
+
+
+def settle_scan(box, category, client_account, ecopacket_qr=None, user=None):
+    """
+    Bitta skanerlash uchun hisob-kitob.
+
+    Args:
+        box: skanerlangan box (lookup_cache.get_scan_box() orqali olingan)
+        category: QR kod kategoriyasi
+        client_account: foydalanuvchi BankAccount'i
+        ecopacket_qr: EcoPacket QR kod (flask uchun None - ular band qilinmaydi)
+        user: QR kodga biriktiriladigan foydalanuvchi (None bo'lsa o'zgarmaydi)
+
+    Returns:
+        int: kategoriya summasi
+
+    Raises:
+        QrCodeAlreadyUsed: QR kod allaqachon skanerlangan
+    """
+    with transaction.atomic():
+        if ecopacket_qr is not None:
+            claim_qr_code(ecopacket_qr, box, user)
+            record_scans(ecopacket_qr.user_id, 1, ecopacket_qr.scannered_at)
+            # /check/ keshidagi is_used eskirmasligi uchun
+            transaction.on_commit(
+                lambda: invalidate_checked_codes([ecopacket_qr.qr_code])
+            )
+
+        return _settle(box, client_account, [category])
+
+
+def settle_ecopacket_batch(box, user, qr_codes):
+    """
+    Ko'p EcoPacket QR kodlarni to'plam sifatida hisob-kitob qilish.
+
+    Barcha kodlar bitta IN so'rov bilan olinadi, ishlatilmaganlari bitta
+    UPDATE ... RETURNING bilan band qilinadi, keyin har bir bank hisobi
+    jami summa bilan bir marta oshiriladi.
+
+    Returns:
+        list: [{"qr_code": str, "status": "success" | "used" | "not_found"}, ...]
+        kodlar so'rovdagi tartibda; kategoriyasiz kod - "not_found"
+        (bitta skanerlashdagidek)
+    """
+    found = {
+        qr.qr_code: qr
+        for qr in EcoPacketQrCode.objects.select_related("category").filter(
+            qr_code__in=set(qr_codes)
+        )
+    }
+    candidates = [
+        qr.pk
+        for qr in found.values()
+        if qr.scannered_at is None and qr.category_id is not None
+    ]
+
+    with transaction.atomic():
+        claimed = claim_qr_codes(candidates, box, user)
+        claimed_qrs = [qr for qr in found.values() if qr.pk in claimed]
+        record_scans(user.pk, len(claimed_qrs))
+        _settle(box, user.bankaccount, [qr.category for qr in claimed_qrs])
+        transaction.on_commit(
+            lambda: invalidate_checked_codes([qr.qr_code for qr in claimed_qrs])
+        )
+
+    results = []
+    for qr_code in qr_codes:
+        qr = found.get(qr_code)
+        if qr is None or qr.category_id is None:
+            status = "not_found"
+        elif qr.pk in claimed:
+            status = "success"
+            # Ro'yxatda takrorlangan kod faqat bir marta hisoblanadi
+            claimed.discard(qr.pk)
+        else:
+            status = "used"
+        results.append({"qr_code": qr_code, "status": status})
+
+    return results
+
+
+def settle_flask_batch(box, client_account, bar_codes):
+    """
+    Ko'p flask QR kodlarni to'plam sifatida hisob-kitob qilish.
+
+    Returns:
+        (total_amount, processed_barcodes): FlaskQrManualMultipleView javobi uchun
+    """
+    found = {
+        flask_qr.bar_code: flask_qr
+        for flask_qr in FlaskQrCode.objects.select_related("category").filter(
+            bar_code__in=set(bar_codes)
+        )
+    }
+
+    processed_barcodes = {"success": [], "error": []}
+    categories = []
+    for bar_code in bar_codes:
+        flask_qr = found.get(bar_code)
+        if flask_qr is None:
+            processed_barcodes["error"].append(
+                {"bar_code": bar_code, "error": "Invalid barcode"}
+            )
+        elif flask_qr.category is None:
+            processed_barcodes["error"].append(
+                {"bar_code": bar_code, "error": "Category not found"}
+            )
+        else:
+            categories.append(flask_qr.category)
+            processed_barcodes["success"].append(
+                {"bar_code": bar_code, "amount": flask_qr.category.summa}
+            )
+
+    with transaction.atomic():
+        total_amount = _settle(box, client_account, categories)
+
+    return total_amount, processed_barcodes
@@ -0,0 +1,171 @@
+"""
+Box telemetriyasi (to'lganlik darajasi va joylashuv) qabul qilish servisi.
+
+Har bir o'qish BoxTelemetry jadvaliga qo'shiladi (tarix saqlanadi), box'ning
+joriy holati esa to'plamdagi eng yangi o'qish bilan yangilanadi:
+    1. barcha sim_module'lar bitta IN so'rov bilan topiladi;
+    2. o'qishlar bitta bulk_create bilan yoziladi;
+    3. har bir box uchun bitta shartli UPDATE (telemetry_at dan eski o'qishlar
+       holatni orqaga qaytarmaydi);
+    4. joriy LifeCycle'lar bitta UPDATE bilan yangilanadi.
+"""
+
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.ecopacket.models import Box, BoxTelemetry, LifeCycle
+
+MAX_BATCH_SIZE = 1000
+# Qurilma soatining farqi uchun - undan uzoq kelajakdagi ts rad etiladi,
+# aks holda telemetry_at oldinga surilib keyingi o'qishlar e'tiborsiz qoladi
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+BOX_NOT_FOUND = "No box found with this sim module"
+
+
+class InvalidReading(Exception):
+    """Telemetriya o'qishi noto'g'ri"""
+
+
+def format_location(lat, lng):
+    """LifeCycle/Box location formati: "(lng, lat)" """
+    return f"{lng, lat}"
+
+
+def parse_reading(reading):
+    """
+    Bitta o'qishni tekshirish.
+
+    Returns:
+        (sim_module, lat, lng, state, ts)
+
+    Raises:
+        InvalidReading
+    """
+    if not isinstance(reading, dict):
+        raise InvalidReading("Reading must be an object")
+
+    sim_module = reading.get("sim_module")
+    if not sim_module:
+        raise InvalidReading("sim_module is required")
+
+    try:
+        lat = float(reading.get("lat"))
+        lng = float(reading.get("lng"))
+        state = int(reading.get("state"))
+    except (TypeError, ValueError):
+        raise InvalidReading("lat, lng and state must be numbers")
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise InvalidReading("lat/lng out of range")
+    # Box.state / LifeCycle.state - to'lganlik foizi (0-100)
+    if not 0 <= state <= 100:
+        raise InvalidReading("state must be between 0 and 100")
+
+    ts = reading.get("ts")
+    if ts:
+        ts = parse_datetime(str(ts))
+        if ts is None:
+            raise InvalidReading("ts must be an ISO 8601 datetime")
+        if timezone.is_naive(ts):
+            ts = timezone.make_aware(ts)
+        if ts > timezone.now() + MAX_CLOCK_SKEW:
+            raise InvalidReading("ts is in the future")
+    else:
+        ts = timezone.now()
+
+    return str(sim_module), lat, lng, state, ts
+
+
+def ingest_readings(readings):
+    """
+    Ko'p box'lardan kelgan o'qishlarni to'plam sifatida saqlash.
+
+    Returns:
+        (accepted, rejected):
+            accepted - saqlangan o'qishlar soni
+            rejected - [{"index": int, "error": str}, ...]
+    """
+    parsed = []
+    rejected = []
+    for index, reading in enumerate(readings):
+        try:
+            parsed.append((index, *parse_reading(reading)))
+        except InvalidReading as e:
+            rejected.append({"index": index, "error": str(e)})
+
+    box_pks = {}
+    current_lifecycles = {}
+    for sim_module, pk, current_lifecycle_id in Box.objects.filter(
+        sim_module__in={row[1] for row in parsed}
+    ).values_list("sim_module", "pk", "current_lifecycle_id"):
+        box_pks[sim_module] = pk
+        current_lifecycles[pk] = current_lifecycle_id
+
+    telemetry = []
+    latest = {}
+    for index, sim_module, lat, lng, state, ts in parsed:
+        box_pk = box_pks.get(sim_module)
+        if box_pk is None:
+            rejected.append({"index": index, "error": BOX_NOT_FOUND})
+            continue
+        telemetry.append(
+            BoxTelemetry(box_id=box_pk, lat=lat, lng=lng, state=state, ts=ts)
+        )
+        # Har bir box uchun eng yangi o'qish
+        if box_pk not in latest or latest[box_pk][2] <= ts:
+            latest[box_pk] = (lat, lng, ts, state)
+
+    if not telemetry:
+        return 0, rejected
+
+    with transaction.atomic():
+        BoxTelemetry.objects.bulk_create(telemetry)
+
+        lifecycles = {}
+        for box_pk, (lat, lng, ts, state) in latest.items():
+            location = format_location(lat, lng)
+            updated = (
+                Box.objects.filter(pk=box_pk)
+                .filter(Q(telemetry_at__isnull=True) | Q(telemetry_at__lte=ts))
+                .update(
+                    state=state,
+                    lat=lat,
+                    lng=lng,
+                    telemetry_at=ts,
+                )
+            )
+            if not updated:
+                continue
+
+            lifecycle_id = current_lifecycles[box_pk]
+            if lifecycle_id is None:
+                # Birinchi o'qish - LifeCycle.save() Box'ni ham bog'laydi
+                LifeCycle.objects.create(
+                    box_id=box_pk, location=location, state=state
+                )
+            else:
+                lifecycles[lifecycle_id] = (location, state)
+
+        if lifecycles:
+            LifeCycle.objects.filter(pk__in=lifecycles).update(
+                location=Case(
+                    *[
+                        When(pk=pk, then=Value(location))
+                        for pk, (location, _) in lifecycles.items()
+                    ],
+                    output_field=models.CharField(),
+                ),
+                state=Case(
+                    *[
+                        When(pk=pk, then=Value(state))
+                        for pk, (_, state) in lifecycles.items()
+                    ],
+                    output_field=models.PositiveSmallIntegerField(),
+                ),
+            )
+
+    return len(telemetry), rejected
@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.ecopacket.models import Box, EcoPacketQrCode, FlaskQrCode, LifeCycle
+from apps.ecopacket.services.lookup_cache import invalidate_box, invalidate_category
+from apps.ecopacket.services.resolver import invalidate_checked_codes
+from apps.packet.models import Category
+
+
+def invalidate_now_and_on_commit(func, key):
+    """
+    Keshni darhol va tranzaksiya commit bo'lgandan keyin ham tozalash -
+    commit'gacha boshqa so'rov eski qiymatni keshga yozib qo'ymasligi uchun.
+    """
+    func(key)
+    transaction.on_commit(lambda: func(key))
+
+
+@receiver(pre_save, sender=Box)
+def invalidate_previous_sim_module(sender, instance, raw=False, **kwargs):
+    # sim_module o'zgarsa eski kalit ham o'chishi kerak
+    if raw or instance.pk is None:
+        return
+    previous = (
+        Box.objects.filter(pk=instance.pk).values_list("sim_module", flat=True).first()
+    )
+    if previous is not None and previous != instance.sim_module:
+        invalidate_now_and_on_commit(invalidate_box, previous)
+
+
+@receiver([post_save, post_delete], sender=Box)
+def invalidate_box_cache(sender, instance, **kwargs):
+    invalidate_now_and_on_commit(invalidate_box, instance.sim_module)
+
+
+@receiver(post_delete, sender=LifeCycle)
+def restore_current_lifecycle(sender, instance, **kwargs):
+    """
+    Joriy LifeCycle o'chirilsa (SET_NULL) Box qolgan eng oxirgi LifeCycle'ga
+    qaytadi - bo'shatish skanerlashi current_lifecycle=None ga tushmasin
+    """
+    latest = (
+        LifeCycle.objects.filter(box_id=instance.box_id)
+        .order_by("-pk")
+        .values("pk", "state")
+        .first()
+    )
+    Box.objects.filter(pk=instance.box_id, current_lifecycle__isnull=True).update(
+        current_lifecycle_id=latest and latest["pk"],
+        state=latest["state"] if latest else 0,
+    )
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    invalidate_now_and_on_commit(invalidate_category, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=EcoPacketQrCode)
+def invalidate_ecopacket_check_cache(sender, instance, **kwargs):
+    invalidate_now_and_on_commit(invalidate_checked_codes, [instance.qr_code])
+
+
+@receiver([post_save, post_delete], sender=FlaskQrCode)
+def invalidate_flask_check_cache(sender, instance, **kwargs):
+    # Yangi barcode uchun "topilmadi" yozuvi ham o'chadi
+    invalidate_now_and_on_commit(invalidate_checked_codes, [instance.bar_code])
@@ -1,3 +1,612 @@
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from apps.bank.models import BankAccount, Earning, QrCheckLog
+from apps.ecopacket.models import (
+    Box,
+    BoxTelemetry,
+    EcoPacketQrCode,
+    FlaskQrCode,
+    LifeCycle,
+)
+from apps.ecopacket.services.check_log import QrCheckLogWriter
+from apps.ecopacket.services.forecast import update_forecasts
+from apps.ecopacket.services.lookup_cache import get_scan_box, get_stats
+from apps.ecopacket.services.resolver import (
+    ECOPACKET,
+    FLASK,
+    resolve_code,
+    resolve_code_cached,
+)
+from apps.ecopacket.services.settlement import (
+    QrCodeAlreadyUsed,
+    settle_ecopacket_batch,
+    settle_scan,
+)
+from apps.packet.models import Category
+from apps.utils.save_to_database import create_ecopacket_qr_codes
+
+User = get_user_model()
+
+
+class SettlementServiceTestCase(TestCase):
+    """Skanerlash hisob-kitobi servisini testlash"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Plastik", summa=150)
+        self.category_ignored = Category.objects.create(
+            name="Ignored", summa=100, ignore_agent=True
+        )
+
+        self.user = User.objects.create_user(
+            phone_number="998900000001", first_name="Client"
+        )
+        self.seller = User.objects.create_user(
+            phone_number="998900000002", first_name="Seller"
+        )
+
+        box = Box.objects.create(
+            name="Fandomat",
+            sim_module="SIM001",
+            seller=self.seller,
+            seller_percentage=Decimal("33.00"),
+        )
+        self.lifecycle = LifeCycle.objects.create(box=box)
+        self.box = get_scan_box("SIM001")
+
+        self.qr = EcoPacketQrCode.objects.create(
+            qr_code="ECO001", category=self.category
+        )
+        self.user_account = BankAccount.objects.get(user=self.user)
+
+    def test_settle_splits_between_seller_and_client(self):
+        amount = settle_scan(
+            self.box,
+            self.category,
+            self.user_account,
+            ecopacket_qr=self.qr,
+            user=self.user,
+        )
+
+        self.assertEqual(amount, 150)
+        # 150 * 33% = 49.50 -> seller 49, client 100 (butun qismi)
+        self.assertEqual(BankAccount.objects.get(user=self.seller).capital, 49)
+        self.assertEqual(BankAccount.objects.get(user=self.user).capital, 100)
+        self.assertEqual(Box.objects.get(pk=self.box.pk).seller_share, Decimal("49.50"))
+        self.assertEqual(Earning.objects.filter(box=self.box).count(), 2)
+
+        self.qr.refresh_from_db()
+        self.assertIsNotNone(self.qr.scannered_at)
+        self.assertEqual(self.qr.user, self.user)
+        self.assertEqual(self.qr.life_cycle, self.lifecycle)
+
+    def test_ignore_agent_category_goes_to_client(self):
+        settle_scan(self.box, self.category_ignored, self.user_account)
+
+        self.assertEqual(BankAccount.objects.get(user=self.user).capital, 100)
+        self.assertEqual(BankAccount.objects.get(user=self.seller).capital, 0)
+        self.assertEqual(Box.objects.get(pk=self.box.pk).seller_share, 0)
+
+    def test_used_qr_code_is_not_settled_twice(self):
+        settle_scan(
+            self.box, self.category, self.user_account, ecopacket_qr=self.qr
+        )
+        stale_qr = EcoPacketQrCode.objects.get(pk=self.qr.pk)
+        stale_qr.scannered_at = None
+
+        with self.assertRaises(QrCodeAlreadyUsed):
+            settle_scan(
+                self.box, self.category, self.user_account, ecopacket_qr=stale_qr
+            )
+
+        self.assertEqual(BankAccount.objects.get(user=self.user).capital, 100)
+        self.assertEqual(Earning.objects.count(), 2)
+
+    def test_settle_query_count(self):
+        # SAVEPOINT + claim + UserScanCounter / HomeScanCounter upsert
+        # + balanslar + seller_share + bulk_create + EarningSummary upsert
+        # + RELEASE
+        with self.assertNumQueries(9):
+            settle_scan(
+                self.box,
+                self.category,
+                self.user_account,
+                ecopacket_qr=self.qr,
+                user=self.user,
+            )
+
+    def test_batch_settles_each_code_once(self):
+        for i in range(2, 5):
+            EcoPacketQrCode.objects.create(qr_code=f"ECO00{i}", category=self.category)
+        EcoPacketQrCode.objects.create(qr_code="ECO005")
+        settle_scan(self.box, self.category, self.user_account, ecopacket_qr=self.qr)
+
+        codes = ["ECO001", "ECO002", "ECO002", "ECO003", "ECO004", "MISSING", "ECO005"]
+        # IN so'rov + SAVEPOINT + UPDATE ... RETURNING
+        # + UserScanCounter / HomeScanCounter upsert + balanslar + seller_share
+        # + bulk_create + EarningSummary upsert + RELEASE
+        with self.assertNumQueries(10):
+            results = settle_ecopacket_batch(self.box, self.user, codes)
+
+        self.assertEqual(
+            [result["status"] for result in results],
+            ["used", "success", "used", "success", "success", "not_found", "not_found"],
+        )
+        # 4 ta skan (1 tasi oldin): seller 4 * 49, client 4 * 100
+        self.assertEqual(BankAccount.objects.get(user=self.seller).capital, 196)
+        self.assertEqual(BankAccount.objects.get(user=self.user).capital, 400)
+        self.assertEqual(Earning.objects.count(), 8)
+        # Kategoriyasiz kod band qilinmaydi
+        self.assertEqual(
+            list(
+                EcoPacketQrCode.objects.filter(scannered_at__isnull=True).values_list(
+                    "qr_code", flat=True
+                )
+            ),
+            ["ECO005"],
+        )
+
+
+class BoxCurrentLifecycleTestCase(TestCase):
+    """Box'dagi joriy LifeCycle, state va koordinatalar sinxronligini testlash"""
+
+    def setUp(self):
+        self.box = Box.objects.create(
+            name="Box", sim_module="SIM100", location="Toshkent"
+        )
+
+    def test_new_lifecycle_becomes_current(self):
+        first = LifeCycle.objects.create(box=self.box, state=40)
+        second = LifeCycle.objects.create(box=self.box)
+
+        box = Box.objects.get(pk=self.box.pk)
+        self.assertEqual(box.current_lifecycle, second)
+        self.assertEqual(box.state, 0)
+        self.assertEqual(box.cycle_created_at, second.started_at)
+        self.assertEqual(box.location, "Toshkent")
+
+        # Eski LifeCycle o'zgarsa, Box'dagi holat o'zgarmaydi
+        first.state = 90
+        first.save()
+        self.assertEqual(Box.objects.get(pk=self.box.pk).state, 0)
+
+    def test_iot_location_state_updates_box(self):
+        LifeCycle.objects.create(box=self.box)
+
+        response = self.client.post(
+            "/api/v1/ecopacket/iot-location-state/",
+            {"sim_module": "SIM100", "lat": "41.3", "lng": "69.2", "state": 85},
+        )
+
+        self.assertEqual(response.status_code, 201)
+        box = Box.objects.get(pk=self.box.pk)
+        self.assertEqual(box.state, 85)
+        # Operator kiritgan location o'zgarmaydi, koordinatalar lat/lng da
+        self.assertEqual(box.location, "Toshkent")
+        self.assertEqual((box.lat, box.lng), (41.3, 69.2))
+
+    def test_deleted_current_lifecycle_falls_back(self):
+        first = LifeCycle.objects.create(box=self.box, state=90)
+        LifeCycle.objects.create(box=self.box, state=20).delete()
+
+        box = Box.objects.get(pk=self.box.pk)
+        self.assertEqual(box.current_lifecycle, first)
+        self.assertEqual(box.state, 90)
+
+        first.delete()
+        box = Box.objects.get(pk=self.box.pk)
+        self.assertEqual((box.current_lifecycle, box.state), (None, 0))
+
+
+class ResolveCodeTestCase(TestCase):
+    """Universal kod resolver'ini testlash"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Shisha", summa=120)
+        EcoPacketQrCode.objects.create(qr_code="ECO100", category=self.category)
+        FlaskQrCode.objects.create(bar_code="4780000000001", category=self.category)
+
+    def test_bulk_created_codes_invalidate_check_cache(self):
+        with patch(
+            "apps.utils.save_to_database.invalidate_checked_codes"
+        ) as invalidate, self.captureOnCommitCallbacks(execute=True):
+            qr_codes = create_ecopacket_qr_codes(2, self.category.pk)
+
+        invalidate.assert_called_once_with([qr.qr_code for qr in qr_codes])
+
+    def test_resolves_both_tables_in_one_query(self):
+        resolve_code("ECO100")
+
+        # Kategoriya keshda - faqat UNION so'rovi qoladi
+        with self.assertNumQueries(1):
+            qr_type, qr, code = resolve_code(" ECO100 ")
+        self.assertEqual((qr_type, code), (ECOPACKET, "ECO100"))
+        self.assertIsNone(qr.scannered_at)
+        self.assertEqual(qr.category.summa, 120)
+
+        qr_type, flask_qr, code = resolve_code("4780000000001")
+        self.assertEqual((qr_type, code), (FLASK, "4780000000001"))
+        self.assertEqual(flask_qr.category, self.category)
+
+    def test_barcode_suffix_fallback(self):
+        qr_type, flask_qr, code = resolve_code("0104780000000001")
+        self.assertEqual((qr_type, code), (FLASK, "4780000000001"))
+
+        self.assertEqual(resolve_code("MISSING-CODE-000"), (None, None, "MISSING-CODE-000"))
+
+    def test_check_endpoint_reports_used_state(self):
+        url = "/api/v1/ecopacket/flask-qr/check/"
+        response = self.client.get(url, {"qr_code": "ECO100"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data["data"]["is_used"])
+
+        # save() signali /check/ keshini tozalaydi
+        qr = EcoPacketQrCode.objects.get(qr_code="ECO100")
+        qr.scannered_at = timezone.now()
+        qr.save()
+
+        response = self.client.get(url, {"qr_code": "ECO100"})
+        self.assertTrue(response.data["data"]["is_used"])
+        self.assertEqual(resolve_code_cached(" ECO100")[0], ECOPACKET)
+
+        response = self.client.get(url, {"qr_code": "NOPE"})
+        self.assertEqual(response.status_code, 404)
+
+
+class LookupCacheTestCase(TestCase):
+    """Box va Category lookup keshini testlash"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user(
+            phone_number="998900000003", first_name="Seller"
+        )
+        self.box = Box.objects.create(
+            name="Box",
+            sim_module="SIM200",
+            seller=self.seller,
+            seller_percentage=Decimal("25.00"),
+        )
+
+    def test_box_is_read_through_cache(self):
+        box = get_scan_box("SIM200")
+        self.assertEqual(box.pk, self.box.pk)
+        self.assertEqual(box.seller_percentage, Decimal("25.00"))
+        self.assertEqual(
+            box.seller.bankaccount.pk, BankAccount.objects.get(user=self.seller).pk
+        )
+
+        hits = get_stats()["local_hits"]
+        with self.assertNumQueries(0):
+            get_scan_box("SIM200")
+        self.assertEqual(get_stats()["local_hits"], hits + 1)
+
+    def test_box_save_invalidates_cache(self):
+        get_scan_box("SIM200")
+        self.box.seller_percentage = Decimal("40.00")
+        self.box.save()
+
+        self.assertEqual(get_scan_box("SIM200").seller_percentage, Decimal("40.00"))
+
+    def test_claim_uses_current_lifecycle_not_cache(self):
+        LifeCycle.objects.create(box=self.box)
+        box = get_scan_box("SIM200")
+        # Keshdagi box eskirgan bo'lsa ham band qilish yangi LifeCycle'ga
+        lifecycle = LifeCycle.objects.create(box=self.box)
+        category = Category.objects.create(name="Plastik", summa=100)
+        qr = EcoPacketQrCode.objects.create(qr_code="ECO200", category=category)
+        client = User.objects.create_user(
+            phone_number="998900000004", first_name="Client"
+        )
+
+        settle_scan(box, category, client.bankaccount, ecopacket_qr=qr, user=client)
+
+        qr.refresh_from_db()
+        self.assertEqual(qr.life_cycle, lifecycle)
+
+    def test_sim_module_change_invalidates_previous_key(self):
+        get_scan_box("SIM200")
+        self.box.sim_module = "SIM201"
+        self.box.save()
+
+        with self.assertRaises(Box.DoesNotExist):
+            get_scan_box("SIM200")
+        self.assertEqual(get_scan_box("SIM201").pk, self.box.pk)
+
+    def test_missing_box(self):
+        with self.assertRaises(Box.DoesNotExist):
+            get_scan_box("MISSING")
+
+
+class QrCheckLogWriterTestCase(TestCase):
+    """QrCheckLog buferli yozuvchisini testlash"""
+
+    def test_flush_writes_batches(self):
+        writer = QrCheckLogWriter(
+            max_size=10, batch_size=2, flush_interval=1, background=False
+        )
+        for i in range(5):
+            writer.log(qr_code=f"CODE{i}", qr_type="not_found", exists=False)
+
+        self.assertFalse(QrCheckLog.objects.exists())
+        with self.assertNumQueries(3):
+            writer.flush()
+
+        self.assertEqual(QrCheckLog.objects.count(), 5)
+        self.assertEqual(writer.get_stats()["written"], 5)
+
+    def test_full_queue_drops(self):
+        writer = QrCheckLogWriter(
+            max_size=2, batch_size=10, flush_interval=1, background=False
+        )
+        for i in range(3):
+            writer.log(qr_code=f"CODE{i}")
+
+        writer.flush()
+        self.assertEqual(QrCheckLog.objects.count(), 2)
+        self.assertEqual(writer.get_stats()["dropped"], 1)
+
+    def test_stop_writes_in_flight_batch(self):
+        written = []
+
+        class ListWriter(QrCheckLogWriter):
+            def write(self, batch):
+                written.extend(batch)
+
+        writer = ListWriter(max_size=10, batch_size=10, flush_interval=30)
+        for i in range(3):
+            writer.log(qr_code=f"CODE{i}")
+        # Fon thread yozuvlarni navbatdan o'z batch'iga olguncha
+        for _ in range(100):
+            if not writer.queue.qsize():
+                break
+            time.sleep(0.01)
+
+        writer.stop(timeout=5)
+        self.assertFalse(writer.thread.is_alive())
+        self.assertEqual(
+            [fields["qr_code"] for fields in written], ["CODE0", "CODE1", "CODE2"]
+        )
+
+
+class TelemetryIngestTestCase(TestCase):
+    """Telemetriya batch endpointini testlash"""
+
+    url = "/api/v1/ecopacket/iot-telemetry/"
+
+    def setUp(self):
+        self.box1 = Box.objects.create(name="Box 1", sim_module="SIM301")
+        self.box2 = Box.objects.create(name="Box 2", sim_module="SIM302")
+        self.lifecycle = LifeCycle.objects.create(box=self.box1)
+
+    def test_batch_keeps_history_and_latest_state(self):
+        readings = [
+            {
+                "sim_module": "SIM301",
+                "lat": 41.1,
+                "lng": 69.1,
+                "state": 30,
+                "ts": "2026-01-01T10:00:00+05:00",
+            },
+            {
+                "sim_module": "SIM301",
+                "lat": 41.2,
+                "lng": 69.2,
+                "state": 85,
+                "ts": "2026-01-01T10:05:00+05:00",
+            },
+            {"sim_module": "SIM302", "lat": 41.3, "lng": 69.3, "state": 10},
+            {"sim_module": "MISSING", "lat": 1, "lng": 1, "state": 1},
+            {"sim_module": "SIM302", "lat": "x", "lng": 1, "state": 1},
+            {"sim_module": "SIM302", "lat": 1, "lng": 1, "state": 250},
+            {
+                "sim_module": "SIM302",
+                "lat": 1,
+                "lng": 1,
+                "state": 1,
+                "ts": "2999-01-01T00:00:00+05:00",
+            },
+        ]
+        response = self.client.post(
+            self.url, {"readings": readings}, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["accepted"], 3)
+        self.assertEqual(
+            [r["index"] for r in response.data["rejected"]], [4, 5, 6, 3]
+        )
+        self.assertEqual(BoxTelemetry.objects.count(), 3)
+
+        box1 = Box.objects.get(pk=self.box1.pk)
+        self.assertEqual(box1.state, 85)
+        self.assertEqual((box1.lat, box1.lng), (41.2, 69.2))
+        self.lifecycle.refresh_from_db()
+        self.assertEqual(self.lifecycle.state, 85)
+
+        # LifeCycle'siz box uchun birinchi o'qishda LifeCycle yaratiladi
+        box2 = Box.objects.get(pk=self.box2.pk)
+        self.assertEqual(box2.state, 10)
+        self.assertIsNotNone(box2.current_lifecycle)
+
+    def test_older_reading_does_not_override_state(self):
+        for state, ts in (
+            (90, "2026-01-01T11:00:00+05:00"),
+            (20, "2026-01-01T09:00:00+05:00"),
+        ):
+            reading = {
+                "sim_module": "SIM301",
+                "lat": 41,
+                "lng": 69,
+                "state": state,
+                "ts": ts,
+            }
+            self.client.post(
+                self.url, {"readings": [reading]}, content_type="application/json"
+            )
+
+        self.assertEqual(Box.objects.get(pk=self.box1.pk).state, 90)
+        self.assertEqual(BoxTelemetry.objects.count(), 2)
+
+
+class BoxMapAPITestCase(APITestCase):
+    """Box xaritasi (bbox + zoom) endpointini testlash"""
+
+    url = "/api/v1/ecopacket/box-map/"
+
+    def setUp(self):
+        user = User.objects.create_user(phone_number="998900000010", first_name="A")
+        self.client.force_authenticate(user=user)
+        # Toshkentda 3 ta yaqin box va Samarqandda 1 ta
+        for i, (lat, lng) in enumerate(
+            [(41.30, 69.24), (41.31, 69.25), (41.32, 69.26), (39.65, 66.96)]
+        ):
+            box = Box.objects.create(name=f"Box {i}", sim_module=f"SIM40{i}")
+            LifeCycle.objects.create(box=box, location=f"{lng, lat}", state=10 * i)
+
+    def test_low_zoom_returns_clusters(self):
+        response = self.client.get(self.url, {"bbox": "55,37,74,46", "zoom": 6})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["type"], "clusters")
+        counts = sorted(cluster["count"] for cluster in response.data["clusters"])
+        self.assertEqual(counts, [1, 3])
+
+    def test_high_zoom_returns_boxes_in_bbox(self):
+        response = self.client.get(
+            self.url, {"bbox": "69.2,41.2,69.255,41.4", "zoom": 15}
+        )
+
+        self.assertEqual(response.data["type"], "boxes")
+        self.assertEqual(
+            [box["sim_module"] for box in response.data["boxes"]],
+            ["SIM400", "SIM401"],
+        )
+        self.assertEqual(response.data["boxes"][1]["lat"], 41.31)
+
+    def test_invalid_bbox(self):
+        response = self.client.get(self.url, {"bbox": "1,2,3", "zoom": 5})
+        self.assertEqual(response.status_code, 400)
+
+
+class BoxOrderDispatchTestCase(APITestCase):
+    """Eng yaqin to'lgan box'lar va bo'shatish marshrutini testlash"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Plastik", summa=150)
+        other = Category.objects.create(name="Qog'oz", summa=100)
+        self.user = User.objects.create_user(phone_number="998900000011", first_name="A")
+        self.user.categories.set([self.category])
+        self.client.force_authenticate(user=self.user)
+
+        # (lat, lng, state, category)
+        self.boxes = {}
+        for name, lat, lng, state, category in [
+            ("near", 41.301, 69.241, 90, self.category),
+            ("mid", 41.32, 69.26, 85, self.category),
+            ("far", 41.40, 69.40, 95, self.category),
+            ("half", 41.3005, 69.2405, 50, self.category),
+            ("other", 41.3001, 69.2401, 100, other),
+        ]:
+            box = Box.objects.create(
+                name=name, sim_module=f"SIM5{name}", category=category
+            )
+            LifeCycle.objects.create(box=box, location=f"{lng, lat}", state=state)
+            self.boxes[name] = box
+
+    def test_nearest_boxes(self):
+        response = self.client.get(
+            "/api/v1/ecopacket/fill-box-order/nearest/",
+            {"lat": 41.30, "lng": 69.24, "k": 2},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([box["name"] for box in response.data], ["near", "mid"])
+        self.assertLess(response.data[0]["distance_km"], response.data[1]["distance_km"])
+
+    def test_ordered_box_leaves_queue(self):
+        lifecycle = LifeCycle.objects.get(box=self.boxes["near"])
+        lifecycle.employee = self.user
+        lifecycle.save()
+
+        response = self.client.get(
+            "/api/v1/ecopacket/fill-box-order/nearest/", {"lat": 41.30, "lng": 69.24}
+        )
+
+        self.assertEqual([box["name"] for box in response.data], ["mid", "far"])
+
+    def test_route(self):
+        response = self.client.post(
+            "/api/v1/ecopacket/fill-box-order/route/",
+            {
+                "lat": 41.30,
+                "lng": 69.24,
+                "box_ids": [self.boxes[name].pk for name in ("far", "near", "mid")],
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [box["name"] for box in response.data["route"]], ["near", "mid", "far"]
+        )
+        self.assertGreater(response.data["total_km"], 0)
+
+    def test_invalid_point(self):
+        response = self.client.get(
+            "/api/v1/ecopacket/fill-box-order/nearest/", {"lat": "x", "lng": 69.24}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class FillForecastTestCase(APITestCase):
+    """To'lish tezligi va to'lish vaqti prognozini testlash"""
+
+    def setUp(self):
+        self.now = timezone.now().replace(microsecond=0)
+        self.box = Box.objects.create(name="Tez", sim_module="SIM601")
+        self.idle = Box.objects.create(name="Bo'sh", sim_module="SIM602")
+        LifeCycle.objects.create(box=self.box, state=0)
+
+        # Oldingi to'lish: 10 %/soat, so'ng bo'shatildi va yana 10 %/soat
+        readings = [
+            (-20, 0), (-18, 20), (-16, 40), (-14, 60), (-4, 0), (-2, 20), (0, 40)
+        ]
+        BoxTelemetry.objects.bulk_create(
+            BoxTelemetry(
+                box=self.box,
+                lat=41.3,
+                lng=69.2,
+                state=state,
+                ts=self.now + timezone.timedelta(hours=hours),
+            )
+            for hours, state in readings
+        )
+        Box.objects.filter(pk=self.box.pk).update(state=40, telemetry_at=self.now)
+
+    def test_update_forecasts(self):
+        updated, forecasted = update_forecasts()
+
+        self.assertEqual((updated, forecasted), (2, 1))
+        self.box.refresh_from_db()
+        self.assertAlmostEqual(self.box.fill_rate, 10.0, places=3)
+        self.assertEqual(self.box.full_at, self.now + timezone.timedelta(hours=4))
+        self.idle.refresh_from_db()
+        self.assertIsNone(self.idle.fill_rate)
+
+    def test_forecast_api(self):
+        update_forecasts()
+        user = User.objects.create_user(phone_number="998900000012", first_name="A")
+        self.client.force_authenticate(user=user)
+
+        response = self.client.get("/api/v1/ecopacket/box-forecast/", {"hours": 6})
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([box["sim_module"] for box in response.data], ["SIM601"])
+        response = self.client.get("/api/v1/ecopacket/box-forecast/", {"hours": 2})
+        self.assertEqual(response.data, [])
@@ -5,15 +5,22 @@ from apps.ecopacket.views import (
     IOTView,
     QrCodeScanerView,
     IOTLocationStateView,
+    IOTTelemetryBatchView,
     BoxModelViewSet,
     LifeCycleListAPIView,
     EcoPacketQrCodeListAPIView,
     BoxOrderAPIView,
+    BoxOrderNearestAPIView,
+    BoxOrderRouteAPIView,
     IOTManualView,
     IOTManualMultipleView,
     IOTManualSingleView,
     BoxLocationAPIView,
-    BoxListView
+    BoxMapAPIView,
+    BoxForecastAPIView,
+    BoxListView,
+    lookup_cache_stats,
+    qr_check_log_stats,
 )
 
 
@@ -34,11 +41,18 @@ urlpatterns = [
     path("iot-qr-code-single-scan/", IOTManualSingleView.as_view()),
     path("mobile-qr-code-scan/", QrCodeScanerView.as_view()),
     path("iot-location-state/", IOTLocationStateView.as_view()),
+    path("iot-telemetry/", IOTTelemetryBatchView.as_view()),
     path("", include(router.urls)),
     path("life-cycle-list/", LifeCycleListAPIView.as_view()),
     path("ecopacket-qr-code/", EcoPacketQrCodeListAPIView.as_view()),
     path("fill-box-order/", BoxOrderAPIView.as_view()),
-    path("box-location/",BoxLocationAPIView.as_view())
+    path("fill-box-order/nearest/", BoxOrderNearestAPIView.as_view()),
+    path("fill-box-order/route/", BoxOrderRouteAPIView.as_view()),
+    path("box-location/",BoxLocationAPIView.as_view()),
+    path("box-map/", BoxMapAPIView.as_view()),
+    path("box-forecast/", BoxForecastAPIView.as_view()),
+    path("lookup-cache-stats/", lookup_cache_stats),
+    path("qr-check-log-stats/", qr_check_log_stats),
     # path('box/', BoxModelViewSet.as_view({'get': 'list',
     #                                       'post': 'create',
     #                                       'put': 'update',
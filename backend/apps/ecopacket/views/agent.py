@@ -3,7 +3,7 @@ from rest_framework.permissions import IsAuthenticated
 from apps.ecopacket.models import Box
 from apps.ecopacket.serializers.serializers import AgentBoxSerializer
 class AgentBoxRetrieveView(generics.RetrieveAPIView):
-   queryset = Box.objects.all()
+   queryset = Box.objects.with_pending()
    serializer_class = AgentBoxSerializer
    permission_classes = [IsAuthenticated]
 #    lookup_field = 'sim_module'  # This allows us to lookup by sim_module instead of id
\ No newline at end of file
@@ -1,12 +1,23 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.utils import timezone
 from django.conf import settings
 
-from apps.ecopacket.models import Box, FlaskQrCode, EcoPacketQrCode
+from apps.ecopacket.models import Box, FlaskQrCode
 from apps.account.models import User
-from apps.bank.models import Earning, QrCheckLog
+from apps.ecopacket.services.check_log import log_qr_check
+from apps.ecopacket.services.lookup_cache import attach_category, get_scan_box
+from apps.ecopacket.services.settlement import (
+    QrCodeAlreadyUsed,
+    settle_flask_batch,
+    settle_scan,
+)
+from apps.ecopacket.services.resolver import (
+    ECOPACKET,
+    FLASK,
+    resolve_code,
+    resolve_code_cached,
+)
 
 
 class FlaskQrManualMultipleView(APIView):
@@ -84,7 +95,7 @@ class FlaskQrManualMultipleView(APIView):
             )
 
         try:
-            box = Box.objects.get(sim_module=sim_module)
+            box = get_scan_box(sim_module)
         except Box.DoesNotExist:
             return Response(
                 {"error": "Fandomat box doesn't exist!"},
@@ -92,99 +103,18 @@ class FlaskQrManualMultipleView(APIView):
             )
 
         try:
-            user = User.objects.get(phone_number=phone_number)
+            user = User.objects.select_related("bankaccount").get(
+                phone_number=phone_number
+            )
         except User.DoesNotExist:
             return Response(
                 {"error": "Phone number doesn't exist!"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        client_bank_account = user.bankaccount
-        total_amount = 0
-        processed_barcodes = {"success": [], "error": []}
-
-        for bar_code in bar_codes:
-            try:
-                flask_qr = FlaskQrCode.objects.get(bar_code=bar_code)
-
-                # Kategoriyani olish
-                category = flask_qr.category
-                if not category:
-                    processed_barcodes["error"].append(
-                        {"bar_code": bar_code, "error": "Category not found"}
-                    )
-                    continue
-
-                # Pul hisob-kitobi
-                money_amount = category.summa
-
-                # Kategoriya ignore_agent=True bo'lsa, hamma pul foydalanuvchiga beriladi
-                if category.ignore_agent:
-                    client_bank_account.capital += money_amount
-
-                    # Foydalanuvchi uchun daromad yozib qo'yiladi
-                    Earning.objects.create(
-                        bank_account=client_bank_account,
-                        amount=money_amount,
-                        tarrif=category.name,
-                        box=box,
-                    )
-                else:
-                    # Agar ignore_agent=False bo'lsa, odatiy hisob-kitob
-                    # seller ulushini hisoblash
-                    seller_percentage = box.seller_percentage
-                    if box.seller is not None:
-                        seller_share = money_amount * seller_percentage / 100
-                        client_share = money_amount - seller_share
-
-                        # Seller hisobiga o'tkazish
-                        bank_account_seller = box.seller.bankaccount
-                        bank_account_seller.capital += seller_share
-                        bank_account_seller.save()
-
-                        Earning.objects.create(
-                            bank_account=bank_account_seller,
-                            amount=seller_share,
-                            tarrif=category.name,
-                            box=box,
-                        )
-
-                        # Box da seller ulushini saqlash
-                        box.seller_share += seller_share
-                        box.save()
-
-                        # Client hisobiga client ulushini o'tkazish
-                        client_bank_account.capital += client_share
-
-                        Earning.objects.create(
-                            bank_account=client_bank_account,
-                            amount=client_share,
-                            tarrif=category.name,
-                            box=box,
-                        )
-                    else:
-                        # Seller bo'lmasa hamma summa clientga
-                        client_bank_account.capital += money_amount
-
-                        Earning.objects.create(
-                            bank_account=client_bank_account,
-                            amount=money_amount,
-                            tarrif=category.name,
-                            box=box,
-                        )
-
-                total_amount += money_amount
-                processed_barcodes["success"].append(
-                    {"bar_code": bar_code, "amount": money_amount}
-                )
-
-            except FlaskQrCode.DoesNotExist:
-                processed_barcodes["error"].append(
-                    {"bar_code": bar_code, "error": "Invalid barcode"}
-                )
-
-        # Save client bank account after all transactions
-        client_bank_account.save()
+        total_amount, processed_barcodes = settle_flask_batch(
+            box, user.bankaccount, bar_codes
+        )
 
         return Response(
             {
@@ -246,7 +176,9 @@ class FlaskQrManualSingleView(APIView):
             )
 
         try:
-            box = Box.objects.get(sim_module=sim_module, fandomat=True)
+            box = get_scan_box(sim_module)
+            if not box.fandomat:
+                raise Box.DoesNotExist
         except Box.DoesNotExist:
             return Response(
                 {"error": "Fandomat box doesn't exist!"},
@@ -254,7 +186,9 @@ class FlaskQrManualSingleView(APIView):
             )
 
         try:
-            user = User.objects.get(phone_number=phone_number)
+            user = User.objects.select_related("bankaccount").get(
+                phone_number=phone_number
+            )
         except User.DoesNotExist:
             return Response(
                 {"error": "Phone number doesn't exist!"},
@@ -262,7 +196,7 @@ class FlaskQrManualSingleView(APIView):
             )
 
         try:
-            flask_qr = FlaskQrCode.objects.get(bar_code=bar_code)
+            flask_qr = attach_category(FlaskQrCode.objects.get(bar_code=bar_code))
         except FlaskQrCode.DoesNotExist:
             return Response(
                 {"error": "Invalid barcode!"},
@@ -277,66 +211,7 @@ class FlaskQrManualSingleView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        client_bank_account = user.bankaccount
-        money_amount = category.summa
-
-        # Kategoriya ignore_agent=True bo'lsa, hamma pul foydalanuvchiga beriladi
-        if category.ignore_agent:
-            client_bank_account.capital += money_amount
-
-            # Foydalanuvchi uchun daromad yozib qo'yiladi
-            Earning.objects.create(
-                bank_account=client_bank_account,
-                amount=money_amount,
-                tarrif=category.name,
-                box=box,
-            )
-        else:
-            # Agar ignore_agent=False bo'lsa, odatiy hisob-kitob
-            # seller ulushini hisoblash
-            seller_percentage = box.seller_percentage
-            if box.seller is not None:
-                seller_share = money_amount * seller_percentage / 100
-                client_share = money_amount - seller_share
-
-                # Seller hisobiga o'tkazish
-                bank_account_seller = box.seller.bankaccount
-                bank_account_seller.capital += seller_share
-                bank_account_seller.save()
-
-                Earning.objects.create(
-                    bank_account=bank_account_seller,
-                    amount=seller_share,
-                    tarrif=category.name,
-                    box=box,
-                )
-
-                # Box da seller ulushini saqlash
-                box.seller_share += seller_share
-                box.save()
-
-                # Client hisobiga client ulushini o'tkazish
-                client_bank_account.capital += client_share
-
-                Earning.objects.create(
-                    bank_account=client_bank_account,
-                    amount=client_share,
-                    tarrif=category.name,
-                    box=box,
-                )
-            else:
-                # Seller bo'lmasa hamma summa clientga
-                client_bank_account.capital += money_amount
-
-                Earning.objects.create(
-                    bank_account=client_bank_account,
-                    amount=money_amount,
-                    tarrif=category.name,
-                    box=box,
-                )
-
-        # Client bank account'ni saqlash
-        client_bank_account.save()
+        money_amount = settle_scan(box, category, user.bankaccount)
 
         return Response(
             {
@@ -389,31 +264,25 @@ class UniversalQrManualSingleView(APIView):
             )
 
         try:
-            user = User.objects.get(phone_number=phone_number)
+            user = User.objects.select_related("bankaccount").get(
+                phone_number=phone_number
+            )
         except User.DoesNotExist:
             return Response(
                 {"error": "Phone number doesn't exist!"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Avval EcoPacket QR kodini tekshiramiz
-        ecopacket_qr = EcoPacketQrCode.objects.filter(qr_code=qr_code).first()
-        flask_qr = FlaskQrCode.objects.filter(bar_code=qr_code).first()
-
-        # Agar topilmasa va qr_code 13 ta belgidan uzunroq bo'lsa, oxirgi 13 ta belgini sinab ko'ramiz
-        if not ecopacket_qr and not flask_qr and len(qr_code) > 13:
-            qr_code_trimmed = qr_code[-13:]
-            ecopacket_qr = EcoPacketQrCode.objects.filter(
-                qr_code=qr_code_trimmed
-            ).first()
-            flask_qr = FlaskQrCode.objects.filter(bar_code=qr_code_trimmed).first()
-            if ecopacket_qr or flask_qr:
-                qr_code = qr_code_trimmed  # Topilgan qr_code ni ishlatamiz
+        # EcoPacket va Flask jadvallari (to'liq kod va oxirgi 13 belgi)
+        # bitta so'rov bilan tekshiriladi
+        qr_type, qr_obj, qr_code = resolve_code(qr_code)
+        ecopacket_qr = qr_obj if qr_type == ECOPACKET else None
+        flask_qr = qr_obj if qr_type == FLASK else None
 
         if ecopacket_qr:
             # EcoPacket QR kod logikasi
             try:
-                box = Box.objects.get(sim_module=sim_module)
+                box = get_scan_box(sim_module)
             except Box.DoesNotExist:
                 return Response(
                     {"error": "Box doesn't exist!"},
@@ -427,70 +296,20 @@ class UniversalQrManualSingleView(APIView):
                 )
 
             # QR kodini qayta ishlash
-            last_lifecycle = box.lifecycle.last()
-            ecopacket_qr.scannered_at = timezone.now()
-            ecopacket_qr.life_cycle = last_lifecycle
-            ecopacket_qr.user = user
-            ecopacket_qr.save()
-
-            money_amount = ecopacket_qr.category.summa
             category = ecopacket_qr.category
-            client_bank_account = user.bankaccount
-
-            # Kategoriya ignore_agent=True bo'lsa, hamma pul foydalanuvchiga beriladi
-            if category.ignore_agent:
-                client_bank_account.capital += money_amount
-
-                Earning.objects.create(
-                    bank_account=client_bank_account,
-                    amount=money_amount,
-                    tarrif=category.name,
-                    box=box,
+            try:
+                money_amount = settle_scan(
+                    box,
+                    category,
+                    user.bankaccount,
+                    ecopacket_qr=ecopacket_qr,
+                    user=user,
+                )
+            except QrCodeAlreadyUsed:
+                return Response(
+                    {"error": "This QR code has already been used"},
+                    status=status.HTTP_409_CONFLICT,
                 )
-            else:
-                # seller ulushini hisoblash
-                seller_percentage = box.seller_percentage
-                if box.seller is not None:
-                    seller_share = money_amount * seller_percentage / 100
-                    client_share = money_amount - seller_share
-
-                    # Seller hisobiga o'tkazish
-                    bank_account_seller = box.seller.bankaccount
-                    bank_account_seller.capital += seller_share
-                    bank_account_seller.save()
-
-                    Earning.objects.create(
-                        bank_account=bank_account_seller,
-                        amount=seller_share,
-                        tarrif=category.name,
-                        box=box,
-                    )
-
-                    # Box da seller ulushini saqlash
-                    box.seller_share += seller_share
-                    box.save()
-
-                    # Client hisobiga client ulushini o'tkazish
-                    client_bank_account.capital += client_share
-
-                    Earning.objects.create(
-                        bank_account=client_bank_account,
-                        amount=client_share,
-                        tarrif=category.name,
-                        box=box,
-                    )
-                else:
-                    # Seller bo'lmasa hamma summa clientga
-                    client_bank_account.capital += money_amount
-
-                    Earning.objects.create(
-                        bank_account=client_bank_account,
-                        amount=money_amount,
-                        tarrif=category.name,
-                        box=box,
-                    )
-
-            client_bank_account.save()
 
             return Response(
                 {
@@ -506,7 +325,7 @@ class UniversalQrManualSingleView(APIView):
         elif flask_qr:
             # Flask QR kod logikasi
             try:
-                box = Box.objects.get(sim_module=sim_module)
+                box = get_scan_box(sim_module)
             except Box.DoesNotExist:
                 return Response(
                     {"error": "Fandomat box doesn't exist!"},
@@ -521,63 +340,7 @@ class UniversalQrManualSingleView(APIView):
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
-            client_bank_account = user.bankaccount
-            money_amount = category.summa
-
-            # Kategoriya ignore_agent=True bo'lsa, hamma pul foydalanuvchiga beriladi
-            if category.ignore_agent:
-                client_bank_account.capital += money_amount
-
-                Earning.objects.create(
-                    bank_account=client_bank_account,
-                    amount=money_amount,
-                    tarrif=category.name,
-                    box=box,
-                )
-            else:
-                # seller ulushini hisoblash
-                seller_percentage = box.seller_percentage
-                if box.seller is not None:
-                    seller_share = money_amount * seller_percentage / 100
-                    client_share = money_amount - seller_share
-
-                    # Seller hisobiga o'tkazish
-                    bank_account_seller = box.seller.bankaccount
-                    bank_account_seller.capital += seller_share
-                    bank_account_seller.save()
-
-                    Earning.objects.create(
-                        bank_account=bank_account_seller,
-                        amount=seller_share,
-                        tarrif=category.name,
-                        box=box,
-                    )
-
-                    # Box da seller ulushini saqlash
-                    box.seller_share += seller_share
-                    box.save()
-
-                    # Client hisobiga client ulushini o'tkazish
-                    client_bank_account.capital += client_share
-
-                    Earning.objects.create(
-                        bank_account=client_bank_account,
-                        amount=client_share,
-                        tarrif=category.name,
-                        box=box,
-                    )
-                else:
-                    # Seller bo'lmasa hamma summa clientga
-                    client_bank_account.capital += money_amount
-
-                    Earning.objects.create(
-                        bank_account=client_bank_account,
-                        amount=money_amount,
-                        tarrif=category.name,
-                        box=box,
-                    )
-
-            client_bank_account.save()
+            money_amount = settle_scan(box, category, user.bankaccount)
 
             return Response(
                 {
@@ -644,19 +407,12 @@ class UniversalQrCheckView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Avval EcoPacket QR kodini tekshiramiz
-        ecopacket_qr = EcoPacketQrCode.objects.filter(qr_code=qr_code).first()
-        flask_qr = FlaskQrCode.objects.filter(bar_code=qr_code).first()
-
-        # Agar topilmasa va qr_code 13 ta belgidan uzunroq bo'lsa, oxirgi 13 ta belgini sinab ko'ramiz
-        if not ecopacket_qr and not flask_qr and len(qr_code) > 13:
-            qr_code_trimmed = qr_code[-13:]
-            ecopacket_qr = EcoPacketQrCode.objects.filter(
-                qr_code=qr_code_trimmed
-            ).first()
-            flask_qr = FlaskQrCode.objects.filter(bar_code=qr_code_trimmed).first()
-            if ecopacket_qr or flask_qr:
-                qr_code = qr_code_trimmed  # Topilgan qr_code ni ishlatamiz
+        # EcoPacket va Flask jadvallari (to'liq kod va oxirgi 13 belgi)
+        # bitta so'rov bilan tekshiriladi, natija qisqa muddat Redis'da
+        # keshlanadi (skanerlanganda tozalanadi)
+        qr_type, qr_obj, qr_code = resolve_code_cached(qr_code)
+        ecopacket_qr = qr_obj if qr_type == ECOPACKET else None
+        flask_qr = qr_obj if qr_type == FLASK else None
 
         # Helper function to get client IP
         def get_client_ip(request):
@@ -699,9 +455,9 @@ class UniversalQrCheckView(APIView):
                 qr_type = "flask"
                 exists = False
 
-                # Log request
+                # Log request (buferli yozuvchi orqali)
                 if getattr(settings, "ENABLE_QR_CHECK_LOGGING", False):
-                    QrCheckLog.objects.create(
+                    log_qr_check(
                         qr_code=qr_code,
                         ip_address=get_client_ip(request),
                         user_agent=request.META.get("HTTP_USER_AGENT", ""),
@@ -741,9 +497,9 @@ class UniversalQrCheckView(APIView):
             qr_type = "not_found"
             exists = False
 
-        # Log request if enabled
+        # Log request if enabled (buferli yozuvchi orqali, so'rovni kutdirmaydi)
         if getattr(settings, "ENABLE_QR_CHECK_LOGGING", False):
-            QrCheckLog.objects.create(
+            log_qr_check(
                 qr_code=qr_code,
                 ip_address=get_client_ip(request),
                 user_agent=request.META.get("HTTP_USER_AGENT", ""),
@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from django.utils import timezone
 from rest_framework import status
 from django_filters import rest_framework as filters
@@ -7,7 +9,7 @@ from rest_framework import viewsets, generics
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import OuterRef, Subquery
+from django.db.models import F
 
 from apps.utils.save_to_database import create_ecopacket_qr_codes
 from apps.ecopacket.models import EcoPacketQrCode, Box, LifeCycle
@@ -21,7 +23,34 @@ from apps.ecopacket.serializers.serializers import (
     EcoPacketQrCodeSerializerCreate,
     AgentBoxSerializer,
 )
-from apps.bank.models import Earning
+from apps.ecopacket.services.check_log import get_writer
+from apps.ecopacket.services.dispatch import (
+    BOX_FIELDS,
+    MAX_ROUTE_STOPS,
+    InvalidPoint,
+    nearest_boxes,
+    parse_k,
+    parse_point,
+    pickup_queue,
+    plan_route,
+)
+from apps.ecopacket.services.geo import InvalidBBox, box_map, parse_bbox, parse_zoom
+from apps.ecopacket.services.telemetry import (
+    BOX_NOT_FOUND,
+    MAX_BATCH_SIZE,
+    format_location,
+    ingest_readings,
+)
+from apps.ecopacket.services.lookup_cache import (
+    attach_category,
+    get_scan_box,
+    get_stats,
+)
+from apps.ecopacket.services.settlement import (
+    QrCodeAlreadyUsed,
+    settle_ecopacket_batch,
+    settle_scan,
+)
 
 # from django.contrib.gis.geos import Point
 from apps.utils.pagination import MyPagination
@@ -33,9 +62,10 @@ class BoxListView(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
+        boxes = Box.objects.select_related("category").with_pending()
         if user.role == RoleOptions.AGENT:
-            return Box.objects.filter(seller=user)
-        return Box.objects.all()
+            return boxes.filter(seller=user)
+        return boxes.all()
 
 
 class LifeCycleView(APIView):
@@ -71,125 +101,95 @@ def create_ecopacket_qr_code(request):
         return Response({"error": "QR code creation failed"})
 
 
-class IOTLocationStateView(APIView):
-    def post(self, request):
-        # Extract location data from request data
-        lat = request.data.get("lat", None)
-        lng = request.data.get("lng", None)
-        sim_module = request.data.get("sim_module")
-        state = request.data.get("state")
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def lookup_cache_stats(request):
+    """Box/Category lookup keshining hit/miss hisoblagichlari (joriy jarayon)"""
+    return Response(get_stats())
 
-        try:
-            box = Box.objects.get(sim_module=sim_module)
-        except:
-            return Response({"error": "No box found with this sim module"}, status=404)
-
-        last_lifecycle = box.lifecycle.last()
-        if last_lifecycle:
-            # Create a Point object from location data
-            last_lifecycle.location = f"{float(lng), float(lat)}"
-            last_lifecycle.state = state
-            last_lifecycle.save()
-        else:
-            LifeCycle.objects.create(
-                box=box, location=f"{float(lng), float(lat)}", state=state
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def qr_check_log_stats(request):
+    """QrCheckLog buferli yozuvchisi hisoblagichlari (joriy jarayon)"""
+    return Response(get_writer().get_stats())
+
+
+class IOTLocationStateView(APIView):
+    def save_state(self, sim_module, lat, lng, state):
+        # Bitta o'qish ham telemetriya tarixiga yoziladi
+        accepted, rejected = ingest_readings(
+            [{"sim_module": sim_module, "lat": lat, "lng": lng, "state": state}]
+        )
+        if not accepted:
+            error = rejected[0]["error"]
+            return Response(
+                {"error": error}, status=404 if error == BOX_NOT_FOUND else 400
             )
         return Response(
             {"message": "Your data has been saved successfully!"}, status=201
         )
 
-    def get(self, request):
+    def post(self, request):
         # Extract location data from request data
-        lat = request.GET.get("lat", None)
-        lng = request.GET.get("lng", None)
-        sim_module = request.GET.get("sim_module")
-        state = request.GET.get("state")
+        return self.save_state(
+            request.data.get("sim_module"),
+            request.data.get("lat", None),
+            request.data.get("lng", None),
+            request.data.get("state"),
+        )
 
-        try:
-            box = Box.objects.get(sim_module=sim_module)
-        except:
-            return Response({"error": "No box found with this sim module"}, status=404)
-
-        last_lifecycle = box.lifecycle.last()
-        if last_lifecycle:
-            # Create a Point object from location data
-            last_lifecycle.location = f"{float(lng), float(lat)}"
-            last_lifecycle.state = state
-            last_lifecycle.save()
-        else:
-            LifeCycle.objects.create(
-                box=box, location=f"{float(lng), float(lat)}", state=state
-            )
-        return Response(
-            {"message": "Your data has been saved successfully!"}, status=201
+    def get(self, request):
+        # Extract location data from request data
+        return self.save_state(
+            request.GET.get("sim_module"),
+            request.GET.get("lat", None),
+            request.GET.get("lng", None),
+            request.GET.get("state"),
         )
 
 
-class IOTView(APIView):
-    def post(self, request, format=None):
-        qr_code = request.data["qr_code"]
-        sim_module = request.data["sim_module"]
+class IOTTelemetryBatchView(APIView):
+    """
+    Ko'p box'lar telemetriyasini bitta so'rovda qabul qilish.
 
-        if qr_code is None or sim_module is None:
-            return Response(
+    Request data:
+        {
+            "readings": [
                 {
-                    "error": "Please send me scannered qr code via"
-                    "mobile phone send me, or sim module was missed!"
+                    "sim_module": "string",
+                    "lat": float,
+                    "lng": float,
+                    "state": int,
+                    "ts": "2025-01-01T10:00:00+05:00"   # ixtiyoriy
                 },
-                status=status.HTTP_404_NOT_FOUND,
-            )
-        try:
-            ecopacket_qr = EcoPacketQrCode.objects.get(qr_code=qr_code)
-            box = Box.objects.get(sim_module=sim_module)
-        except:
-            return Response(
-                {"error": "This qr code was not found or has been used before."},
-                status=status.HTTP_404_NOT_FOUND,
-            )
+                ...
+            ]
+        }
+    """
 
-        if ecopacket_qr.user is None:
+    def post(self, request):
+        readings = request.data.get("readings")
+        if not isinstance(readings, list) or not readings:
             return Response(
-                {
-                    "error": "Please! Scan your mobile phone first or use another enpoint!"
-                },
-                status=status.HTTP_401_UNAUTHORIZED,
+                {"error": "readings list is required"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-
-        if ecopacket_qr.scannered_at is not None:
+        if len(readings) > MAX_BATCH_SIZE:
             return Response(
-                {"error": "This Qr code has already been used"},
-                status=status.HTTP_409_CONFLICT,
+                {"error": f"Maximum {MAX_BATCH_SIZE} readings per request"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        last_lifecycle = box.lifecycle.last()
-
-        ecopacket_qr.scannered_at = timezone.now()
-        ecopacket_qr.life_cycle = last_lifecycle
-        ecopacket_qr.save()
-
-        ecopakcet_money = ecopacket_qr.category.summa
-        ecopakcet_catergory = ecopacket_qr.category
-        user = ecopacket_qr.user
-        bank_account = user.bankaccount
-        bank_account.capital += ecopakcet_money
-        bank_account.save()
-
-        Earning.objects.create(
-            bank_account=bank_account,
-            amount=ecopakcet_money,
-            tarrif=ecopakcet_catergory.name,
-            box=box,
-        )
-        # Return a success response
+        accepted, rejected = ingest_readings(readings)
         return Response(
-            {"message": "Qr code was successfully scanned."},
-            status=status.HTTP_202_ACCEPTED,
+            {"accepted": accepted, "rejected": rejected},
+            status=status.HTTP_201_CREATED,
         )
 
-    def get(self, request, format=None):
-        qr_code = request.GET.get("qr_code", None)
-        sim_module = request.GET.get("sim_module", None)
 
+class IOTView(APIView):
+    def scan(self, qr_code, sim_module):
         if qr_code is None or sim_module is None:
             return Response(
                 {
@@ -198,10 +198,13 @@ class IOTView(APIView):
                 },
                 status=status.HTTP_404_NOT_FOUND,
             )
-
         try:
-            ecopacket_qr = EcoPacketQrCode.objects.get(qr_code=qr_code)
-            box = Box.objects.get(sim_module=sim_module)
+            ecopacket_qr = attach_category(
+                EcoPacketQrCode.objects.select_related("user__bankaccount").get(
+                    qr_code=qr_code
+                )
+            )
+            box = get_scan_box(sim_module)
         except:
             return Response(
                 {"error": "This qr code was not found or has been used before."},
@@ -222,189 +225,40 @@ class IOTView(APIView):
                 status=status.HTTP_409_CONFLICT,
             )
 
-        last_lifecycle = box.lifecycle.last()
-
-        ecopacket_qr.scannered_at = timezone.now()
-        ecopacket_qr.life_cycle = last_lifecycle
-        ecopacket_qr.save()
-
-        ecopakcet_money = ecopacket_qr.category.summa
-        ecopakcet_catergory = ecopacket_qr.category
-        user = ecopacket_qr.user
-        bank_account = user.bankaccount
-
-        # Kategoriya ignore_agent=True bo'lsa, hamma pul foydalanuvchiga beriladi
-        if ecopakcet_catergory.ignore_agent:
-            # Seller ulushini hisoblamay, hammasi foydalanuvchiga boradi
-            bank_account.capital += ecopakcet_money
-            bank_account.save()
-
-            # Foydalanuvchi uchun daromad yozib qo'yiladi
-            Earning.objects.create(
-                bank_account=bank_account,
-                amount=ecopakcet_money,
-                tarrif=ecopakcet_catergory.name,
-                box=box,
-            )
-        else:
-            # Agar ignore_agent=False bo'lsa, odatiy hisob-kitob
-            seller_percentage = box.seller_percentage
-            if box.seller is not None:
-                # Seller ulushini hisoblash (masalan 30%)
-                seller_share = ecopakcet_money * seller_percentage / 100
-                # Client ulushini hisoblash (qolgan qismi)
-                client_share = ecopakcet_money - seller_share
-                # Seller hisobiga o'tkazish
-                bank_account_seller = box.seller.bankaccount
-                bank_account_seller.capital += seller_share
-                bank_account_seller.save()
-
-                # Box da seller ulushini saqlash
-                box.seller_share += seller_share
-                box.save()
-
-                # Client hisobiga asosiy summa + client ulushini o'tkazish
-                bank_account.capital += ecopakcet_money + client_share
-            else:
-                # Seller bo'lmasa hamma summa clientga
-                bank_account.capital += ecopakcet_money
-
-            bank_account.save()
-
-            Earning.objects.create(
-                bank_account=bank_account,
-                amount=ecopakcet_money,
-                tarrif=ecopakcet_catergory.name,
-                box=box,
-            )
-
-        # Return a success response
-        return Response(
-            {"message": "Qr code was successfully scanned."},
-            status=status.HTTP_202_ACCEPTED,
-        )
-
-
-class IOTManualView(APIView):
-    def post(self, request, format=None):
-        qr_code = request.data["qr_code"]
-        sim_module = request.data["sim_module"]
-        phone_number = request.data["phone_number"]
         try:
-            user = User.objects.get(phone_number=phone_number)
-        except:
-            return Response(
-                {"error": "Phone number doesn't exists!"},
-                status=status.HTTP_404_NOT_FOUND,
-            )
-
-        if qr_code is None or sim_module is None:
-            return Response(
-                {
-                    "error": "Please send me scannered qr code via"
-                    "mobile phone send me, or sim module was missed!"
-                },
-                status=status.HTTP_404_NOT_FOUND,
-            )
-        try:
-            ecopacket_qr = EcoPacketQrCode.objects.get(qr_code=qr_code)
-            box = Box.objects.get(sim_module=sim_module)
-        except:
-            return Response(
-                {"error": "This qr code was not found or has been used before."},
-                status=status.HTTP_404_NOT_FOUND,
+            settle_scan(
+                box,
+                ecopacket_qr.category,
+                ecopacket_qr.user.bankaccount,
+                ecopacket_qr=ecopacket_qr,
             )
-
-        if ecopacket_qr.user is not None:
-            return Response(
-                {"error": "Packet already scanned!"},
-                status=status.HTTP_401_UNAUTHORIZED,
-            )
-
-        if ecopacket_qr.scannered_at is not None:
+        except QrCodeAlreadyUsed:
             return Response(
                 {"error": "This Qr code has already been used"},
                 status=status.HTTP_409_CONFLICT,
             )
 
-        last_lifecycle = box.lifecycle.last()
-
-        ecopacket_qr.scannered_at = timezone.now()
-        ecopacket_qr.life_cycle = last_lifecycle
-        ecopacket_qr.user = user
-        ecopacket_qr.save()
-
-        ecopakcet_money = ecopacket_qr.category.summa
-        ecopakcet_catergory = ecopacket_qr.category
-        bank_account = user.bankaccount
-
-        # Kategoriya ignore_agent=True bo'lsa, hamma pul foydalanuvchiga beriladi
-        if ecopakcet_catergory.ignore_agent:
-            # Seller ulushini hisoblamay, hammasi foydalanuvchiga boradi
-            bank_account.capital += ecopakcet_money
-            bank_account.save()
-
-            # Foydalanuvchi uchun daromad yozib qo'yiladi
-            Earning.objects.create(
-                bank_account=bank_account,
-                amount=ecopakcet_money,
-                tarrif=ecopakcet_catergory.name,
-                box=box,
-            )
-        else:
-            # Agar ignore_agent=False bo'lsa yoki bo'lmasa, odatiy hisob-kitob
-            seller_percentage = box.seller_percentage
-            if box.seller is not None:
-                # Seller ulushini hisoblash
-                seller_share = ecopakcet_money * seller_percentage / 100
-                client_share = ecopakcet_money - seller_share
-
-                # Seller hisobiga o'tkazish
-                bank_account_seller = box.seller.bankaccount
-                bank_account_seller.capital += seller_share
-                bank_account_seller.save()
-
-                # Box da seller ulushini saqlash
-                box.seller_share += seller_share
-                box.save()
-
-                # Seller uchun daromad yozib qo'yiladi
-                Earning.objects.create(
-                    bank_account=bank_account_seller,
-                    amount=seller_share,
-                    tarrif=ecopakcet_catergory.name,
-                    box=box,
-                )
-
-                # Client hisobiga client ulushini o'tkazish
-                bank_account.capital += client_share
-            else:
-                # Seller bo'lmasa hamma summa clientga
-                bank_account.capital += ecopakcet_money
-
-            bank_account.save()
-
-            # Client uchun daromad yozib qo'yiladi
-            Earning.objects.create(
-                bank_account=bank_account,
-                amount=ecopakcet_money if box.seller is None else client_share,
-                tarrif=ecopakcet_catergory.name,
-                box=box,
-            )
-
         # Return a success response
         return Response(
             {"message": "Qr code was successfully scanned."},
             status=status.HTTP_202_ACCEPTED,
         )
 
+    def post(self, request, format=None):
+        return self.scan(request.data["qr_code"], request.data["sim_module"])
+
     def get(self, request, format=None):
-        qr_code = request.GET.get("qr_code", None)
-        sim_module = request.GET.get("sim_module", None)
-        phone_number = request.GET.get("phone_number", None)
+        return self.scan(
+            request.GET.get("qr_code", None), request.GET.get("sim_module", None)
+        )
+
 
+class IOTManualView(APIView):
+    def scan(self, qr_code, sim_module, phone_number):
         try:
-            user = User.objects.get(phone_number=phone_number)
+            user = User.objects.select_related("bankaccount").get(
+                phone_number=phone_number
+            )
         except:
             return Response(
                 {"error": "Phone number doesn't exists!"},
@@ -420,8 +274,10 @@ class IOTManualView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
         try:
-            ecopacket_qr = EcoPacketQrCode.objects.get(qr_code=qr_code)
-            box = Box.objects.get(sim_module=sim_module)
+            ecopacket_qr = attach_category(
+                EcoPacketQrCode.objects.get(qr_code=qr_code)
+            )
+            box = get_scan_box(sim_module)
         except:
             return Response(
                 {"error": "This qr code was not found or has been used before."},
@@ -440,69 +296,18 @@ class IOTManualView(APIView):
                 status=status.HTTP_409_CONFLICT,
             )
 
-        last_lifecycle = box.lifecycle.last()
-
-        ecopacket_qr.scannered_at = timezone.now()
-        ecopacket_qr.life_cycle = last_lifecycle
-        ecopacket_qr.user = user
-        ecopacket_qr.save()
-
-        ecopakcet_money = ecopacket_qr.category.summa
-        ecopakcet_catergory = ecopacket_qr.category
-        bank_account = user.bankaccount
-
-        # Kategoriya ignore_agent=True bo'lsa, hamma pul foydalanuvchiga beriladi
-        if ecopakcet_catergory.ignore_agent:
-            # Seller ulushini hisoblamay, hammasi foydalanuvchiga boradi
-            bank_account.capital += ecopakcet_money
-            bank_account.save()
-
-            # Foydalanuvchi uchun daromad yozib qo'yiladi
-            Earning.objects.create(
-                bank_account=bank_account,
-                amount=ecopakcet_money,
-                tarrif=ecopakcet_catergory.name,
-                box=box,
-            )
-        else:
-            # Agar ignore_agent=False bo'lsa yoki bo'lmasa, odatiy hisob-kitob
-            seller_percentage = box.seller_percentage
-            if box.seller is not None:
-                # Seller ulushini hisoblash
-                seller_share = ecopakcet_money * seller_percentage / 100
-                client_share = ecopakcet_money - seller_share
-
-                # Seller hisobiga o'tkazish
-                bank_account_seller = box.seller.bankaccount
-                bank_account_seller.capital += seller_share
-                bank_account_seller.save()
-
-                # Box da seller ulushini saqlash
-                box.seller_share += seller_share
-                box.save()
-
-                # Seller uchun daromad yozib qo'yiladi
-                Earning.objects.create(
-                    bank_account=bank_account_seller,
-                    amount=seller_share,
-                    tarrif=ecopakcet_catergory.name,
-                    box=box,
-                )
-
-                # Client hisobiga client ulushini o'tkazish
-                bank_account.capital += client_share
-            else:
-                # Seller bo'lmasa hamma summa clientga
-                bank_account.capital += ecopakcet_money
-
-            bank_account.save()
-
-            # Client uchun daromad yozib qo'yiladi
-            Earning.objects.create(
-                bank_account=bank_account,
-                amount=ecopakcet_money if box.seller is None else client_share,
-                tarrif=ecopakcet_catergory.name,
-                box=box,
+        try:
+            settle_scan(
+                box,
+                ecopacket_qr.category,
+                user.bankaccount,
+                ecopacket_qr=ecopacket_qr,
+                user=user,
+            )
+        except QrCodeAlreadyUsed:
+            return Response(
+                {"error": "This Qr code has already been used"},
+                status=status.HTTP_409_CONFLICT,
             )
 
         # Return a success response
@@ -511,6 +316,20 @@ class IOTManualView(APIView):
             status=status.HTTP_202_ACCEPTED,
         )
 
+    def post(self, request, format=None):
+        return self.scan(
+            request.data["qr_code"],
+            request.data["sim_module"],
+            request.data["phone_number"],
+        )
+
+    def get(self, request, format=None):
+        return self.scan(
+            request.GET.get("qr_code", None),
+            request.GET.get("sim_module", None),
+            request.GET.get("phone_number", None),
+        )
+
 
 class IOTManualMultipleView(APIView):
     def post(self, request, format=None):
@@ -525,14 +344,16 @@ class IOTManualMultipleView(APIView):
             )
 
         try:
-            box = Box.objects.get(sim_module=sim_module)
+            box = get_scan_box(sim_module)
         except:
             return Response(
                 {"error": "Box doesn't exists!"},
                 status=status.HTTP_404_NOT_FOUND,
             )
         try:
-            user = User.objects.get(phone_number=phone_number)
+            user = User.objects.select_related("bankaccount").get(
+                phone_number=phone_number
+            )
         except:
             return Response(
                 {"error": "Phone number doesn't exists!"},
@@ -548,78 +369,13 @@ class IOTManualMultipleView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        status_qr_code = {"S": 0, "E": 0}
-        for qc in qr_codies:
-            ecopacket_qr = EcoPacketQrCode.objects.filter(qr_code=qc)
-
-            if ecopacket_qr.exists() and ecopacket_qr.first().scannered_at is None:
-                ecopacket = ecopacket_qr.first()
-                last_lifecycle = box.lifecycle.last()
-                ecopacket.scannered_at = timezone.now()
-                ecopacket.life_cycle = last_lifecycle
-                ecopacket.user = user
-                ecopacket.save()
-
-                ecopakcet_money = ecopacket.category.summa
-                ecopakcet_catergory = ecopacket.category
-                client_bank_account = user.bankaccount
-
-                # Kategoriya ignore_agent=True bo'lsa, hamma pul foydalanuvchiga beriladi
-                if ecopakcet_catergory.ignore_agent:
-                    # Seller ulushini hisoblamay, hammasi foydalanuvchiga boradi
-                    client_bank_account.capital += ecopakcet_money
-                    client_bank_account.save()
-
-                    # Foydalanuvchi uchun daromad yozib qo'yiladi
-                    Earning.objects.create(
-                        bank_account=client_bank_account,
-                        amount=ecopakcet_money,
-                        tarrif=ecopakcet_catergory.name,
-                        box=box,
-                    )
-                else:
-                    # Agar ignore_agent=False bo'lsa, odatiy hisob-kitob
-                    # seller ulushini hisoblash
-                    seller_percentage = box.seller_percentage
-                    if box.seller is not None:
-                        seller_share = ecopakcet_money * seller_percentage / 100
-                        client_share = ecopakcet_money - seller_share
-                        # Seller hisobiga o'tkazish
-                        bank_account_seller = box.seller.bankaccount
-                        bank_account_seller.capital += seller_share
-                        bank_account_seller.save()
-                        Earning.objects.create(
-                            bank_account=bank_account_seller,
-                            amount=seller_share,
-                            tarrif=ecopakcet_catergory.name,
-                            box=box,
-                        )
-                        # Box da seller ulushini saqlash
-                        box.seller_share += seller_share
-                        box.save()
-
-                        # Client hisobiga asosiy summa + client ulushini o'tkazish
-                        client_bank_account.capital += client_share
-                        Earning.objects.create(
-                            bank_account=client_bank_account,
-                            amount=client_share,
-                            tarrif=ecopakcet_catergory.name,
-                            box=box,
-                        )
-                    else:
-                        # Seller bo'lmasa hamma summa clientga
-                        client_bank_account.capital += ecopakcet_money
-                        Earning.objects.create(
-                            bank_account=client_bank_account,
-                            amount=ecopakcet_money,
-                            tarrif=ecopakcet_catergory.name,
-                            box=box,
-                        )
-
-                client_bank_account.save()
-                status_qr_code["S"] += 1
-            else:
-                status_qr_code["E"] += 1
+        codes = settle_ecopacket_batch(box, user, qr_codies)
+        success_count = sum(1 for code in codes if code["status"] == "success")
+        status_qr_code = {
+            "S": success_count,
+            "E": len(codes) - success_count,
+            "codes": codes,
+        }
 
         # Return a success response
         return Response(
@@ -679,7 +435,7 @@ class IOTManualSingleView(APIView):
             )
 
         try:
-            box = Box.objects.get(sim_module=sim_module)
+            box = get_scan_box(sim_module)
         except Box.DoesNotExist:
             return Response(
                 {"error": "Box doesn't exist!"},
@@ -687,7 +443,9 @@ class IOTManualSingleView(APIView):
             )
 
         try:
-            user = User.objects.get(phone_number=phone_number)
+            user = User.objects.select_related("bankaccount").get(
+                phone_number=phone_number
+            )
         except User.DoesNotExist:
             return Response(
                 {"error": "Phone number doesn't exist!"},
@@ -695,7 +453,9 @@ class IOTManualSingleView(APIView):
             )
 
         try:
-            ecopacket_qr = EcoPacketQrCode.objects.get(qr_code=qr_code)
+            ecopacket_qr = attach_category(
+                EcoPacketQrCode.objects.get(qr_code=qr_code)
+            )
         except EcoPacketQrCode.DoesNotExist:
             return Response(
                 {"error": "QR code not found!"},
@@ -709,73 +469,20 @@ class IOTManualSingleView(APIView):
             )
 
         # QR kodini qayta ishlash
-        last_lifecycle = box.lifecycle.last()
-        ecopacket_qr.scannered_at = timezone.now()
-        ecopacket_qr.life_cycle = last_lifecycle
-        ecopacket_qr.user = user
-        ecopacket_qr.save()
-
-        ecopakcet_money = ecopacket_qr.category.summa
         ecopakcet_catergory = ecopacket_qr.category
-        client_bank_account = user.bankaccount
-
-        # Kategoriya ignore_agent=True bo'lsa, hamma pul foydalanuvchiga beriladi
-        if ecopakcet_catergory.ignore_agent:
-            # Seller ulushini hisoblamay, hammasi foydalanuvchiga boradi
-            client_bank_account.capital += ecopakcet_money
-            
-            # Foydalanuvchi uchun daromad yozib qo'yiladi
-            Earning.objects.create(
-                bank_account=client_bank_account,
-                amount=ecopakcet_money,
-                tarrif=ecopakcet_catergory.name,
-                box=box,
+        try:
+            ecopakcet_money = settle_scan(
+                box,
+                ecopakcet_catergory,
+                user.bankaccount,
+                ecopacket_qr=ecopacket_qr,
+                user=user,
+            )
+        except QrCodeAlreadyUsed:
+            return Response(
+                {"error": "This QR code has already been used"},
+                status=status.HTTP_409_CONFLICT,
             )
-        else:
-            # Agar ignore_agent=False bo'lsa, odatiy hisob-kitob
-            # seller ulushini hisoblash
-            seller_percentage = box.seller_percentage
-            if box.seller is not None:
-                seller_share = ecopakcet_money * seller_percentage / 100
-                client_share = ecopakcet_money - seller_share
-                
-                # Seller hisobiga o'tkazish
-                bank_account_seller = box.seller.bankaccount
-                bank_account_seller.capital += seller_share
-                bank_account_seller.save()
-                
-                Earning.objects.create(
-                    bank_account=bank_account_seller,
-                    amount=seller_share,
-                    tarrif=ecopakcet_catergory.name,
-                    box=box,
-                )
-                
-                # Box da seller ulushini saqlash
-                box.seller_share += seller_share
-                box.save()
-
-                # Client hisobiga client ulushini o'tkazish
-                client_bank_account.capital += client_share
-                
-                Earning.objects.create(
-                    bank_account=client_bank_account,
-                    amount=client_share,
-                    tarrif=ecopakcet_catergory.name,
-                    box=box,
-                )
-            else:
-                # Seller bo'lmasa hamma summa clientga
-                client_bank_account.capital += ecopakcet_money
-                
-                Earning.objects.create(
-                    bank_account=client_bank_account,
-                    amount=ecopakcet_money,
-                    tarrif=ecopakcet_catergory.name,
-                    box=box,
-                )
-
-        client_bank_account.save()
 
         return Response({
             "success": True,
@@ -866,7 +573,11 @@ class BoxOrderAPIView(APIView):
 
     def get(self, request):
         orders = LifeCycle.objects.filter(employee=None).filter(state__gte=80)
-        ordered = LifeCycle.objects.exclude(employee=None).filter(filled_at=None)
+        ordered = (
+            LifeCycle.objects.exclude(employee=None)
+            .filter(filled_at=None)
+            .select_related("employee")
+        )
         serializer = LifeCycleSerializer(orders, many=True)
         ordered_serializer = LifeCycleSerializer(ordered, many=True)
         return Response(
@@ -875,19 +586,132 @@ class BoxOrderAPIView(APIView):
         )
 
 
-class BoxLocationAPIView(APIView):
+class BoxOrderNearestAPIView(APIView):
+    """
+    Xodimga eng yaqin, bo'shatilishi kerak bo'lgan box'lar.
+
+    Query Parameters:
+        lat, lng (float): xodimning joylashuvi
+        k (int): nechta box (standart 10, ko'pi bilan 50)
+
+    Faqat xodim kategoriyalaridagi, to'lgan va hali buyurtma qilinmagan
+    box'lar qaytariladi; buyurtma uchun "current_lifecycle_id" ishlatiladi.
+    """
+
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        lifecycle_subquery = LifeCycle.objects.filter(box=OuterRef("pk")).order_by(
-            "-started_at"
+        try:
+            lat, lng = parse_point(
+                request.query_params.get("lat"), request.query_params.get("lng")
+            )
+            k = parse_k(request.query_params.get("k"))
+        except InvalidPoint as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        boxes = nearest_boxes(pickup_queue(request.user), lat, lng, k)
+        return Response(
+            [{**box, "distance_km": distance} for distance, box in boxes]
         )
-        boxes_queryset = Box.objects.annotate(
-            last_lifecycle_location=Subquery(lifecycle_subquery.values("location")[:1])
-        ).values("name", "last_lifecycle_location")
+
+
+class BoxOrderRouteAPIView(APIView):
+    """
+    Bo'shatish marshruti.
+
+    Request body:
+        lat, lng (float): boshlang'ich nuqta
+        box_ids (list, ixtiyoriy): marshrutga kiritiladigan box'lar
+        k (int, ixtiyoriy): box_ids berilmasa eng yaqin k ta box
+
+    Box'lar eng yaqin qo'shni + 2-opt tartibida qaytariladi.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            lat, lng = parse_point(request.data.get("lat"), request.data.get("lng"))
+            k = parse_k(request.data.get("k"), limit=MAX_ROUTE_STOPS)
+        except InvalidPoint as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        queue = pickup_queue(request.user)
+        box_ids = request.data.get("box_ids")
+        if box_ids:
+            if (
+                not isinstance(box_ids, list)
+                or len(box_ids) > MAX_ROUTE_STOPS
+                or not all(isinstance(pk, int) for pk in box_ids)
+            ):
+                return Response(
+                    {"error": f"box_ids must be a list of at most {MAX_ROUTE_STOPS} ids"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            stops = list(queue.filter(pk__in=box_ids).values(*BOX_FIELDS))
+        else:
+            stops = [box for _, box in nearest_boxes(queue, lat, lng, k)]
+
+        route, total_km = plan_route((lat, lng), stops)
+        return Response({"route": route, "total_km": total_km})
+
+
+class BoxForecastAPIView(APIView):
+    """
+    Yaqin soatlarda to'lishi kutilayotgan box'lar (forecast_fill prognozi).
+
+    Query Parameters:
+        hours (int): necha soat ichida to'ladiganlar (standart 24)
+
+    Allaqachon to'lganlar ham qaytariladi, full_at bo'yicha saralangan.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            hours = int(request.query_params.get("hours", 24))
+        except ValueError:
+            return Response(
+                {"error": "hours must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not 0 < hours <= 24 * 30:
+            return Response(
+                {"error": "hours must be between 1 and 720"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        boxes = (
+            Box.objects.filter(
+                is_active=True,
+                full_at__lte=timezone.now() + timedelta(hours=hours),
+            )
+            .order_by("full_at")
+            .values(
+                "id", "name", "sim_module", "state", "fill_rate", "full_at", "lat", "lng"
+            )
+        )
+        return Response(list(boxes))
+
+
+class BoxLocationAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        # Oxirgi yuborilgan joylashuv Box.lat / Box.lng da ("(lng, lat)" formatida)
+        boxes_queryset = [
+            {
+                "name": name,
+                "last_lifecycle_location": (
+                    None if lat is None else format_location(lat, lng)
+                ),
+            }
+            for name, lat, lng in Box.objects.values_list("name", "lat", "lng")
+        ]
 
         # Return the response
-        return Response(list(boxes_queryset))
+        return Response(boxes_queryset)
 
 
 # V2
@@ -895,54 +719,33 @@ class BoxLocationAPIViewV2(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        try:
-            lifecycle_subquery = LifeCycle.objects.filter(box=OuterRef("pk")).order_by(
-                "-started_at"
-            )
-
-            # Get the last lifecycle location as a subquery
-            last_lifecycle_location = Subquery(
-                lifecycle_subquery.values("location")[:1]
-            )
-            # Annotate Box queryset with last_lifecycle_location
-            boxes_queryset = Box.objects.annotate(
-                last_lifecycle_location=last_lifecycle_location
-            ).values("name", "last_lifecycle_location")
-
-            # Prepare a list to store results with parsed coordinates
-            results = []
-
-            # Iterate over queryset to extract and format coordinates
-            for box in boxes_queryset:
-                name = box["name"]
-                location = box["last_lifecycle_location"]
-
-                # If location is not None and has parentheses, extract coordinates
-                if (
-                    location
-                    and isinstance(location, str)
-                    and location.startswith("(")
-                    and location.endswith(")")
-                ):
-                    coordinates = location.strip("()").split(",")
-                    coordinates = tuple(float(coord.strip()) for coord in coordinates)
-                else:
-                    coordinates = None
-
-                # Append formatted result to list
-                results.append(
-                    {
-                        "name": name,
-                        "lang": coordinates[0] if coordinates else None,
-                        "lat": coordinates[1] if coordinates else None,
-                    }
-                )
+        # Koordinatalar Box.lat / Box.lng ustunlarida saqlanadi
+        boxes_queryset = Box.objects.values("name", "lat", lang=F("lng"))
+        return Response(list(boxes_queryset))
+
+
+class BoxMapAPIView(APIView):
+    """
+    Xarita uchun ko'rinib turgan hududdagi box'lar.
 
-            # Return the formatted results as JSON response
-            return Response(results)
+    Query Parameters:
+        bbox (string): "min_lng,min_lat,max_lng,max_lat"
+        zoom (int): xarita zoom darajasi (0-22)
+
+    Kichik zoom'da box'lar o'rniga grid klasterlar (katakdagi soni va
+    o'rtacha koordinatasi) qaytariladi.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            bbox = parse_bbox(request.query_params.get("bbox"))
+            zoom = parse_zoom(request.query_params.get("zoom"))
+        except InvalidBBox as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+        return Response(box_map(bbox, zoom))
 
 
 # CRUD DEVELOPER
@@ -951,7 +754,7 @@ class BoxLocationAPIViewV2(APIView):
 class BoxModelViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminUser, IsAuthenticated]
     serializer_class = BoxSerializer
-    queryset = Box.objects.all()
+    queryset = Box.objects.with_pending()
 
 
 class LifeCycleListAPIView(generics.ListAPIView):
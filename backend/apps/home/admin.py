@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
-from .models import Home, HomeMembership, Region, WasteMonthlyReport
+from .models import Home, HomeMembership, Region, RegionLimitState, WasteMonthlyReport
 
 
 @admin.register(Region)
@@ -27,6 +27,9 @@ class RegionAdmin(admin.ModelAdmin):
         "get_current_month_statistics",
     ]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_current_scans()
+
     fieldsets = (
         (
             None,
@@ -342,3 +345,11 @@ class WasteMonthlyReportAdmin(admin.ModelAdmin):
         self.message_user(request, f"{count} ta hisobot qayta yaratildi.")
 
     regenerate_reports.short_description = "Hisobotlarni qayta yaratish"
+
+
+@admin.register(RegionLimitState)
+class RegionLimitStateAdmin(admin.ModelAdmin):
+    list_display = ["region", "year", "month", "level", "total_scans", "updated_at"]
+    list_filter = ["level", "year", "month"]
+    search_fields = ["region__name", "region__code"]
+    readonly_fields = ["updated_at"]
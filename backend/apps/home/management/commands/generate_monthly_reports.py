@@ -1,7 +1,20 @@
+from concurrent.futures import ProcessPoolExecutor
+
 from django.core.management.base import BaseCommand
+from django.db import connections
 from django.utils import timezone
 from apps.home.models import Region, WasteMonthlyReport
-from datetime import datetime
+from apps.home.services.monthly_reports import (
+    generate_reports,
+    month_range,
+    parse_period,
+)
+
+
+def _generate(period, region_ids, force):
+    """Pool jarayonida bitta oy (har bir jarayon o'z ulanishini ochadi)"""
+    regions = Region.objects.filter(pk__in=region_ids)
+    return period, generate_reports([period], regions, force)
 
 
 class Command(BaseCommand):
@@ -18,6 +31,22 @@ class Command(BaseCommand):
             type=int,
             help="Hisobot oyi (1-12)",
         )
+        parser.add_argument(
+            "--from",
+            dest="period_from",
+            help="Oraliq boshi, YYYY-MM (tarixni qayta yozish uchun)",
+        )
+        parser.add_argument(
+            "--to",
+            dest="period_to",
+            help="Oraliq oxiri, YYYY-MM (standart - joriy oy)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Oraliqdagi oylarni parallel yozadigan jarayonlar soni (PostgreSQL)",
+        )
         parser.add_argument(
             "--region",
             type=str,
@@ -29,23 +58,39 @@ class Command(BaseCommand):
             help="Mavjud hisobotlarni qayta yaratish",
         )
 
-    def handle(self, *args, **options):
-        # Parametrlarni olish
-        year = options.get("year") or timezone.now().year
-        month = options.get("month") or timezone.now().month
-        region_code = options.get("region")
-        force_regenerate = options.get("force", False)
+    def get_periods(self, options):
+        now = timezone.localtime()
+        if options["period_from"]:
+            start = parse_period(options["period_from"])
+            end = (
+                parse_period(options["period_to"])
+                if options["period_to"]
+                else (now.year, now.month)
+            )
+            return month_range(start, end)
 
-        # Parametrlarni tekshirish
+        year = options.get("year") or now.year
+        month = options.get("month") or now.month
         if not (1 <= month <= 12):
-            self.stdout.write(self.style.ERROR("Oy 1-12 orasida bo'lishi kerak"))
-            return
+            raise ValueError("Oy 1-12 orasida bo'lishi kerak")
+        if year < 2020 or year > now.year + 1:
+            raise ValueError("Yil noto'g'ri kiritilgan")
+        return [(year, month)]
 
-        if year < 2020 or year > timezone.now().year + 1:
-            self.stdout.write(self.style.ERROR("Yil noto'g'ri kiritilgan"))
+    def handle(self, *args, **options):
+        # Parametrlarni tekshirish
+        try:
+            periods = self.get_periods(options)
+        except ValueError as error:
+            self.stdout.write(self.style.ERROR(str(error)))
+            return
+        if not periods:
+            self.stdout.write(self.style.ERROR("Oraliq bo'sh (--from > --to)"))
             return
+        force_regenerate = options.get("force", False)
 
         # Hududlarni filtrlash
+        region_code = options.get("region")
         if region_code:
             regions = Region.objects.filter(code=region_code, is_active=True)
             if not regions.exists():
@@ -55,80 +100,46 @@ class Command(BaseCommand):
                 return
         else:
             regions = Region.objects.filter(is_active=True)
+        region_ids = list(regions.values_list("pk", flat=True))
 
+        first, last = periods[0], periods[-1]
         self.stdout.write(
             self.style.SUCCESS(
                 f"\n{'='*60}\n"
                 f"OYLIK HISOBOTLAR YARATISH\n"
-                f"Sana: {year}/{month:02d}\n"
-                f"Hududlar soni: {regions.count()}\n"
+                f"Sana: {first[0]}/{first[1]:02d}"
+                + (f" - {last[0]}/{last[1]:02d}" if len(periods) > 1 else "")
+                + f"\nHududlar soni: {len(region_ids)}\n"
                 f"{'='*60}"
             )
         )
 
         created_count = 0
         updated_count = 0
-        error_count = 0
-
-        for region in regions:
-            try:
-                # Hisobotni yaratish yoki yangilash
-                if force_regenerate:
-                    # Mavjud hisobotni o'chirish
-                    WasteMonthlyReport.objects.filter(
-                        region=region, year=year, month=month
-                    ).delete()
-
-                report = WasteMonthlyReport.generate_monthly_report(region, year, month)
-
-                # Hisobot yaratilganmi yoki yangilanganmi aniqlash
-                if (
-                    WasteMonthlyReport.objects.filter(
-                        region=region, year=year, month=month
-                    ).count()
-                    == 1
-                ):
-                    existing_report = WasteMonthlyReport.objects.get(
-                        region=region, year=year, month=month
-                    )
-                    if existing_report.pk == report.pk and not force_regenerate:
-                        updated_count += 1
-                        status_icon = "↻"
-                        status_text = "yangilandi"
-                    else:
-                        created_count += 1
-                        status_icon = "✓"
-                        status_text = "yaratildi"
-                else:
-                    created_count += 1
-                    status_icon = "✓"
-                    status_text = "yaratildi"
-
-                # Limit holatini aniqlash
-                if report.limit_exceeded:
-                    limit_status = "⚠️ LIMIT OSHDI"
-                    limit_color = self.style.ERROR
-                elif report.total_scans / region.monthly_waste_limit >= 0.8:
-                    limit_status = "🟡 OGOHLANTIRISH"
-                    limit_color = self.style.WARNING
-                else:
-                    limit_status = "✅ NORMAL"
-                    limit_color = self.style.SUCCESS
-
+        if options["workers"] > 1 and len(periods) > 1:
+            # Fork qilingan jarayonlar ota jarayonning ulanishini ishlatmasligi uchun
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+                futures = [
+                    pool.submit(_generate, period, region_ids, force_regenerate)
+                    for period in periods
+                ]
+                results = [future.result() for future in futures]
+        else:
+            results = [
+                _generate(period, region_ids, force_regenerate) for period in periods
+            ]
+
+        for (year, month), (created, updated) in results:
+            created_count += created
+            updated_count += updated
+            if len(periods) > 1:
                 self.stdout.write(
-                    f"{status_icon} {region.name} ({region.code}) - {status_text}\n"
-                    f"   Skanlar: {report.total_scans}/{region.monthly_waste_limit} "
-                    f"({report.total_scans/region.monthly_waste_limit*100:.1f}%) - "
+                    f"✓ {year}/{month:02d} - {created} yaratildi, {updated} yangilandi"
                 )
-                self.stdout.write(limit_color(f"   {limit_status}"))
 
-            except Exception as e:
-                error_count += 1
-                self.stdout.write(
-                    self.style.ERROR(
-                        f"❌ {region.name} ({region.code}) - Xatolik: {str(e)}"
-                    )
-                )
+        if len(periods) == 1:
+            self.write_reports(*periods[0], region_ids)
 
         # Yakuniy natijalar
         self.stdout.write(
@@ -136,44 +147,47 @@ class Command(BaseCommand):
             f"NATIJALAR:\n"
             f"• Yaratilgan hisobotlar: {created_count}\n"
             f"• Yangilangan hisobotlar: {updated_count}\n"
-            f"• Xatoliklar: {error_count}\n"
             f"• Jami qayta ishlangan: {created_count + updated_count}\n"
             f"{'='*60}"
         )
 
-        # Limit oshgan hududlar ro'yxati
-        critical_reports = WasteMonthlyReport.objects.filter(
-            year=year, month=month, limit_exceeded=True
-        ).select_related("region")
-
-        if critical_reports.exists():
-            self.stdout.write(
-                self.style.ERROR(
-                    f"\n⚠️ LIMIT OSHGAN HUDUDLAR ({critical_reports.count()} ta):"
-                )
-            )
-            for report in critical_reports:
-                percentage = (
-                    report.total_scans / report.region.monthly_waste_limit
-                ) * 100
-                self.stdout.write(
-                    self.style.ERROR(
-                        f"• {report.region.name}: {report.total_scans}/{report.region.monthly_waste_limit} "
-                        f"({percentage:.1f}%)"
-                    )
-                )
-
-        # Ogohlantirish zonasidagi hududlar
-        warning_reports = WasteMonthlyReport.objects.filter(
-            year=year, month=month, limit_exceeded=False
+    def write_reports(self, year, month, region_ids):
+        """Bitta oy uchun hududlar bo'yicha batafsil natija"""
+        reports = WasteMonthlyReport.objects.filter(
+            region_id__in=region_ids, year=year, month=month
         ).select_related("region")
 
+        critical_count = 0
         warning_count = 0
-        for report in warning_reports:
-            if report.total_scans / report.region.monthly_waste_limit >= 0.8:
+        for report in reports:
+            region = report.region
+            limit = region.monthly_waste_limit
+            percentage = report.total_scans / limit * 100 if limit > 0 else 0
+
+            # Limit holatini aniqlash
+            if report.limit_exceeded:
+                critical_count += 1
+                limit_status = "⚠️ LIMIT OSHDI"
+                limit_color = self.style.ERROR
+            elif percentage >= 80:
                 warning_count += 1
+                limit_status = "🟡 OGOHLANTIRISH"
+                limit_color = self.style.WARNING
+            else:
+                limit_status = "✅ NORMAL"
+                limit_color = self.style.SUCCESS
 
-        if warning_count > 0:
+            self.stdout.write(
+                f"{region.name} ({region.code})\n"
+                f"   Skanlar: {report.total_scans}/{limit} ({percentage:.1f}%) - "
+            )
+            self.stdout.write(limit_color(f"   {limit_status}"))
+
+        if critical_count:
+            self.stdout.write(
+                self.style.ERROR(f"\n⚠️ LIMIT OSHGAN HUDUDLAR ({critical_count} ta)")
+            )
+        if warning_count:
             self.stdout.write(
                 self.style.WARNING(
                     f"\n🟡 OGOHLANTIRISH ZONASIDA ({warning_count} ta hudud 80%+ ishlatish)"
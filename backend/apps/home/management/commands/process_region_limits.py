@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.home.services.region_limits import EVENT_BATCH_SIZE, process_events
+
+
+class Command(BaseCommand):
+    help = "Hudud limiti navbatini (RegionLimitEvent) qayta ishlash"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help=(
+                "Berilsa, har shuncha soniyada navbat tekshiriladi (worker "
+                "rejimi) - oraliqdagi hodisalar hudud bo'yicha birlashtiriladi"
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=EVENT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            events, regions, sent = process_events(options["batch_size"])
+            if events:
+                self.stdout.write(
+                    f"{events} ta hodisa, {regions} ta hudud, "
+                    f"{sent} ta ogohlantirish"
+                )
+                continue
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
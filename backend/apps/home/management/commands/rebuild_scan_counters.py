@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.home.services.scan_counters import rebuild
+
+
+class Command(BaseCommand):
+    help = "Skanerlash hisoblagichlarini (uy, foydalanuvchi) EcoPacket'lardan qayta yozish"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="Faqat shu yil")
+        parser.add_argument("--month", type=int, help="Faqat shu oy (1-12)")
+
+    def handle(self, *args, **options):
+        rows = rebuild(options["year"], options["month"])
+        self.stdout.write(self.style.SUCCESS(f"{rows} ta hisoblagich qatori yozildi"))
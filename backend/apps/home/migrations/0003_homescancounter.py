@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def fill_counters(apps, schema_editor):
+    """Mavjud skanerlashlardan HomeScanCounter ni to'ldirish"""
+    EcoPacketQrCode = apps.get_model("ecopacket", "EcoPacketQrCode")
+    HomeScanCounter = apps.get_model("home", "HomeScanCounter")
+
+    rows = (
+        EcoPacketQrCode.objects.filter(
+            scannered_at__isnull=False,
+            user__is_active=True,
+            user__home_membership__home__region__isnull=False,
+        )
+        .annotate(
+            scan_year=ExtractYear("scannered_at"),
+            scan_month=ExtractMonth("scannered_at"),
+        )
+        .values(
+            "user__home_membership__home__region",
+            "user__home_membership__home",
+            "scan_year",
+            "scan_month",
+        )
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    HomeScanCounter.objects.bulk_create(
+        (
+            HomeScanCounter(
+                region_id=row["user__home_membership__home__region"],
+                home_id=row["user__home_membership__home"],
+                year=row["scan_year"],
+                month=row["scan_month"],
+                count=row["total"],
+            )
+            for row in rows.iterator(chunk_size=5000)
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecopacket', '0022_scanned_keyset_idx'),
+        ('home', '0002_region_home_region_wastemonthlyreport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HomeScanCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('home', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.home')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.region')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['home', 'year', 'month'], name='home_scan_counter_home_idx')],
+                'constraints': [models.UniqueConstraint(fields=('region', 'year', 'month', 'home'), name='home_scan_counter_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
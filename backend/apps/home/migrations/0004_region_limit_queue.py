@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0003_homescancounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionLimitEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('count', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.region')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RegionLimitState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('level', models.PositiveSmallIntegerField(choices=[(0, 'normal'), (1, 'warning'), (2, 'critical')], default=0)),
+                ('total_scans', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='home.region')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('region', 'year', 'month'), name='region_limit_state_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def fill_counters(apps, schema_editor):
+    """Mavjud skanerlashlardan UserScanCounter ni to'ldirish"""
+    EcoPacketQrCode = apps.get_model("ecopacket", "EcoPacketQrCode")
+    UserScanCounter = apps.get_model("home", "UserScanCounter")
+
+    rows = (
+        EcoPacketQrCode.objects.filter(scannered_at__isnull=False, user__isnull=False)
+        .annotate(
+            scan_year=ExtractYear("scannered_at"),
+            scan_month=ExtractMonth("scannered_at"),
+        )
+        .values("user", "scan_year", "scan_month")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    UserScanCounter.objects.bulk_create(
+        (
+            UserScanCounter(
+                user_id=row["user"],
+                year=row["scan_year"],
+                month=row["scan_month"],
+                count=row["total"],
+            )
+            for row in rows.iterator(chunk_size=5000)
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecopacket', '0022_scanned_keyset_idx'),
+        ('home', '0004_region_limit_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserScanCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveIntegerField()),
+                ('month', models.PositiveIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'year', 'month'), name='user_scan_counter_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
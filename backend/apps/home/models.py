@@ -1,8 +1,37 @@
 from django.db import models
 from django.core.validators import MinLengthValidator
-from django.utils import timezone
 from datetime import datetime
 from django.db.models import Count
+from django.db.models.functions import Coalesce
+
+
+class RegionQuerySet(models.QuerySet):
+    def with_current_scans(self):
+        """
+        current_month_scans - joriy oydagi skanerlashlar (faol uylar,
+        HomeScanCounter) - ro'yxatlarda har bir hudud uchun alohida so'rov yo'q.
+        """
+        from apps.home.services.scan_counters import current_period
+
+        year, month = current_period()
+        scans = (
+            HomeScanCounter.objects.filter(
+                region=models.OuterRef("pk"),
+                year=year,
+                month=month,
+                home__is_active=True,
+            )
+            .order_by()
+            .values("region")
+            .annotate(total=models.Sum("count"))
+            .values("total")
+        )
+        return self.annotate(
+            current_month_scans=Coalesce(
+                models.Subquery(scans, output_field=models.IntegerField()),
+                models.Value(0),
+            )
+        )
 
 
 class Region(models.Model):
@@ -34,6 +63,8 @@ class Region(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RegionQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Hudud"
         verbose_name_plural = "Hududlar"
@@ -53,28 +84,21 @@ class Region(models.Model):
         return sum(home.member_count for home in self.homes.filter(is_active=True))
 
     def get_monthly_waste_statistics(self, year=None, month=None):
-        """Oylik chiqindi statistikasini olish"""
-        if not year:
-            year = timezone.now().year
-        if not month:
-            month = timezone.now().month
-
-        from apps.ecopacket.models import EcoPacketQrCode
-
-        # Hududdagi barcha uylarning a'zolari
-        home_members = []
-        for home in self.homes.filter(is_active=True):
-            for membership in home.memberships.filter(user__is_active=True):
-                home_members.append(membership.user.id)
-
-        # Oylik skanerlangan paketlar soni
-        monthly_scans = EcoPacketQrCode.objects.filter(
-            user__id__in=home_members,
-            scannered_at__year=year,
-            scannered_at__month=month,
-            scannered_at__isnull=False,
-        ).count()
+        """Oylik chiqindi statistikasini olish (HomeScanCounter'dan)"""
+        from apps.home.services.scan_counters import current_period, monthly_counts
+
+        current = current_period()
+        year, month = current_period(year, month)
+        if (year, month) == current and hasattr(self, "current_month_scans"):
+            # with_current_scans() bilan olingan
+            monthly_scans = self.current_month_scans
+        else:
+            monthly_scans, _ = monthly_counts(
+                region_id=self.pk, year=year, month=month
+            )
+        return self.build_statistics(year, month, monthly_scans)
 
+    def build_statistics(self, year, month, monthly_scans):
         return {
             "year": year,
             "month": month,
@@ -161,33 +185,17 @@ class Home(models.Model):
         return self.memberships.filter(user__is_active=True)
 
     def get_monthly_waste_count(self, year=None, month=None):
-        """Uy a'zolarining oylik chiqindi soni"""
-        if not year:
-            year = timezone.now().year
-        if not month:
-            month = timezone.now().month
-
-        from apps.ecopacket.models import EcoPacketQrCode
-
-        # Uy a'zolarining user id lari
-        member_ids = [membership.user.id for membership in self.members]
-
-        # Oylik skanerlangan paketlar soni
-        monthly_count = EcoPacketQrCode.objects.filter(
-            user__id__in=member_ids,
-            scannered_at__year=year,
-            scannered_at__month=month,
-            scannered_at__isnull=False,
-        ).count()
+        """Uy a'zolarining oylik chiqindi soni (HomeScanCounter'dan)"""
+        from apps.home.services.scan_counters import monthly_counts
 
+        _, monthly_count = monthly_counts(home_id=self.pk, year=year, month=month)
         return monthly_count
 
     def check_region_limit_warning(self, year=None, month=None):
         """Hudud limitiga yetish ogohlantirishini tekshirish"""
-        if not year:
-            year = timezone.now().year
-        if not month:
-            month = timezone.now().month
+        from apps.home.services.scan_counters import current_period, monthly_counts
+
+        year, month = current_period(year, month)
 
         # Check if region is None and return default values
         if not self.region:
@@ -206,8 +214,11 @@ class Home(models.Model):
                 "warning_message": "",
             }
 
-        region_stats = self.region.get_monthly_waste_statistics(year, month)
-        home_contribution = self.get_monthly_waste_count(year, month)
+        # Hudud va uy hisoblagichlari bitta so'rovda
+        region_scans, home_contribution = monthly_counts(
+            self.region_id, self.pk, year, month
+        )
+        region_stats = self.region.build_statistics(year, month, region_scans)
 
         warning_threshold = 0.8  # 80% chegaragacha yetganda ogohlantirish
         critical_threshold = 1.0  # 100% limitga yetganda
@@ -244,14 +255,15 @@ class Home(models.Model):
         else:
             return ""
 
-    # @property
-    # def total_ecopackets(self):
-    #     """Uy a'zolari tomonidan skanerlanish umumiy ecopaketlar soni"""
-    #     from apps.ecopacket.models import EcoPacketQrCode
-
-    #     return EcoPacketQrCode.objects.filter(
-    #         user__home=self, user__is_active=True
-    #     ).count()
+    @property
+    def total_ecopackets(self):
+        """Uy a'zolari tomonidan skanerlangan umumiy ecopaketlar soni (HomeScanCounter)"""
+        return (
+            HomeScanCounter.objects.filter(home=self).aggregate(
+                total=models.Sum("count")
+            )["total"]
+            or 0
+        )
 
 
 class HomeMembership(models.Model):
@@ -273,6 +285,109 @@ class HomeMembership(models.Model):
         return f"{self.user.get_full_name()} - {self.home.name}"
 
 
+class HomeScanCounter(models.Model):
+    """
+    Uy a'zolari skanerlagan EcoPacket'lar soni (hudud, uy, yil, oy).
+
+    Skanerlash hisob-kitobida (settlement) oshiriladi, rebuild_scan_counters
+    buyrug'i EcoPacketQrCode'lardan qayta hisoblaydi.
+    """
+
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name="+")
+    home = models.ForeignKey(Home, on_delete=models.CASCADE, related_name="+")
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["region", "year", "month", "home"],
+                name="home_scan_counter_uniq",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["home", "year", "month"], name="home_scan_counter_home_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.home_id} {self.year}/{self.month:02d}: {self.count}"
+
+
+class UserScanCounter(models.Model):
+    """
+    Foydalanuvchi skanerlagan EcoPacket'lar soni (yil, oy) - umumiy son shu
+    qatorlar yig'indisi. Uyga a'zolikdan qat'i nazar settlement'da oshiriladi.
+    """
+
+    user = models.ForeignKey(
+        "account.User", on_delete=models.CASCADE, related_name="+"
+    )
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "year", "month"], name="user_scan_counter_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.year}/{self.month:02d}: {self.count}"
+
+
+class RegionLimitEvent(models.Model):
+    """
+    Hudud limitini tekshirish navbati: har bir skanerlash (yoki to'plam)
+    uchun bitta qator. process_region_limits worker'i hodisalarni hudud
+    bo'yicha birlashtirib bir marta tekshiradi va o'chiradi.
+    """
+
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name="+")
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.region_id} {self.year}/{self.month:02d}: +{self.count}"
+
+
+class RegionLimitState(models.Model):
+    """
+    Hudud limitining oxirgi ma'lum holati (oy bo'yicha) - ogohlantirish har
+    bir chegara kesib o'tilganda faqat bir marta yuboriladi.
+    """
+
+    class Level(models.IntegerChoices):
+        NORMAL = 0, "normal"
+        WARNING = 1, "warning"
+        CRITICAL = 2, "critical"
+
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name="+")
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField()
+    level = models.PositiveSmallIntegerField(
+        choices=Level.choices, default=Level.NORMAL
+    )
+    total_scans = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["region", "year", "month"], name="region_limit_state_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.region_id} {self.year}/{self.month:02d}: {self.get_level_display()}"
+
+
 class WasteMonthlyReport(models.Model):
     """Oylik chiqindi hisoboti"""
 
@@ -307,32 +422,10 @@ class WasteMonthlyReport(models.Model):
 
     @classmethod
     def generate_monthly_report(cls, region, year=None, month=None):
-        """Oylik hisobotni avtomatik yaratish"""
-        if not year:
-            year = timezone.now().year
-        if not month:
-            month = timezone.now().month
-
-        stats = region.get_monthly_waste_statistics(year, month)
-
-        report, created = cls.objects.get_or_create(
-            region=region,
-            year=year,
-            month=month,
-            defaults={
-                "total_scans": stats["total_scans"],
-                "total_homes": region.total_homes,
-                "total_members": region.total_active_members,
-                "limit_exceeded": stats["is_exceeded"],
-            },
-        )
-
-        if not created:
-            # Mavjud hisobotni yangilash
-            report.total_scans = stats["total_scans"]
-            report.total_homes = region.total_homes
-            report.total_members = region.total_active_members
-            report.limit_exceeded = stats["is_exceeded"]
-            report.save()
+        """Oylik hisobotni avtomatik yaratish (yoki yangilash)"""
+        from apps.home.services.monthly_reports import generate_reports
+        from apps.home.services.scan_counters import current_period
 
-        return report
+        year, month = current_period(year, month)
+        generate_reports([(year, month)], [region])
+        return cls.objects.get(region=region, year=year, month=month)
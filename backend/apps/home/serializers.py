@@ -123,6 +123,7 @@ class HomeReportSerializer(serializers.Serializer):
     total_ecopackets = serializers.IntegerField()
     monthly_ecopackets = serializers.IntegerField()
     region_warning = serializers.DictField()
+    region_rank = serializers.DictField()
     members = HomeMemberReportSerializer(many=True)
 
 
@@ -0,0 +1,125 @@
+"""
+Hudud bo'yicha uylar reytingi (oylik) - Redis sorted set.
+
+Kalit: (hudud, yil, oy), a'zo - home_id, ball - skanerlashlar soni.
+record() settlement tranzaksiyasi commit bo'lgandan keyin ZINCRBY qiladi
+(faqat kalit mavjud bo'lsa - Lua skript bilan atomar); kalit yo'q bo'lsa
+birinchi o'qishda HomeScanCounter'dan bitta so'rov bilan to'ldiriladi.
+Commit va ZINCRBY orasidagi qisqa oynada to'ldirish bo'lsa ball bittaga
+ortib ketishi mumkin - LEADERBOARD_TTL dan keyin kalit qayta to'ldiriladi.
+Redis ishlamasa reyting HomeScanCounter'dan hisoblanadi.
+"""
+
+from django.db import transaction
+
+from apps.ecopacket.services.lookup_cache import make_key, redis_run
+from apps.home.models import HomeScanCounter
+
+LEADERBOARD = "home_leaderboard"
+LEADERBOARD_TTL = 10 * 60
+
+_INCREMENT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('ZINCRBY', KEYS[1], ARGV[1], ARGV[2])
+end
+return nil
+"""
+
+
+def leaderboard_key(region_id, year, month):
+    return make_key(LEADERBOARD, f"{region_id}:{year}-{month:02d}")
+
+
+def record(region_id, home_id, count, year, month):
+    """Commit'dan keyin uy balliga count qo'shish"""
+    key = leaderboard_key(region_id, year, month)
+    transaction.on_commit(
+        lambda: redis_run(
+            lambda client: client.eval(_INCREMENT, 1, key, count, home_id)
+        )
+    )
+
+
+def _counters(region_id, year, month):
+    return HomeScanCounter.objects.filter(region_id=region_id, year=year, month=month)
+
+
+def _load(client, region_id, year, month):
+    """Kalit yo'q bo'lsa HomeScanCounter'dan to'ldirish"""
+    key = leaderboard_key(region_id, year, month)
+    if client.exists(key):
+        return key
+    scores = dict(
+        _counters(region_id, year, month)
+        .filter(count__gt=0)
+        .values_list("home_id", "count")
+    )
+    if scores:
+        pipe = client.pipeline()
+        pipe.zadd(key, scores)
+        pipe.expire(key, LEADERBOARD_TTL)
+        pipe.execute()
+    return key
+
+
+def top_homes(region_id, year, month, limit=10):
+    """
+    Eng ko'p skanerlagan uylar.
+
+    Returns:
+        list: [(home_id, count), ...] kamayish tartibida
+    """
+
+    def read(client):
+        key = _load(client, region_id, year, month)
+        return [
+            (int(home_id), int(score))
+            for home_id, score in client.zrevrange(key, 0, limit - 1, withscores=True)
+        ]
+
+    result = redis_run(read)
+    if result is None:
+        result = list(
+            _counters(region_id, year, month)
+            .filter(count__gt=0)
+            .order_by("-count", "home_id")
+            .values_list("home_id", "count")[:limit]
+        )
+    return result
+
+
+def home_rank(home, year, month):
+    """
+    Uyning hududdagi o'rni.
+
+    Returns:
+        {"rank": int | None, "count": int, "total_homes": int} - rank None:
+        uy shu oyda skanerlamagan yoki hududga biriktirilmagan
+    """
+    if not home.region_id:
+        return {"rank": None, "count": 0, "total_homes": 0}
+
+    def read(client):
+        key = _load(client, home.region_id, year, month)
+        pipe = client.pipeline()
+        pipe.zrevrank(key, home.pk)
+        pipe.zscore(key, home.pk)
+        pipe.zcard(key)
+        rank, score, total = pipe.execute()
+        return {
+            "rank": None if rank is None else rank + 1,
+            "count": int(score or 0),
+            "total_homes": total,
+        }
+
+    result = redis_run(read)
+    if result is not None:
+        return result
+
+    counters = _counters(home.region_id, year, month).filter(count__gt=0)
+    count = counters.filter(home=home).values_list("count", flat=True).first() or 0
+    return {
+        "rank": counters.filter(count__gt=count).count() + 1 if count else None,
+        "count": count,
+        "total_homes": counters.count(),
+    }
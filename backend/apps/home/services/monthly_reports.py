@@ -0,0 +1,129 @@
+"""
+Oylik hisobotlarni (WasteMonthlyReport) barcha hududlar uchun birdaniga
+yozish.
+
+Bir davr uchun: skanerlashlar HomeScanCounter'dan bitta GROUP BY, uylar va
+faol a'zolar soni ikkita aggregate so'rov (barcha davrlar uchun bir marta),
+hisobotlar bitta bulk_create(update_conflicts=True) upsert bilan yoziladi.
+Uylar va a'zolar soni - hisobot yozilgan paytdagi holat (avvalgidek).
+"""
+
+from django.db import transaction
+from django.db.models import Count
+
+from apps.home.models import Home, HomeMembership, Region, WasteMonthlyReport
+from apps.home.services.region_limits import region_totals
+
+
+def parse_period(value):
+    """
+    "2024-05" -> (2024, 5)
+
+    Raises:
+        ValueError: noto'g'ri format
+    """
+    year, _, month = value.partition("-")
+    year, month = int(year), int(month)
+    if not 1 <= month <= 12:
+        raise ValueError(f"Oy 1-12 orasida bo'lishi kerak: {value}")
+    return year, month
+
+
+def month_range(start, end):
+    """(yil, oy) dan (yil, oy) gacha barcha oylar (ikkalasi ham kiradi)"""
+    year, month = start
+    periods = []
+    while (year, month) <= end:
+        periods.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def region_metrics(region_ids):
+    """
+    Faol uylar va ulardagi faol a'zolar soni - ikkita GROUP BY so'rovi.
+
+    Returns:
+        dict: {region_id: (uylar, a'zolar)}
+    """
+    homes = dict(
+        Home.objects.filter(is_active=True, region_id__in=region_ids)
+        .values_list("region_id")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    members = dict(
+        HomeMembership.objects.filter(
+            home__is_active=True,
+            home__region_id__in=region_ids,
+            user__is_active=True,
+        )
+        .values_list("home__region_id")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    return {pk: (homes.get(pk, 0), members.get(pk, 0)) for pk in region_ids}
+
+
+def generate_reports(periods, regions=None, force=False):
+    """
+    Berilgan davrlar uchun hisobotlarni yaratish yoki yangilash.
+
+    Args:
+        periods: [(yil, oy), ...]
+        regions: Region queryset (standart - faol hududlar)
+        force: mavjud hisobotlar o'chirilib qaytadan yaratiladi
+
+    Returns:
+        (yaratilgan, yangilangan) hisobotlar soni
+    """
+    if regions is None:
+        regions = Region.objects.filter(is_active=True)
+    regions = list(regions)
+    region_ids = [region.pk for region in regions]
+    metrics = region_metrics(region_ids)
+
+    created = updated = 0
+    for year, month in periods:
+        totals = region_totals(year, month, region_ids)
+        reports = []
+        for region in regions:
+            total_homes, total_members = metrics[region.pk]
+            stats = region.build_statistics(
+                year, month, totals.get((region.pk, year, month), 0)
+            )
+            reports.append(
+                WasteMonthlyReport(
+                    region=region,
+                    year=year,
+                    month=month,
+                    total_scans=stats["total_scans"],
+                    total_homes=total_homes,
+                    total_members=total_members,
+                    limit_exceeded=stats["is_exceeded"],
+                )
+            )
+
+        existing = WasteMonthlyReport.objects.filter(
+            region_id__in=region_ids, year=year, month=month
+        )
+        with transaction.atomic():
+            if force:
+                existing.delete()
+                count = 0
+            else:
+                count = existing.count()
+            WasteMonthlyReport.objects.bulk_create(
+                reports,
+                update_conflicts=True,
+                unique_fields=["region", "year", "month"],
+                update_fields=[
+                    "total_scans",
+                    "total_homes",
+                    "total_members",
+                    "limit_exceeded",
+                ],
+            )
+        created += len(reports) - count
+        updated += count
+    return created, updated
@@ -0,0 +1,186 @@
+"""
+Hududlarning oylik limit holati - barcha hududlar uchun bir martada.
+
+Skanerlashlar soni HomeScanCounter jadvalidan (skanerlash -> a'zolik ->
+uy -> hudud bog'lanishi settlement paytida yozilgan) bitta GROUP BY bilan
+o'qiladi, shuning uchun so'rovlar soni hududlar soniga bog'liq emas:
+RegionHomesWarningView va check_all_regions_daily shu servisdan
+foydalanadi.
+
+Skanerlash so'rovi limitni tekshirmaydi - RegionLimitEvent navbatiga
+hodisa yozadi. process_events() (process_region_limits buyrug'i)
+navbatdagi hodisalarni (hudud, yil, oy) bo'yicha birlashtiradi, har bir
+hududni bir marta tekshiradi va RegionLimitState bilan solishtiradi:
+ogohlantirish faqat holat oshganda (normal -> warning -> critical) bir
+marta yuboriladi.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.home.models import (
+    HomeScanCounter,
+    Region,
+    RegionLimitEvent,
+    RegionLimitState,
+    WasteMonthlyReport,
+)
+from apps.home.services.scan_counters import current_period
+
+logger = logging.getLogger(__name__)
+
+EVENT_BATCH_SIZE = 5000
+
+WARNING_RATIO = 0.8
+CRITICAL_RATIO = 1.0
+
+NORMAL = RegionLimitState.Level.NORMAL.label
+WARNING = RegionLimitState.Level.WARNING.label
+CRITICAL = RegionLimitState.Level.CRITICAL.label
+LEVELS = {level.label: level.value for level in RegionLimitState.Level}
+
+
+def warning_level(stats):
+    """Statistika bo'yicha holat: normal, warning yoki critical"""
+    if stats["limit"] <= 0:
+        return NORMAL
+    usage_ratio = stats["total_scans"] / stats["limit"]
+    if usage_ratio >= CRITICAL_RATIO:
+        return CRITICAL
+    if usage_ratio >= WARNING_RATIO:
+        return WARNING
+    return NORMAL
+
+
+def region_totals(year=None, month=None, region_ids=None):
+    """
+    Faol uylar skanerlashlari (hudud, yil, oy) bo'yicha - bitta so'rov.
+    year / month berilmasa barcha davrlar.
+
+    Returns:
+        dict: {(region_id, year, month): jami}
+    """
+    counters = HomeScanCounter.objects.filter(home__is_active=True)
+    if year:
+        counters = counters.filter(year=year)
+    if month:
+        counters = counters.filter(month=month)
+    if region_ids is not None:
+        counters = counters.filter(region_id__in=region_ids)
+
+    rows = (
+        counters.values_list("region_id", "year", "month")
+        .annotate(total=Sum("count"))
+        .order_by()
+    )
+    return {(region_id, y, m): total for region_id, y, m, total in rows}
+
+
+def region_warnings(year=None, month=None, regions=None):
+    """
+    Hududlar statistikasi va ogohlantirish holati: hududlar + bitta
+    GROUP BY so'rovi.
+
+    Args:
+        regions: Region queryset (standart - faol hududlar)
+
+    Returns:
+        list: [{"region": Region, "stats": dict, "warning_level": str}, ...]
+    """
+    year, month = current_period(year, month)
+    if regions is None:
+        regions = Region.objects.filter(is_active=True)
+    regions = list(regions)
+
+    totals = region_totals(year, month, [region.pk for region in regions])
+    result = []
+    for region in regions:
+        stats = region.build_statistics(
+            year, month, totals.get((region.pk, year, month), 0)
+        )
+        result.append(
+            {"region": region, "stats": stats, "warning_level": warning_level(stats)}
+        )
+    return result
+
+
+def process_events(batch_size=EVENT_BATCH_SIZE):
+    """
+    Navbatdagi hodisalarni qayta ishlash. Bir nechta worker bir hodisani
+    olmaydi (skip_locked), holat qatorlari pk tartibida bloklanadi.
+
+    Returns:
+        (hodisalar soni, tekshirilgan hududlar soni, yuborilgan ogohlantirishlar)
+    """
+    from apps.home.signals import send_region_warning_notification
+
+    notifications = []
+    with transaction.atomic():
+        events = list(
+            RegionLimitEvent.objects.select_for_update(skip_locked=True)
+            .order_by("pk")
+            .values_list("pk", "region_id", "year", "month")[:batch_size]
+        )
+        if not events:
+            return 0, 0, 0
+        RegionLimitEvent.objects.filter(pk__in=[row[0] for row in events]).delete()
+
+        periods = {(region_id, year, month) for _, region_id, year, month in events}
+        RegionLimitState.objects.bulk_create(
+            [
+                RegionLimitState(region_id=region_id, year=year, month=month)
+                for region_id, year, month in periods
+            ],
+            ignore_conflicts=True,
+        )
+        region_ids = {region_id for region_id, _, _ in periods}
+        states = {
+            (state.region_id, state.year, state.month): state
+            for state in RegionLimitState.objects.select_for_update()
+            .filter(
+                region_id__in=region_ids,
+                year__in={year for _, year, _ in periods},
+                month__in={month for _, _, month in periods},
+            )
+            .order_by("pk")
+            if (state.region_id, state.year, state.month) in periods
+        }
+        regions = Region.objects.in_bulk(region_ids)
+
+        totals = {}
+        for year, month in {(year, month) for _, year, month in periods}:
+            totals.update(region_totals(year, month, region_ids))
+
+        changed = []
+        for key in sorted(periods):
+            region_id, year, month = key
+            region, state = regions.get(region_id), states[key]
+            if region is None or not region.is_active:
+                continue
+            stats = region.build_statistics(year, month, totals.get(key, 0))
+            level = LEVELS[warning_level(stats)]
+
+            if level > state.level:
+                notifications.append((region, stats, warning_level(stats)))
+                if level == RegionLimitState.Level.CRITICAL:
+                    logger.warning(
+                        f"KRITIK: {region.name} hududida oylik limit oshdi! "
+                        f"Joriy: {stats['total_scans']}/{stats['limit']}"
+                    )
+                    WasteMonthlyReport.generate_monthly_report(region, year, month)
+            # Limit oshirilsa holat pasayadi - keyingi kesishda yana xabar
+            state.level = level
+            state.total_scans = stats["total_scans"]
+            state.updated_at = timezone.now()
+            changed.append(state)
+
+        RegionLimitState.objects.bulk_update(
+            changed, ["level", "total_scans", "updated_at"]
+        )
+
+    for region, stats, level in notifications:
+        send_region_warning_notification(region, stats, level)
+    return len(events), len(changed), len(notifications)
@@ -0,0 +1,308 @@
+"""
+Foydalanuvchi, uy va hududlarning oylik skanerlash hisoblagichlari
+(UserScanCounter, HomeScanCounter).
+
+EcoPacket QR kod band qilinganda (settlement) foydalanuvchining (yil, oy)
+qatori va uning uyi uchun (hudud, uy, yil, oy) qatori INSERT ... ON CONFLICT
+so'rovlari bilan oshiriladi, hudud limitini tekshirish navbatiga
+(RegionLimitEvent) hodisa qo'shiladi va commit'dan keyin hudud reytingi
+(Redis sorted set) yangilanadi. Statistikalar a'zolar ro'yxati va katta
+user__id__in so'rovi o'rniga shu jadvaldan bitta indeksli so'rov bilan
+o'qiladi.
+
+Uy hisoblagichlari hozirgi a'zolik va faol foydalanuvchilar bo'yicha:
+a'zolik yaratilsa, o'chirilsa yoki uy almashsa (move_user_counts) va
+foydalanuvchi faolligi o'zgarsa (set_user_active) foydalanuvchining
+UserScanCounter oylari uylar o'rtasida ko'chiriladi. Tarix kerak bo'lsa
+rebuild() (rebuild_scan_counters buyrug'i) EcoPacketQrCode'lardan qayta
+hisoblaydi.
+"""
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractMonth, ExtractYear, Greatest
+from django.utils import timezone
+
+from apps.account.models import User
+from apps.ecopacket.models import EcoPacketQrCode
+from apps.ecopacket.services.lookup_cache import redis_delete
+from apps.home.models import (
+    Home,
+    HomeMembership,
+    HomeScanCounter,
+    RegionLimitEvent,
+    UserScanCounter,
+)
+from apps.home.services import leaderboard
+
+
+def current_period(year=None, month=None):
+    """(yil, oy) - berilmagani joriy mahalliy vaqtdan"""
+    now = timezone.localtime()
+    return year or now.year, month or now.month
+
+
+def record_scans(user_id, count, when=None):
+    """
+    Foydalanuvchi va uning uyi oylik hisoblagichlariga count qo'shish, limit
+    navbatiga hodisa yozish (hudud tekshiruvi worker'da) va reytingni
+    yangilash
+    """
+    if not user_id or not count:
+        return
+    local = timezone.localtime(when)
+
+    quote = connection.ops.quote_name
+    user_counter = quote(UserScanCounter._meta.db_table)
+    counter = quote(HomeScanCounter._meta.db_table)
+    event = quote(RegionLimitEvent._meta.db_table)
+    home = quote(Home._meta.db_table)
+    membership = quote(HomeMembership._meta.db_table)
+    user = quote(User._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {user_counter} (user_id, year, month, count) "
+            f"VALUES (%s, %s, %s, %s) "
+            f"ON CONFLICT (user_id, year, month) DO UPDATE SET "
+            f"count = {user_counter}.count + EXCLUDED.count",
+            [user_id, local.year, local.month, count],
+        )
+        cursor.execute(
+            f"INSERT INTO {counter} (region_id, home_id, year, month, count) "
+            f"SELECT h.region_id, h.id, %s, %s, %s "
+            f"FROM {membership} m JOIN {home} h ON h.id = m.home_id "
+            f"JOIN {user} u ON u.id = m.user_id "
+            f"WHERE m.user_id = %s AND h.region_id IS NOT NULL AND u.is_active = %s "
+            f"ON CONFLICT (region_id, year, month, home_id) DO UPDATE SET "
+            f"count = {counter}.count + EXCLUDED.count "
+            f"RETURNING region_id, home_id",
+            [local.year, local.month, count, user_id, True],
+        )
+        homes = cursor.fetchall()
+        if homes:
+            now = connection.ops.adapt_datetimefield_value(timezone.now())
+            cursor.execute(
+                f"INSERT INTO {event} (region_id, year, month, count, created_at) "
+                f"VALUES " + ", ".join(["(%s, %s, %s, %s, %s)"] * len(homes)),
+                [
+                    value
+                    for region_id, _ in homes
+                    for value in (region_id, local.year, local.month, count, now)
+                ],
+            )
+
+    for region_id, home_id in homes:
+        leaderboard.record(region_id, home_id, count, local.year, local.month)
+
+
+def _user_months(user_id):
+    return list(
+        UserScanCounter.objects.filter(user_id=user_id, count__gt=0).values_list(
+            "year", "month", "count"
+        )
+    )
+
+
+def _shift_home(home_id, region_id, months, add):
+    """Foydalanuvchi oylarini uy hisoblagichlariga qo'shish yoki ayirish"""
+    for year, month, count in months:
+        counters = HomeScanCounter.objects.filter(
+            home_id=home_id, year=year, month=month
+        )
+        if not add:
+            counters.update(count=Greatest(F("count") - count, 0))
+        elif not counters.update(count=F("count") + count):
+            HomeScanCounter.objects.create(
+                region_id=region_id,
+                home_id=home_id,
+                year=year,
+                month=month,
+                count=count,
+            )
+    # Qo'shilgan skanerlashlar limitdan oshirishi mumkin - worker tekshiradi
+    RegionLimitEvent.objects.bulk_create(
+        [
+            RegionLimitEvent(region_id=region_id, year=year, month=month, count=0)
+            for year, month, _ in months
+        ]
+    )
+    keys = [
+        leaderboard.leaderboard_key(region_id, year, month)
+        for year, month, _ in months
+    ]
+    transaction.on_commit(lambda: redis_delete(*keys))
+
+
+def set_user_active(user_id, active):
+    """
+    Foydalanuvchi faolligi o'zgarganda uning skanerlashlarini (UserScanCounter
+    bo'yicha) hozirgi uyi hisoblagichlaridan ayirish yoki qaytarish - hudud
+    va uy statistikasi faqat faol a'zolarni hisoblaydi.
+    """
+    home = (
+        HomeMembership.objects.filter(user_id=user_id, home__region__isnull=False)
+        .values_list("home_id", "home__region_id")
+        .first()
+    )
+    if home is None:
+        return
+    months = _user_months(user_id)
+    if not months:
+        return
+
+    with transaction.atomic():
+        _shift_home(*home, months, active)
+
+
+def move_user_counts(user_id, from_home_id=None, to_home_id=None):
+    """
+    A'zolik o'zgarganda (qo'shilish, chiqish, uy almashish) faol
+    foydalanuvchining skanerlashlarini eski uydan ayirib yangisiga qo'shish
+    """
+    if from_home_id == to_home_id:
+        return
+    if not User.objects.filter(pk=user_id, is_active=True).exists():
+        return
+    regions = dict(
+        Home.objects.filter(
+            pk__in=[from_home_id, to_home_id], region__isnull=False
+        ).values_list("pk", "region_id")
+    )
+    if not regions:
+        return
+    months = _user_months(user_id)
+    if not months:
+        return
+
+    with transaction.atomic():
+        if from_home_id in regions:
+            _shift_home(from_home_id, regions[from_home_id], months, False)
+        if to_home_id in regions:
+            _shift_home(to_home_id, regions[to_home_id], months, True)
+
+
+def user_counts(user_ids, year=None, month=None):
+    """
+    Foydalanuvchilarning umumiy va oylik skanerlashlari - bitta so'rov
+    (har bir foydalanuvchi uchun oylar soniga teng qator).
+
+    Returns:
+        dict: {user_id: (umumiy, oylik)} - skanerlamaganlar uchun (0, 0)
+    """
+    year, month = current_period(year, month)
+    rows = (
+        UserScanCounter.objects.filter(user_id__in=user_ids)
+        .values_list("user_id")
+        .annotate(
+            total=Sum("count"),
+            monthly=Sum("count", filter=Q(year=year, month=month)),
+        )
+        .order_by()
+    )
+    counts = {user_id: (0, 0) for user_id in user_ids}
+    counts.update(
+        {user_id: (total, monthly or 0) for user_id, total, monthly in rows}
+    )
+    return counts
+
+
+def monthly_counts(region_id=None, home_id=None, year=None, month=None):
+    """
+    Hudud (faol uylar) va uy bo'yicha oylik skanerlashlar - bitta so'rov.
+
+    Returns:
+        (region_total, home_total)
+    """
+    year, month = current_period(year, month)
+    region_q = Q(region_id=region_id, home__is_active=True)
+    home_q = Q(home_id=home_id)
+    condition = Q()
+    if region_id:
+        condition |= region_q
+    if home_id:
+        condition |= home_q
+    if not condition:
+        return 0, 0
+
+    totals = HomeScanCounter.objects.filter(
+        condition, year=year, month=month
+    ).aggregate(
+        region=Sum("count", filter=region_q),
+        home=Sum("count", filter=home_q),
+    )
+    return totals["region"] or 0, totals["home"] or 0
+
+
+def rebuild(year=None, month=None):
+    """
+    Hisoblagichlarni EcoPacketQrCode'lardan qayta yozish (uylar - hozirgi
+    a'zolik bo'yicha, faqat faol foydalanuvchilar). year/month berilsa faqat shu davr.
+
+    Returns:
+        int: yozilgan qatorlar soni
+    """
+    scans = EcoPacketQrCode.objects.filter(scannered_at__isnull=False)
+    counters = HomeScanCounter.objects.all()
+    user_counters = UserScanCounter.objects.all()
+    if year:
+        scans = scans.filter(scannered_at__year=year)
+        counters = counters.filter(year=year)
+        user_counters = user_counters.filter(year=year)
+    if month:
+        scans = scans.filter(scannered_at__month=month)
+        counters = counters.filter(month=month)
+        user_counters = user_counters.filter(month=month)
+    scans = scans.annotate(
+        scan_year=ExtractYear("scannered_at"),
+        scan_month=ExtractMonth("scannered_at"),
+    )
+
+    home_rows = (
+        scans.filter(
+            user__is_active=True,
+            user__home_membership__home__region__isnull=False,
+        )
+        .values(
+            region=F("user__home_membership__home__region"),
+            home=F("user__home_membership__home"),
+            year=F("scan_year"),
+            month=F("scan_month"),
+        )
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    user_rows = (
+        scans.filter(user__isnull=False)
+        .values("user", year=F("scan_year"), month=F("scan_month"))
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    with transaction.atomic():
+        counters.delete()
+        user_counters.delete()
+        created = HomeScanCounter.objects.bulk_create(
+            (
+                HomeScanCounter(
+                    region_id=row["region"],
+                    home_id=row["home"],
+                    year=row["year"],
+                    month=row["month"],
+                    count=row["count"],
+                )
+                for row in home_rows.iterator(chunk_size=5000)
+            ),
+            batch_size=5000,
+        )
+        created_users = UserScanCounter.objects.bulk_create(
+            (
+                UserScanCounter(
+                    user_id=row["user"],
+                    year=row["year"],
+                    month=row["month"],
+                    count=row["count"],
+                )
+                for row in user_rows.iterator(chunk_size=5000)
+            ),
+            batch_size=5000,
+        )
+    return len(created) + len(created_users)
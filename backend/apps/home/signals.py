@@ -1,12 +1,16 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
 import logging
 
+from apps.account.models import User
 from apps.ecopacket.models import EcoPacketQrCode
-from .models import Region, WasteMonthlyReport, Home
+from .models import Home, HomeMembership
+from .services.monthly_reports import generate_reports
+from .services.region_limits import CRITICAL, WARNING, region_warnings
+from .services.scan_counters import move_user_counts, record_scans, set_user_active
 
 logger = logging.getLogger(__name__)
 
@@ -14,55 +18,69 @@ logger = logging.getLogger(__name__)
 @receiver(post_save, sender=EcoPacketQrCode)
 def check_region_limits_on_scan(sender, instance, created, **kwargs):
     """
-    EcoPacket skanerlanganda hudud limitlarini tekshirish va
-    kerak bo'lsa ogohlantirish yuborish
+    Skanerlangan holda yaratilgan EcoPacket (settlement'dan tashqari) uyning
+    hisoblagichiga qo'shiladi va limit navbatiga hodisa yoziladi. Limitni
+    tekshirish va ogohlantirish process_region_limits worker'ida.
     """
-    print("EcoPacketQrCode signali yuklandi")
-    if not created or not instance.scannered_at or not instance.user:
+    if not created or not instance.scannered_at or not instance.user_id:
         return
 
-    try:
-        # Foydalanuvchining uyini topish
-        membership = instance.user.home_membership
-        if not membership or not membership.home.region:
-            return
+    record_scans(instance.user_id, 1, instance.scannered_at)
 
-        region = membership.home.region
-        home = membership.home
 
-        # Joriy oy statistikasini olish
-        current_stats = region.get_monthly_waste_statistics()
+@receiver(pre_save, sender=User)
+def remember_user_active(sender, instance, raw=False, update_fields=None, **kwargs):
+    # last_login va h.k. saqlashda qo'shimcha so'rov yo'q
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and "is_active" not in update_fields:
+        return
+    instance._was_active = (
+        User.objects.filter(pk=instance.pk).values_list("is_active", flat=True).first()
+    )
 
-        # Ogohlantirish chegaralarini aniqlash
-        warning_threshold = 0.8  # 80%
-        critical_threshold = 1.0  # 100%
 
-        usage_ratio = (
-            current_stats["total_scans"] / current_stats["limit"]
-            if current_stats["limit"] > 0
-            else 0
-        )
+@receiver(post_save, sender=User)
+def update_scan_counters_on_active_change(sender, instance, created, **kwargs):
+    """
+    Faolsizlantirilgan foydalanuvchining skanerlashlari uy va hudud
+    hisoblagichlaridan ayiriladi, qayta faollashtirilsa qaytariladi
+    """
+    was_active = instance.__dict__.pop("_was_active", None)
+    if created or was_active is None or was_active == instance.is_active:
+        return
+    set_user_active(instance.pk, instance.is_active)
 
-        # Ogohlantirish yoki kritik holat
-        if usage_ratio >= critical_threshold:
-            # Kritik holat - limit oshdi
-            logger.warning(
-                f"KRITIK: {region.name} hududida oylik limit oshdi! "
-                f"Joriy: {current_stats['total_scans']}/{current_stats['limit']}"
-            )
 
-            # Oylik hisobotni yangilash
-            WasteMonthlyReport.generate_monthly_report(region)
+@receiver(pre_save, sender=HomeMembership)
+def remember_previous_home(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._previous_home_id = (
+        HomeMembership.objects.filter(pk=instance.pk)
+        .values_list("home_id", flat=True)
+        .first()
+    )
 
-        elif usage_ratio >= warning_threshold:
-            # Ogohlantirish - 80% ga yetdi
-            logger.info(
-                f"OGOHLANTIRISH: {region.name} hududida oylik limit {usage_ratio*100:.1f}% ga yetdi! "
-                f"Joriy: {current_stats['total_scans']}/{current_stats['limit']}"
-            )
 
-    except Exception as e:
-        logger.error(f"Hudud limitini tekshirishda xatolik: {str(e)}")
+@receiver(post_save, sender=HomeMembership)
+def move_scan_counters_on_join(sender, instance, created, raw=False, **kwargs):
+    """
+    Uyga qo'shilgan yoki uy almashgan foydalanuvchining skanerlashlari yangi
+    uy (va hudud) hisoblagichlariga ko'chiriladi
+    """
+    previous = instance.__dict__.pop("_previous_home_id", None)
+    if raw:
+        return
+    if created:
+        move_user_counts(instance.user_id, to_home_id=instance.home_id)
+    elif previous is not None:
+        move_user_counts(instance.user_id, previous, instance.home_id)
+
+
+@receiver(post_delete, sender=HomeMembership)
+def move_scan_counters_on_leave(sender, instance, **kwargs):
+    move_user_counts(instance.user_id, from_home_id=instance.home_id)
 
 
 def send_region_warning_notification(region, stats, warning_type="warning"):
@@ -133,13 +151,10 @@ def generate_daily_reports():
     Kunlik avtomatik hisobotlar yaratish (cron job uchun)
     """
     try:
-        now = timezone.now()
-        regions = Region.objects.filter(is_active=True)
-
-        for region in regions:
-            WasteMonthlyReport.generate_monthly_report(region, now.year, now.month)
+        now = timezone.localtime()
+        created, updated = generate_reports([(now.year, now.month)])
 
-        logger.info(f"Kunlik hisobotlar yaratildi: {regions.count()} ta hudud")
+        logger.info(f"Kunlik hisobotlar yaratildi: {created + updated} ta hudud")
 
     except Exception as e:
         logger.error(f"Kunlik hisobotlar yaratishda xatolik: {str(e)}")
@@ -150,22 +165,21 @@ def check_all_regions_daily():
     Barcha hududlarni kunlik tekshirish
     """
     try:
-        regions = Region.objects.filter(is_active=True)
         warning_count = 0
         critical_count = 0
 
-        for region in regions:
-            stats = region.get_monthly_waste_statistics()
-            usage_ratio = (
-                stats["total_scans"] / stats["limit"] if stats["limit"] > 0 else 0
-            )
-
-            if usage_ratio >= 1.0:
+        # Barcha hududlar bitta GROUP BY so'rovi bilan
+        for item in region_warnings():
+            if item["warning_level"] == CRITICAL:
                 critical_count += 1
-                send_region_warning_notification(region, stats, "critical")
-            elif usage_ratio >= 0.8:
+                send_region_warning_notification(
+                    item["region"], item["stats"], "critical"
+                )
+            elif item["warning_level"] == WARNING:
                 warning_count += 1
-                send_region_warning_notification(region, stats, "warning")
+                send_region_warning_notification(
+                    item["region"], item["stats"], "warning"
+                )
 
         logger.info(
             f"Kunlik tekshirish tugadi: {critical_count} kritik, {warning_count} ogohlantirish"
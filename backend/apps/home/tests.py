@@ -1,10 +1,33 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from .models import Home, HomeMembership
-from apps.ecopacket.models import EcoPacketQrCode
+from .models import (
+    Home,
+    HomeMembership,
+    HomeScanCounter,
+    Region,
+    RegionLimitEvent,
+    RegionLimitState,
+    UserScanCounter,
+    WasteMonthlyReport,
+)
+from .services.monthly_reports import generate_reports
+from .services.region_limits import process_events, region_warnings
+from .services.leaderboard import home_rank
+from .services.scan_counters import (
+    current_period,
+    monthly_counts,
+    rebuild,
+    user_counts,
+)
+from apps.ecopacket.models import Box, EcoPacketQrCode, LifeCycle
+from apps.ecopacket.services.lookup_cache import get_scan_box
+from apps.ecopacket.services.settlement import settle_ecopacket_batch
 from apps.packet.models import Category
 
 User = get_user_model()
@@ -261,3 +284,213 @@ class HomeAPITest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("yagona adminisiz", response.data["error"])
+
+
+class HomeScanCounterTest(TestCase):
+    """Oylik skanerlash hisoblagichlari (HomeScanCounter)"""
+
+    def setUp(self):
+        self.region = Region.objects.create(
+            name="Chilonzor", code="TAS-01", monthly_waste_limit=5
+        )
+        self.user = User.objects.create_user(
+            phone_number="998901234567", first_name="Test"
+        )
+        self.home = Home.objects.create(
+            name="Test Home", owner=self.user, region=self.region
+        )
+        HomeMembership.objects.create(home=self.home, user=self.user, is_admin=True)
+
+        category = Category.objects.create(name="Plastik", summa=150)
+        box = Box.objects.create(name="Fandomat", sim_module="SIM001")
+        LifeCycle.objects.create(box=box)
+        self.box = get_scan_box("SIM001")
+        for code in ("ECO001", "ECO002", "ECO003"):
+            EcoPacketQrCode.objects.create(qr_code=code, category=category)
+
+    def test_settlement_increments_counter(self):
+        settle_ecopacket_batch(self.box, self.user, ["ECO001", "ECO002"])
+        settle_ecopacket_batch(self.box, self.user, ["ECO002", "ECO003"])
+
+        self.assertEqual(monthly_counts(self.region.pk, self.home.pk), (3, 3))
+        self.assertEqual(self.home.get_monthly_waste_count(), 3)
+
+        region = Region.objects.with_current_scans().get(pk=self.region.pk)
+        with self.assertNumQueries(0):
+            statistics = region.get_monthly_waste_statistics()
+        self.assertEqual(statistics["total_scans"], 3)
+        self.assertEqual(statistics["remaining"], 2)
+
+    def test_rebuild_matches_counters(self):
+        settle_ecopacket_batch(self.box, self.user, ["ECO001", "ECO002", "ECO003"])
+        HomeScanCounter.objects.update(count=0)
+        UserScanCounter.objects.update(count=0)
+
+        # Uy va foydalanuvchi hisoblagichlari
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(monthly_counts(self.region.pk, self.home.pk), (3, 3))
+        self.assertEqual(user_counts([self.user.pk]), {self.user.pk: (3, 3)})
+
+
+    def test_limit_events_notify_once_per_crossing(self):
+        Region.objects.filter(pk=self.region.pk).update(monthly_waste_limit=2)
+
+        settle_ecopacket_batch(self.box, self.user, ["ECO001"])
+        self.assertEqual(RegionLimitEvent.objects.count(), 1)
+        self.assertEqual(process_events(), (1, 1, 0))
+
+        settle_ecopacket_batch(self.box, self.user, ["ECO002"])
+        settle_ecopacket_batch(self.box, self.user, ["ECO003"])
+        # Ikkala hodisa bitta tekshiruvga birlashadi
+        self.assertEqual(process_events(), (2, 1, 1))
+        self.assertEqual(process_events(), (0, 0, 0))
+
+        state = RegionLimitState.objects.get(region=self.region)
+        self.assertEqual(state.level, RegionLimitState.Level.CRITICAL)
+        self.assertEqual(state.total_scans, 3)
+        self.assertTrue(
+            WasteMonthlyReport.objects.filter(
+                region=self.region, limit_exceeded=True
+            ).exists()
+        )
+
+
+    def test_home_report_served_from_counters(self):
+        year, month = current_period()
+        other = Home.objects.create(name="Other", owner=self.user, region=self.region)
+        HomeScanCounter.objects.create(
+            region=self.region, home=other, year=year, month=month, count=5
+        )
+        settle_ecopacket_batch(self.box, self.user, ["ECO001", "ECO002"])
+
+        self.assertEqual(
+            home_rank(self.home, year, month),
+            {"rank": 2, "count": 2, "total_homes": 2},
+        )
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get(reverse("home:home-report"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_ecopackets"], 2)
+        self.assertEqual(response.data["monthly_ecopackets"], 2)
+        self.assertEqual(response.data["members"][0]["ecopacket_count"], 2)
+        self.assertEqual(response.data["region_rank"]["rank"], 2)
+        self.assertEqual(self.home.total_ecopackets, 2)
+
+
+    def test_inactive_members_are_not_counted(self):
+        settle_ecopacket_batch(self.box, self.user, ["ECO001", "ECO002"])
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(monthly_counts(self.region.pk, self.home.pk), (0, 0))
+        # Faolsiz foydalanuvchining skanerlashi uy hisoblagichiga qo'shilmaydi
+        settle_ecopacket_batch(self.box, self.user, ["ECO003"])
+        self.assertEqual(monthly_counts(self.region.pk, self.home.pk), (0, 0))
+
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(monthly_counts(self.region.pk, self.home.pk), (3, 3))
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(monthly_counts(self.region.pk, self.home.pk), (3, 3))
+
+    def test_membership_changes_move_counts(self):
+        settle_ecopacket_batch(self.box, self.user, ["ECO001", "ECO002"])
+        other = Home.objects.create(
+            name="Other Home", owner=self.user, region=self.region
+        )
+
+        membership = HomeMembership.objects.get(user=self.user)
+        membership.home = other
+        membership.save()
+        self.assertEqual(monthly_counts(self.region.pk, self.home.pk), (2, 0))
+        self.assertEqual(monthly_counts(self.region.pk, other.pk), (2, 2))
+
+        membership.delete()
+        self.assertEqual(monthly_counts(self.region.pk, other.pk), (0, 0))
+
+        HomeMembership.objects.create(home=self.home, user=self.user)
+        self.assertEqual(monthly_counts(self.region.pk, self.home.pk), (2, 2))
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(monthly_counts(self.region.pk, self.home.pk), (2, 2))
+
+    def test_leaderboard_params(self):
+        settle_ecopacket_batch(self.box, self.user, ["ECO001"])
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        url = reverse("home:region-leaderboard", args=[self.region.pk])
+
+        for query in ("limit=abc", "year=x", "month=13"):
+            response = client.get(f"{url}?{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        for query in ("limit=-5", "limit=0"):
+            response = client.get(f"{url}?{query}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["homes"]), 1)
+
+
+class RegionWarningsTest(TestCase):
+    """Barcha hududlar limit holati - bitta GROUP BY"""
+
+    def test_levels_with_constant_queries(self):
+        year, month = current_period()
+        owner = User.objects.create_user(
+            phone_number="998901234567", first_name="Test"
+        )
+        for index, count in enumerate([1, 8, 12]):
+            region = Region.objects.create(
+                name=f"Hudud {index}", code=f"TAS-0{index}", monthly_waste_limit=10
+            )
+            home = Home.objects.create(name=f"Uy {index}", owner=owner, region=region)
+            HomeScanCounter.objects.create(
+                region=region, home=home, year=year, month=month, count=count
+            )
+
+        with self.assertNumQueries(2):
+            warnings = region_warnings()
+
+        self.assertEqual(
+            [(item["region"].name, item["warning_level"]) for item in warnings],
+            [("Hudud 0", "normal"), ("Hudud 1", "warning"), ("Hudud 2", "critical")],
+        )
+        self.assertEqual(warnings[1]["stats"]["remaining"], 2)
+
+    def test_generate_reports_upserts_all_regions(self):
+        year, month = current_period()
+        owner = User.objects.create_user(
+            phone_number="998901234567", first_name="Test"
+        )
+        regions = []
+        for index in range(3):
+            region = Region.objects.create(
+                name=f"Hudud {index}", code=f"TAS-0{index}", monthly_waste_limit=10
+            )
+            home = Home.objects.create(name=f"Uy {index}", owner=owner, region=region)
+            HomeScanCounter.objects.create(
+                region=region, home=home, year=year, month=month, count=5 * index
+            )
+            regions.append(region)
+        HomeMembership.objects.create(home=home, user=owner)
+
+        self.assertEqual(generate_reports([(year, month)]), (3, 0))
+        HomeScanCounter.objects.filter(region=regions[0]).update(count=11)
+        call_command(
+            "generate_monthly_reports",
+            "--from", f"{year}-{month:02d}",
+            "--to", f"{year}-{month:02d}",
+            stdout=StringIO(),
+        )
+
+        reports = {
+            report.region_id: report
+            for report in WasteMonthlyReport.objects.filter(year=year, month=month)
+        }
+        self.assertEqual(len(reports), 3)
+        self.assertEqual(reports[regions[0].pk].total_scans, 11)
+        self.assertTrue(reports[regions[0].pk].limit_exceeded)
+        self.assertFalse(reports[regions[1].pk].limit_exceeded)
+        self.assertEqual(reports[regions[2].pk].total_members, 1)
+        self.assertEqual(reports[regions[2].pk].total_homes, 1)
@@ -2,9 +2,7 @@ from rest_framework import generics, status, permissions, viewsets
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Count, Q
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 
 from .models import Home, HomeMembership, Region, WasteMonthlyReport
 from .serializers import (
@@ -20,7 +18,9 @@ from .serializers import (
     WasteMonthlyReportSerializer,
     HomeWarningSerializer,
 )
-from apps.ecopacket.models import EcoPacketQrCode
+from .services.leaderboard import home_rank, top_homes
+from .services.region_limits import region_warnings
+from .services.scan_counters import current_period, user_counts
 
 
 class RegionViewSet(viewsets.ReadOnlyModelViewSet):
@@ -36,7 +36,9 @@ class RegionViewSet(viewsets.ReadOnlyModelViewSet):
         return RegionSerializer
 
     def get_queryset(self):
-        return Region.objects.filter(is_active=True).order_by("name")
+        return (
+            Region.objects.filter(is_active=True).with_current_scans().order_by("name")
+        )
 
     @action(detail=True, methods=["get"])
     def monthly_stats(self, request, pk=None):
@@ -53,6 +55,46 @@ class RegionViewSet(viewsets.ReadOnlyModelViewSet):
         stats = region.get_monthly_waste_statistics(year, month)
         return Response(stats)
 
+    @action(detail=True, methods=["get"])
+    def leaderboard(self, request, pk=None):
+        """Hududdagi uylar reytingi (oylik skanerlashlar bo'yicha)"""
+        region = self.get_object()
+        params = request.query_params
+        try:
+            year = int(params["year"]) if params.get("year") else None
+            month = int(params["month"]) if params.get("month") else None
+            limit = max(1, min(int(params.get("limit") or 10), 100))
+        except ValueError:
+            return Response(
+                {"error": "year, month va limit butun son bo'lishi kerak"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if month is not None and not 1 <= month <= 12:
+            return Response(
+                {"error": "Oy 1-12 orasida bo'lishi kerak"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        year, month = current_period(year, month)
+
+        ranking = top_homes(region.pk, year, month, limit)
+        homes = Home.objects.in_bulk([home_id for home_id, _ in ranking])
+        return Response(
+            {
+                "year": year,
+                "month": month,
+                "homes": [
+                    {
+                        "rank": rank,
+                        "home_id": home_id,
+                        "home_name": homes[home_id].name,
+                        "count": count,
+                    }
+                    for rank, (home_id, count) in enumerate(ranking, start=1)
+                    if home_id in homes
+                ],
+            }
+        )
+
     @action(detail=True, methods=["post"])
     def generate_report(self, request, pk=None):
         """Hudud uchun oylik hisobot yaratish"""
@@ -93,41 +135,32 @@ class HomeReportView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        # Get current month for statistics
-        now = timezone.now()
-
-        # Get all members of the home with ecopacket counts
-        members_data = (
-            HomeMembership.objects.filter(home=home)
-            .select_related("user", "home")
-            .annotate(
-                ecopacket_count=Count(
-                    "user__ecopacketqrcode",
-                    filter=Q(user__ecopacketqrcode__scannered_at__isnull=False),
-                ),
-                monthly_ecopacket_count=Count(
-                    "user__ecopacketqrcode",
-                    filter=Q(
-                        user__ecopacketqrcode__scannered_at__year=now.year,
-                        user__ecopacketqrcode__scannered_at__month=now.month,
-                        user__ecopacketqrcode__scannered_at__isnull=False,
-                    ),
-                ),
+        # A'zolar va ularning hisoblagichlari (skanerlash tarixi o'qilmaydi)
+        year, month = current_period()
+        memberships = list(
+            HomeMembership.objects.filter(home=home).select_related("user")
+        )
+        counts = user_counts([member.user_id for member in memberships], year, month)
+        memberships.sort(
+            key=lambda member: (
+                -counts[member.user_id][1],
+                -counts[member.user_id][0],
+                member.joined_at,
             )
-            .order_by("-monthly_ecopacket_count", "-ecopacket_count", "joined_at")
         )
 
         # Prepare members list
         members_list = []
-        for member_data in members_data:
+        for member_data in memberships:
+            total, monthly = counts[member_data.user_id]
             member_info = {
                 "user_id": member_data.user.id,
                 "username": member_data.user.phone_number,  # Using phone as username
                 "first_name": member_data.user.first_name,
                 "last_name": member_data.user.last_name,
                 "phone_number": member_data.user.phone_number,
-                "ecopacket_count": member_data.ecopacket_count,
-                "monthly_ecopacket_count": member_data.monthly_ecopacket_count,
+                "ecopacket_count": total,
+                "monthly_ecopacket_count": monthly,
                 "joined_at": member_data.joined_at,
                 "is_admin": member_data.is_admin,
             }
@@ -149,6 +182,7 @@ class HomeReportView(APIView):
                 member["monthly_ecopacket_count"] for member in members_list
             ),
             "region_warning": region_warning,
+            "region_rank": home_rank(home, year, month),
             "members": members_list,
         }
 
@@ -241,30 +275,16 @@ class RegionHomesWarningView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        regions = Region.objects.filter(is_active=True)
-        warnings = []
-
-        for region in regions:
-            stats = region.get_monthly_waste_statistics()
-            usage_ratio = (
-                stats["total_scans"] / stats["limit"] if stats["limit"] > 0 else 0
-            )
-
-            warning_level = "normal"
-            if usage_ratio >= 1.0:
-                warning_level = "critical"
-            elif usage_ratio >= 0.8:
-                warning_level = "warning"
-
-            warnings.append(
-                {
-                    "region_id": region.id,
-                    "region_name": region.name,
-                    "region_code": region.code,
-                    "warning_level": warning_level,
-                    "stats": stats,
-                }
-            )
+        warnings = [
+            {
+                "region_id": item["region"].id,
+                "region_name": item["region"].name,
+                "region_code": item["region"].code,
+                "warning_level": item["warning_level"],
+                "stats": item["stats"],
+            }
+            for item in region_warnings()
+        ]
 
         return Response(warnings)
 
@@ -373,19 +393,7 @@ def my_home_status(request):
             user=request.user
         )
 
-        # Current month ecopacket count
-        now = timezone.now()
-        user_monthly_ecopacket_count = EcoPacketQrCode.objects.filter(
-            user=request.user,
-            scannered_at__year=now.year,
-            scannered_at__month=now.month,
-            scannered_at__isnull=False,
-        ).count()
-
-        # Total ecopacket count
-        user_total_ecopacket_count = EcoPacketQrCode.objects.filter(
-            user=request.user, scannered_at__isnull=False
-        ).count()
+        total, monthly = user_counts([request.user.pk])[request.user.pk]
 
         # Region warning
         region_warning = membership.home.check_region_limit_warning()
@@ -400,8 +408,8 @@ def my_home_status(request):
                 "region_code": membership.home.region.code,
                 "is_admin": membership.is_admin,
                 "joined_at": membership.joined_at,
-                "my_monthly_ecopacket_count": user_monthly_ecopacket_count,
-                "my_total_ecopacket_count": user_total_ecopacket_count,
+                "my_monthly_ecopacket_count": monthly,
+                "my_total_ecopacket_count": total,
                 "region_warning": region_warning,
                 "invitation_code": (
                     membership.home.invitation_code if membership.is_admin else None
@@ -410,24 +418,12 @@ def my_home_status(request):
         )
 
     except HomeMembership.DoesNotExist:
-        # Current month ecopacket count
-        now = timezone.now()
-        user_monthly_ecopacket_count = EcoPacketQrCode.objects.filter(
-            user=request.user,
-            scannered_at__year=now.year,
-            scannered_at__month=now.month,
-            scannered_at__isnull=False,
-        ).count()
-
-        # Total ecopacket count
-        user_total_ecopacket_count = EcoPacketQrCode.objects.filter(
-            user=request.user, scannered_at__isnull=False
-        ).count()
+        total, monthly = user_counts([request.user.pk])[request.user.pk]
 
         return Response(
             {
                 "has_home": False,
-                "my_monthly_ecopacket_count": user_monthly_ecopacket_count,
-                "my_total_ecopacket_count": user_total_ecopacket_count,
+                "my_monthly_ecopacket_count": monthly,
+                "my_total_ecopacket_count": total,
             }
         )
@@ -1,17 +1,27 @@
 # your_app/management/commands/copy_packets.py
 
+from itertools import islice
+
 from django.core.management.base import BaseCommand
 from apps.packet.models import Packet
 from apps.ecopacket.models import EcoPacketQrCode
+from apps.ecopacket.services.resolver import invalidate_checked_codes
+
+BATCH_SIZE = 1000
+
 
 class Command(BaseCommand):
     help = 'Copy all data from Packet model to EcoPacketQrCode model'
 
     def handle(self, *args, **kwargs):
-        packets = Packet.objects.all()
-        for packet in packets:
-            EcoPacketQrCode.objects.create(
-                qr_code=packet.qr_code,
-                category=packet.category,
-            )
+        packets = Packet.objects.exclude(qr_code="").only("qr_code", "category_id")
+        rows = (
+            EcoPacketQrCode(qr_code=packet.qr_code, category_id=packet.category_id)
+            for packet in packets.iterator(chunk_size=BATCH_SIZE)
+        )
+        while batch := list(islice(rows, BATCH_SIZE)):
+            # qr_code unique - allaqachon ko'chirilganlari o'tkazib yuboriladi
+            EcoPacketQrCode.objects.bulk_create(batch, ignore_conflicts=True)
+            # bulk_create post_save bermaydi - /check/ keshidagi "topilmadi"
+            invalidate_checked_codes([qr.qr_code for qr in batch])
         self.stdout.write(self.style.SUCCESS('Successfully copied all data from Packet to EcoPacketQrCode'))
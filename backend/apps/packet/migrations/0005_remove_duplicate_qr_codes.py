@@ -0,0 +1,56 @@
+# Generated manually to fix duplicate qr_codes before adding unique constraint
+from django.db import migrations
+from django.db.models import Count
+
+
+def remove_duplicate_qr_codes(apps, schema_editor):
+    """
+    Dublikat qr_code'larni tozalash (bo'sh qr_code'lar bundan mustasno).
+    Har bir qr_code uchun bitta yozuv saqlanadi (avval skanerlangani, bo'lmasa
+    birinchisi). Skanerlanmagan dublikatlar o'chiriladi, skanerlangan
+    dublikatlar tarix saqlanishi uchun "<qr_code>-<id>" ga qayta nomlanadi.
+    """
+    Packet = apps.get_model("packet", "Packet")
+
+    duplicates = (
+        Packet.objects.exclude(qr_code="")
+        .values("qr_code")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("qr_code", flat=True)
+    )
+
+    to_delete = []
+    renamed = 0
+    for qr_code in duplicates.iterator():
+        rows = list(
+            Packet.objects.filter(qr_code=qr_code).values_list("id", "scannered_at")
+        )
+        # Skanerlanganlari oldinda, birinchisi saqlanadi
+        rows.sort(key=lambda row: (row[1] is None, row[0]))
+        for pk, scannered_at in rows[1:]:
+            if scannered_at is None:
+                to_delete.append(pk)
+            else:
+                Packet.objects.filter(pk=pk).update(qr_code=f"{qr_code}-{pk}"[:50])
+                renamed += 1
+
+    if to_delete:
+        Packet.objects.filter(id__in=to_delete).delete()
+    if to_delete or renamed:
+        print(
+            f"Deleted {len(to_delete)} duplicate qr_codes, renamed {renamed} scanned duplicates"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("packet", "0004_alter_category_filter_type"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_qr_codes, reverse_code=migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packet', '0005_remove_duplicate_qr_codes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='packet',
+            constraint=models.UniqueConstraint(condition=models.Q(('qr_code', ''), _negated=True), fields=('qr_code',), name='packet_qr_code_uniq'),
+        ),
+    ]
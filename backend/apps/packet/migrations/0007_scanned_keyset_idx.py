@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packet', '0006_packet_packet_qr_code_uniq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='packet',
+            index=models.Index(condition=models.Q(('scannered_at__isnull', False)), fields=['-scannered_at', '-id'], name='packet_scanned_keyset_idx'),
+        ),
+    ]
@@ -49,5 +49,23 @@ class Packet(models.Model):
     scannered_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # Bo'sh qr_code'lar cheklovga kirmaydi
+            models.UniqueConstraint(
+                fields=["qr_code"],
+                condition=~models.Q(qr_code=""),
+                name="packet_qr_code_uniq",
+            ),
+        ]
+        indexes = [
+            # Skanerlangan paketlar ro'yxati (keyset sahifalash)
+            models.Index(
+                fields=["-scannered_at", "-id"],
+                condition=models.Q(scannered_at__isnull=False),
+                name="packet_scanned_keyset_idx",
+            ),
+        ]
+
     # def __str__(self) -> str:
     #     return f"{self.id} {self.category.name}"
@@ -8,6 +8,7 @@ from rest_framework import authentication
 from django.utils import timezone
 from .models import Packet, Category
 from apps.bank.models import Earning
+from apps.bank.services.ledger import credit_accounts
 from apps.ecopacket.models import Box, LifeCycle
 from rest_framework import viewsets, generics
 from .serializers import (
@@ -21,7 +22,7 @@ from apps.utils.pagination import MyPagination
 from django_filters import rest_framework as filters
 from rest_framework import filters as rf_filters
 from rest_framework.pagination import LimitOffsetPagination
-from django.db import connection, reset_queries
+from django.db import connection, reset_queries, transaction
 
 reset_queries()
 
@@ -60,32 +61,36 @@ class EmployeeQrCodeScanerView(APIView):
         # Extract the data from the request
         qr_code = request.data["qr_code"]
         employer = request.user
-        box_qr_code = Box.objects.filter(qr_code=qr_code)
+        box = (
+            Box.objects.select_related("current_lifecycle", "category")
+            .filter(qr_code=qr_code)
+            .first()
+        )
         packet_qr_code = Packet.objects.filter(qr_code=qr_code)
         bank_account = employer.bankaccount
         # for ecopacket box
-        if box_qr_code.first() is not None:
-            box = box_qr_code.first()
-            last_lifecycle = box.lifecycle.last()
-            filled = last_lifecycle.state
+        if box is not None:
+            last_lifecycle = box.current_lifecycle
+            filled = box.state
             cat = box.category
 
             if filled > 80 and cat in employer.categories.all():
-                last_lifecycle.employee = employer
-                last_lifecycle.filled_at = timezone.now()
-                last_lifecycle.save()
-                LifeCycle.objects.create(box=box)
-                money = box.category.summa * filled / 100
-
-                bank_account.capital += money
-                bank_account.save()
-
-                Earning.objects.create(
-                    bank_account=bank_account,
-                    amount=money,
-                    tarrif=cat.name,
-                    box=box,
-                )
+                # Eski LifeCycle yopilib, yangisi Box'ga joriy sifatida yoziladi
+                with transaction.atomic():
+                    last_lifecycle.employee = employer
+                    last_lifecycle.filled_at = timezone.now()
+                    last_lifecycle.save()
+                    LifeCycle.objects.create(box=box)
+                    money = box.category.summa * filled / 100
+
+                    credit_accounts({bank_account.pk: int(money)})
+
+                    Earning.objects.create(
+                        bank_account=bank_account,
+                        amount=money,
+                        tarrif=cat.name,
+                        box=box,
+                    )
                 return Response(
                     {"message": "box successfully scaned"},
                     status=status.HTTP_202_ACCEPTED,
@@ -107,8 +112,7 @@ class EmployeeQrCodeScanerView(APIView):
                 packet.save()
 
                 money = packet.category.summa
-                bank_account.capital += money
-                bank_account.save()
+                credit_accounts({bank_account.pk: money})
 
                 Earning.objects.create(
                     bank_account=bank_account,
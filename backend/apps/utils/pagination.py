@@ -1,7 +1,234 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Planner statistikasidan taxminiy qatorlar soni (PostgreSQL EXPLAIN).
+
+    Boshqa bazalarda yoki reja o'qilmasa None.
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        return None
+    try:
+        plan = json.loads(queryset.order_by().explain(format="json"))
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+class KeysetPagination:
+    """
+    Kalit (keyset) bo'yicha sahifalash: WHERE (created_at, id) < (...) LIMIT n.
+
+    COUNT(*) va chuqur OFFSET yo'q - keyingi sahifa oxirgi qatorning
+    tartiblash maydonlari qiymatidan boshlanadi. Kursor shu qiymatlarning
+    base64 ko'rinishi (mijoz uchun shaffof emas). Faqat oldinga yuriladi
+    (cheksiz aylantirish), previous har doim null.
+
+    Tartib queryset'ning order_by'idan olinadi, oxiriga id qo'shiladi.
+    NULL bo'lishi mumkin bo'lgan maydonlarda NULL qiymatlar har doim
+    oxirida (yo'nalish va bazadan qat'i nazar).
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, page_size, ordering):
+        self.page_size = page_size
+        self.ordering = ordering
+
+    @classmethod
+    def get_ordering(cls, queryset):
+        """
+        Kalit maydonlari ("-scannered_at", "-id") yoki None - ifoda yoki
+        bog'langan maydon bo'yicha tartibda keyset ishlamaydi.
+        """
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not ordering:
+            return ("-id",)
+        if not all(isinstance(field, str) and "__" not in field for field in ordering):
+            return None
+        names = [field.lstrip("-") for field in ordering]
+        if any(name == "?" for name in names):
+            return None
+        ordering = [
+            field[:-2] + "id" if name == "pk" else field
+            for field, name in zip(ordering, names)
+        ]
+        if "id" not in names and "pk" not in names:
+            ordering.append("-id" if ordering[0].startswith("-") else "id")
+        return tuple(ordering)
+
+    def encode_cursor(self, instance):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip("-"))
+            # DjangoJSONEncoder millisekundgacha qisqartiradi - bir
+            # millisekunddagi qatorlar tushib qolmasligi uchun to'liq aniqlik
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+        data = json.dumps(values, cls=DjangoJSONEncoder).encode()
+        return urlsafe_b64encode(data).decode().rstrip("=")
+
+    def decode_cursor(self, cursor, model=None):
+        """
+        Kursordagi qiymatlar - faqat oddiy JSON skalyarlar, model maydonlari
+        uchun to_python() bilan tekshiriladi (soxta kursor 500 bermasligi
+        uchun).
+        """
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(urlsafe_b64decode(padded.encode()))
+        except (BinasciiError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        parsed = []
+        for field, value in zip(self.ordering, values):
+            if value is not None and not isinstance(value, (str, int, float)):
+                raise NotFound(self.invalid_cursor_message)
+            if value is not None and model is not None:
+                try:
+                    value = model._meta.get_field(field.lstrip("-")).to_python(value)
+                except FieldDoesNotExist:
+                    pass
+                except (ValidationError, TypeError, ValueError):
+                    raise NotFound(self.invalid_cursor_message)
+            parsed.append(value)
+        return parsed
+
+    def order_by(self):
+        """Tartib ifodalari: NULL bo'ladigan maydonlarda NULL oxirida"""
+        expressions = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            if name not in self.nullable:
+                expressions.append(field)
+            elif field.startswith("-"):
+                expressions.append(F(name).desc(nulls_last=True))
+            else:
+                expressions.append(F(name).asc(nulls_last=True))
+        return expressions
+
+    def after(self, values):
+        """(a, b) > (x, y) shartini tartib yo'nalishlari bilan qurish"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            if value is None:
+                # NULL'lar oxirida - ulardan keyin shu maydon bo'yicha hech narsa yo'q
+                equal &= Q(**{f"{name}__isnull": True})
+                continue
+            lookup = "lt" if field.startswith("-") else "gt"
+            beyond = Q(**{f"{name}__{lookup}": value})
+            if name in self.nullable:
+                beyond |= Q(**{f"{name}__isnull": True})
+            condition |= equal & beyond
+            equal &= Q(**{name: value})
+        return condition
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.count = None
+        if request.query_params.get(self.count_query_param) == "estimate":
+            self.count = estimate_count(queryset)
+
+        self.nullable = {
+            field.name
+            for field in queryset.model._meta.concrete_fields
+            if field.null
+        }
+        queryset = queryset.order_by(*self.order_by())
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values = self.decode_cursor(cursor, queryset.model)
+            queryset = queryset.filter(self.after(values))
+
+        results = list(queryset[: self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("count", self.count),
+                    ("next", self.get_next_link()),
+                    ("previous", None),
+                    ("results", data),
+                ]
+            )
+        )
 
 
 class MyPagination(PageNumberPagination):
+    """
+    Sahifa raqami bo'yicha sahifalash (standart).
+
+    So'rovda ?cursor= parametri bo'lsa (birinchi sahifa uchun bo'sh qiymat
+    bilan) KeysetPagination rejimiga o'tadi - mobil ilovadagi cheksiz
+    aylantiriladigan ro'yxatlar uchun. ?count=estimate taxminiy sonni
+    qaytaradi.
+    """
+
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
+    cursor_query_param = KeysetPagination.cursor_query_param
+    # True bo'lsa ?page= berilmaganda ham keyset rejimi
+    keyset_by_default = False
+
+    keyset = None
+
+    def use_keyset(self, request):
+        if self.cursor_query_param in request.query_params:
+            return True
+        return (
+            self.keyset_by_default
+            and self.page_query_param not in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request):
+            ordering = KeysetPagination.get_ordering(queryset)
+            if ordering is not None:
+                self.keyset = KeysetPagination(self.get_page_size(request), ordering)
+                return self.keyset.paginate_queryset(queryset, request)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class InfiniteScrollPagination(MyPagination):
+    """Mobil cheksiz ro'yxatlar: standart - keyset, ?page= bilan eski rejim"""
+
+    keyset_by_default = True
@@ -1,7 +1,8 @@
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from apps.ecopacket.models import EcoPacketQrCode
+from apps.ecopacket.services.resolver import invalidate_checked_codes
 from apps.packet.models import Category, Packet
 from .qr_code_generator import get_uid
 
@@ -19,6 +20,10 @@ def create_ecopacket_qr_codes(num_of_qrcodes, category):
     try:
         # use bulk_create to create all the objects in a single query
         qr_codes = EcoPacketQrCode.objects.bulk_create(qrcodes)
+        # bulk_create post_save bermaydi - oldin tekshirilgan kodning
+        # /check/ keshidagi "topilmadi" yozuvi o'chirilsin
+        codes = [qr.qr_code for qr in qr_codes]
+        transaction.on_commit(lambda: invalidate_checked_codes(codes))
         return qr_codes
     except (IntegrityError, ValidationError):
         return []
@@ -179,3 +179,16 @@ INTERNAL_IPS = [
 
 # QR Check Logging
 ENABLE_QR_CHECK_LOGGING = env.bool("ENABLE_QR_CHECK_LOGGING", default=False)
+# Loglar navbat orqali fon thread'da bulk_create bilan yoziladi
+QR_CHECK_LOG_QUEUE_SIZE = env.int("QR_CHECK_LOG_QUEUE_SIZE", default=10000)
+QR_CHECK_LOG_BATCH_SIZE = env.int("QR_CHECK_LOG_BATCH_SIZE", default=200)
+QR_CHECK_LOG_FLUSH_INTERVAL = env.float("QR_CHECK_LOG_FLUSH_INTERVAL", default=2.0)
+QR_CHECK_LOG_BACKGROUND = env.bool("QR_CHECK_LOG_BACKGROUND", default=True)
+
+# Ledger rejimi: skanerlash summalari BankAccount.capital / Box.seller_share
+# qatorlarini bloklamasdan delta jadvallariga yoziladi (compact_ledger buyrug'i)
+SETTLEMENT_LEDGER = env.bool("SETTLEMENT_LEDGER", default=False)
+
+# Redis (Box / Category lookup keshi)
+REDIS_HOST = env.str("REDIS_HOST", default="redis")
+REDIS_PORT = env.int("REDIS_PORT", default=6379)